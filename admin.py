@@ -1,16 +1,25 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from werkzeug.security import generate_password_hash
-from sqlalchemy import func, and_, extract, case
+from sqlalchemy import func, and_, extract, case, select
 from datetime import datetime, timedelta
 import io
+import os
 import csv
 import json
-from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession, Notification, TeacherEvaluation
-from forms import UserForm, CourseForm, EnrollmentForm, AttendanceForm, GradeForm
+from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession, Notification, TeacherEvaluation, ReportJob
+from forms import UserForm, CourseForm, EnrollmentForm, AttendanceForm, GradeForm, NotificationForm
 from app import db
-from utils import save_uploaded_file, create_pdf_report, admin_required
+from utils import save_uploaded_file, admin_required, get_month_range, stream_csv_response
+import aggregates
+from notifications import notify_course, notify_role
+from cache import MetricsCache, invalidate_on_write
+from search import filter_courses_by_search
+from pagination import keyset_paginate
+from passwords import hash_password, get_password_hasher, PasswordHashingBusy
+from people_search import search_users, autocomplete_users, user_suggestion
+from report_jobs import REPORTS, report_rows, submit_report_job, report_job_payload, result_file_path
+from replicas import read_only
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -24,11 +33,14 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@admin_bp.route('/dashboard')
-@login_required
-@admin_required
-def dashboard():
-    """لوحة تحكم المدير"""
+# مقاييس لوحة التحكم تُخزَّن مؤقتاً وتُبطَل عند تغيير البيانات المؤثرة فيها
+dashboard_cache = invalidate_on_write(
+    MetricsCache(ttl=int(os.environ.get('DASHBOARD_CACHE_TTL', 60))),
+    User, Course, Enrollment, Attendance, AttendanceSession
+)
+
+def compute_dashboard_metrics():
+    """حساب الإحصائيات المجمّعة للوحة تحكم المدير"""
     # إحصائيات عامة
     total_students = User.query.filter_by(role='student', is_active=True).count()
     total_teachers = User.query.filter_by(role='teacher', is_active=True).count()
@@ -39,24 +51,16 @@ def dashboard():
     total_fees = db.session.query(func.sum(Enrollment.amount_paid)).scalar() or 0
     pending_payments = Enrollment.query.filter_by(payment_status='pending').count()
     
-    # أحدث التسجيلات
-    recent_enrollments = db.session.query(Enrollment, User, Course).join(
-        User, Enrollment.student_id == User.id
-    ).join(
-        Course, Enrollment.course_id == Course.id
-    ).order_by(Enrollment.enrollment_date.desc()).limit(5).all()
-    
     # إحصائيات الحضور لهذا الشهر
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    month_start, next_month_start = get_month_range()
     
     monthly_attendance = db.session.query(
         func.count(Attendance.id).label('total'),
         func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present'),
         func.sum(case((Attendance.status == 'absent', 1), else_=0)).label('absent')
     ).join(AttendanceSession).filter(
-        extract('month', AttendanceSession.session_date) == current_month,
-        extract('year', AttendanceSession.session_date) == current_year
+        AttendanceSession.session_date >= month_start,
+        AttendanceSession.session_date < next_month_start
     ).first()
     
     # الدورات الأكثر تسجيلاً
@@ -67,23 +71,41 @@ def dashboard():
         Course.id, Course.name
     ).order_by(func.count(Enrollment.id).desc()).limit(5).all()
     
+    return {
+        'total_students': total_students,
+        'total_teachers': total_teachers,
+        'total_courses': total_courses,
+        'total_enrollments': total_enrollments,
+        'total_fees': total_fees,
+        'pending_payments': pending_payments,
+        'monthly_attendance': monthly_attendance,
+        'popular_courses': popular_courses
+    }
+
+@admin_bp.route('/dashboard')
+@login_required
+@admin_required
+def dashboard():
+    """لوحة تحكم المدير"""
+    metrics = dashboard_cache.get_or_compute(('dashboard', get_month_range()[0]), compute_dashboard_metrics)
+    
+    # أحدث التسجيلات (كائنات مرتبطة بالجلسة فلا تُخزَّن مؤقتاً)
+    recent_enrollments = db.session.query(Enrollment, User, Course).join(
+        User, Enrollment.student_id == User.id
+    ).join(
+        Course, Enrollment.course_id == Course.id
+    ).order_by(Enrollment.enrollment_date.desc()).limit(5).all()
+    
     return render_template('admin/dashboard.html',
-                         total_students=total_students,
-                         total_teachers=total_teachers,
-                         total_courses=total_courses,
-                         total_enrollments=total_enrollments,
-                         total_fees=total_fees,
-                         pending_payments=pending_payments,
                          recent_enrollments=recent_enrollments,
-                         monthly_attendance=monthly_attendance,
-                         popular_courses=popular_courses)
+                         **metrics)
 
 @admin_bp.route('/students')
 @login_required
 @admin_required
 def students():
     """إدارة الطلاب"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '', type=str)
     search = request.args.get('search', '', type=str)
     course_filter = request.args.get('course', '', type=str)
     status_filter = request.args.get('status', '', type=str)
@@ -92,12 +114,7 @@ def students():
     query = User.query.filter_by(role='student')
     
     if search:
-        query = query.filter(
-            (User.full_name.contains(search)) |
-            (User.username.contains(search)) |
-            (User.email.contains(search)) |
-            (User.phone.contains(search))
-        )
+        query = search_users(query, search, 'student')
     
     if status_filter == 'active':
         query = query.filter_by(is_active=True)
@@ -105,14 +122,16 @@ def students():
         query = query.filter_by(is_active=False)
     
     if course_filter:
-        query = query.join(Enrollment).filter(
-            Enrollment.course_id == course_filter,
-            Enrollment.is_active == True
-        )
+        # IN بدلاً من الربط حتى لا يتكرر الطالب بتكرار تسجيلاته
+        query = query.filter(User.id.in_(
+            select(Enrollment.student_id).where(
+                Enrollment.course_id == course_filter,
+                Enrollment.is_active == True
+            )
+        ))
     
-    students = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    students = keyset_paginate(query, (User.created_at, User.id), cursor,
+                               per_page=20, with_total=True)
     
     # قائمة الدورات للفلترة
     courses = Course.query.filter_by(is_active=True).all()
@@ -124,6 +143,21 @@ def students():
                          course_filter=course_filter,
                          status_filter=status_filter)
 
+@admin_bp.route('/users/autocomplete')
+@login_required
+@admin_required
+def users_autocomplete():
+    """اقتراحات المستخدمين أثناء الكتابة"""
+    query_text = request.args.get('q', '', type=str)
+    role = request.args.get('role', 'student', type=str)
+    limit = min(request.args.get('limit', 10, type=int), 20)
+    
+    if role not in ('student', 'teacher', 'admin'):
+        return jsonify({'success': False, 'message': 'دور غير معروف'}), 400
+    
+    users = autocomplete_users(query_text, role, limit=max(limit, 1))
+    return jsonify({'success': True, 'results': [user_suggestion(user) for user in users]})
+
 @admin_bp.route('/student/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -143,11 +177,17 @@ def add_student():
             flash('اسم المستخدم أو البريد الإلكتروني موجود مسبقاً', 'error')
             return render_template('admin/add_student.html', form=form)
         
+        try:
+            password_hash = hash_password('123456')  # كلمة مرور افتراضية
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('admin/add_student.html', form=form), 503
+        
         # إنشاء المستخدم الجديد
         user = User(
             username=form.username.data,
             email=form.email.data,
-            password_hash=generate_password_hash('123456'),  # كلمة مرور افتراضية
+            password_hash=password_hash,
             full_name=form.full_name.data,
             phone=form.phone.data,
             date_of_birth=form.date_of_birth.data,
@@ -239,22 +279,27 @@ def delete_student(student_id):
 @admin_required
 def courses():
     """إدارة الدورات"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '', type=str)
     search = request.args.get('search', '', type=str)
     teacher_filter = request.args.get('teacher', '', type=str)
     
     # بناء الاستعلام
     query = Course.query
+    rank = None
     
     if search:
-        query = query.filter(Course.name.contains(search))
+        query, rank = filter_courses_by_search(query, search)
     
     if teacher_filter:
         query = query.filter_by(teacher_id=teacher_filter)
     
-    courses = query.order_by(Course.created_at.desc()).paginate(
-        page=page, per_page=15, error_out=False
-    )
+    # نتائج البحث مرتبة حسب الصلة، وبقية القائمة حسب تاريخ الإضافة
+    if rank is not None:
+        courses = keyset_paginate(query, (rank, Course.id), cursor, per_page=15,
+                                  descending=False, with_total=True)
+    else:
+        courses = keyset_paginate(query, (Course.created_at, Course.id), cursor,
+                                  per_page=15, with_total=True)
     
     # قائمة المعلمين للفلترة
     teachers = User.query.filter_by(role='teacher', is_active=True).all()
@@ -334,22 +379,17 @@ def edit_course(course_id):
 @admin_required
 def teachers():
     """إدارة المعلمين"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '', type=str)
     search = request.args.get('search', '', type=str)
     
     # بناء الاستعلام
     query = User.query.filter_by(role='teacher')
     
     if search:
-        query = query.filter(
-            (User.full_name.contains(search)) |
-            (User.username.contains(search)) |
-            (User.email.contains(search))
-        )
+        query = search_users(query, search, 'teacher')
     
-    teachers = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    teachers = keyset_paginate(query, (User.created_at, User.id), cursor,
+                               per_page=20, with_total=True)
     
     return render_template('admin/teachers.html', teachers=teachers, search=search)
 
@@ -372,11 +412,17 @@ def add_teacher():
             flash('اسم المستخدم أو البريد الإلكتروني موجود مسبقاً', 'error')
             return render_template('admin/add_teacher.html', form=form)
         
+        try:
+            password_hash = hash_password('123456')  # كلمة مرور افتراضية
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('admin/add_teacher.html', form=form), 503
+        
         # إنشاء المعلم الجديد
         user = User(
             username=form.username.data,
             email=form.email.data,
-            password_hash=generate_password_hash('123456'),
+            password_hash=password_hash,
             full_name=form.full_name.data,
             phone=form.phone.data,
             date_of_birth=form.date_of_birth.data,
@@ -404,9 +450,36 @@ def add_teacher():
     
     return render_template('admin/add_teacher.html', form=form)
 
+@admin_bp.route('/notifications/send', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def send_notifications():
+    """إرسال إشعار لطلاب دورة أو لدور كامل"""
+    form = NotificationForm()
+    
+    courses = Course.query.filter_by(is_active=True).order_by(Course.name).all()
+    form.course_id.choices = [(c.id, c.name) for c in courses]
+    
+    if form.validate_on_submit():
+        try:
+            if form.target.data == 'course':
+                sent = notify_course(form.course_id.data, form.title.data, form.message.data)
+            else:
+                sent = notify_role(form.role.data, form.title.data, form.message.data)
+            db.session.commit()
+            flash(f'تم إرسال الإشعار إلى {sent} مستخدم', 'success')
+            return redirect(url_for('admin.send_notifications'))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"خطأ في إرسال الإشعارات: {str(e)}")
+            flash('حدث خطأ في إرسال الإشعارات', 'error')
+    
+    return render_template('admin/send_notifications.html', form=form)
+
 @admin_bp.route('/statistics')
 @login_required
 @admin_required
+@read_only
 def statistics():
     """صفحة الإحصائيات التفصيلية"""
     # إحصائيات شهرية للتسجيلات
@@ -429,22 +502,10 @@ def statistics():
     ).group_by(Enrollment.payment_status).all()
     
     # أداء الطلاب في الدورات
-    course_performance = db.session.query(
-        Course.name,
-        func.avg(Grade.grade).label('avg_grade'),
-        func.count(Grade.id).label('grade_count')
-    ).join(Grade).group_by(Course.id, Course.name).all()
+    course_performance = aggregates.course_performance().all()
     
     # معدل الحضور لكل دورة
-    attendance_rates = db.session.query(
-        Course.name,
-        func.count(Attendance.id).label('total_sessions'),
-        func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present_count')
-    ).join(
-        AttendanceSession, Course.id == AttendanceSession.course_id
-    ).join(
-        Attendance, AttendanceSession.id == Attendance.session_id
-    ).group_by(Course.id, Course.name).all()
+    attendance_rates = aggregates.course_attendance_rates().all()
     
     return render_template('admin/statistics.html',
                          monthly_enrollments=monthly_enrollments,
@@ -452,90 +513,87 @@ def statistics():
                          course_performance=course_performance,
                          attendance_rates=attendance_rates)
 
+@admin_bp.route('/metrics/password-hashing')
+@login_required
+@admin_required
+def password_hashing_metrics():
+    """مقاييس تجزئة كلمات المرور في هذه العملية، مع عدد الجاري والمنتظر في كل الخادم"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'metrics': get_password_hasher().metrics()})
+
+def export_response(kind, basename):
+    """
+    استجابة التصدير بالصيغة المطلوبة في ?format=
+
+    csv (الافتراضي) يُبث في الطلب نفسه بذاكرة ثابتة. pdf يُرسل لطابور التقارير
+    الخلفي فلا يشغل عامل الويب: يُحوَّل المدير إلى تحميل النتيجة إذا كانت مخزنة،
+    وإلا إلى حالة المهمة حتى تكتمل.
+    """
+    if request.args.get('format') == 'pdf':
+        try:
+            job, cached = submit_report_job(kind, 'pdf', {}, current_user.id)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"خطأ في إرسال التقرير: {str(e)}")
+            flash('حدث خطأ في إنشاء التقرير', 'error')
+            return redirect(url_for('admin.dashboard'))
+        if cached:
+            return redirect(url_for('admin.download_report_job', job_id=job.id))
+        return redirect(url_for('admin.report_job_status', job_id=job.id))
+    report = REPORTS[kind]
+    return stream_csv_response(report.headers, report_rows(kind), f'{basename}.csv')
+
 @admin_bp.route('/export/students')
 @login_required
 @admin_required
 def export_students():
-    """تصدير بيانات الطلاب إلى CSV"""
-    students = User.query.filter_by(role='student').all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # كتابة العناوين
-    writer.writerow(['ID', 'اسم المستخدم', 'الاسم الكامل', 'البريد الإلكتروني', 
-                    'رقم الجوال', 'تاريخ الميلاد', 'الجنس', 'تاريخ التسجيل', 'الحالة'])
-    
-    # كتابة البيانات
-    for student in students:
-        writer.writerow([
-            student.id,
-            student.username,
-            student.full_name,
-            student.email,
-            student.phone or '',
-            student.date_of_birth.strftime('%Y-%m-%d') if student.date_of_birth else '',
-            'ذكر' if student.gender == 'male' else 'أنثى' if student.gender == 'female' else '',
-            student.created_at.strftime('%Y-%m-%d'),
-            'نشط' if student.is_active else 'غير نشط'
-        ])
-    
-    output.seek(0)
-    
-    # إنشاء ملف للتحميل
-    buffer = io.BytesIO()
-    buffer.write(output.getvalue().encode('utf-8-sig'))  # BOM for Excel Arabic support
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'students_{datetime.now().strftime("%Y%m%d")}.csv'
-    )
+    """تصدير بيانات الطلاب إلى CSV، أو PDF في الخلفية (?format=pdf)"""
+    return export_response('students', f'students_{datetime.now().strftime("%Y%m%d")}')
 
 @admin_bp.route('/export/courses')
 @login_required
 @admin_required
 def export_courses():
-    """تصدير بيانات الدورات إلى CSV"""
-    courses = Course.query.all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
+    """تصدير بيانات الدورات إلى CSV، أو PDF في الخلفية (?format=pdf)"""
+    return export_response('courses', f'courses_{datetime.now().strftime("%Y%m%d")}')
+
+@admin_bp.route('/reports/jobs', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def report_jobs():
+    """إرسال تقرير للمعالجة الخلفية (POST)، أو قائمة آخر المهام (GET)"""
+    if request.method == 'GET':
+        jobs = ReportJob.query.order_by(ReportJob.created_at.desc()).limit(20).all()
+        return jsonify({'success': True, 'jobs': [report_job_payload(job) for job in jobs]})
     
-    # كتابة العناوين
-    writer.writerow(['ID', 'اسم الدورة', 'المعلم', 'المدة بالساعات', 'تاريخ البداية', 
-                    'تاريخ النهاية', 'الرسوم', 'أقصى عدد طلاب', 'عدد المسجلين', 'الحالة'])
+    data = request.get_json(silent=True) or request.form
+    try:
+        job, cached = submit_report_job(data.get('kind'), data.get('format', 'pdf'), data, current_user.id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في إرسال التقرير: {str(e)}")
+        return jsonify({'success': False, 'message': 'حدث خطأ في إرسال التقرير'}), 500
     
-    # كتابة البيانات
-    for course in courses:
-        enrolled_count = Enrollment.query.filter_by(course_id=course.id, is_active=True).count()
-        teacher_name = course.teacher.full_name if course.teacher else 'بدون معلم'
-        
-        writer.writerow([
-            course.id,
-            course.name,
-            teacher_name,
-            course.duration_hours or '',
-            course.start_date.strftime('%Y-%m-%d') if course.start_date else '',
-            course.end_date.strftime('%Y-%m-%d') if course.end_date else '',
-            course.fee or 0,
-            course.max_students or '',
-            enrolled_count,
-            'نشطة' if course.is_active else 'غير نشطة'
-        ])
-    
-    output.seek(0)
-    
-    # إنشاء ملف للتحميل
-    buffer = io.BytesIO()
-    buffer.write(output.getvalue().encode('utf-8-sig'))
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'courses_{datetime.now().strftime("%Y%m%d")}.csv'
-    )
+    return jsonify({'success': True, 'job': report_job_payload(job, cached)}), 200 if cached else 202
+
+@admin_bp.route('/reports/jobs/<job_id>')
+@login_required
+@admin_required
+def report_job_status(job_id):
+    """حالة مهمة التقرير ونسبة تقدمها"""
+    job = ReportJob.query.get_or_404(job_id)
+    return jsonify({'success': True, 'job': report_job_payload(job)})
+
+@admin_bp.route('/reports/jobs/<job_id>/download')
+@login_required
+@admin_required
+def download_report_job(job_id):
+    """تحميل نتيجة مهمة تقرير مكتملة"""
+    job = ReportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not os.path.exists(result_file_path(job)):
+        return jsonify({'success': False, 'message': 'التقرير غير جاهز', 'status': job.status}), 409
+    
+    mimetype = 'application/pdf' if job.format == 'pdf' else 'text/csv'
+    return send_file(os.path.abspath(result_file_path(job)), mimetype=mimetype, as_attachment=True,
+                     download_name=f'{job.kind}_{job.finished_at.strftime("%Y%m%d_%H%M")}.{job.format}')
@@ -0,0 +1,124 @@
+"""
+بناء استعلامات الإحصائيات المجمّعة للحضور والدرجات
+
+تُجمَّع سجلات الحضور والدرجات مسبقاً في استعلامات فرعية مفهرسة بـ
+(student_id, course_id)، ثم تُربط بـ LEFT JOIN مع استعلام الصفحة، فيبقى عدد
+الاستعلامات ثابتاً مهما زاد عدد الطلاب.
+"""
+from sqlalchemy import func, case, and_
+
+from app import db
+from models import Course, Attendance, AttendanceSession, Grade
+
+ATTENDANCE_STATUSES = ('present', 'absent', 'late', 'excused')
+
+
+def attendance_totals(student_ids=None, course_ids=None):
+    """استعلام فرعي: عدد سجلات الحضور لكل حالة لكل (طالب، دورة)"""
+    query = db.session.query(
+        Attendance.student_id.label('student_id'),
+        AttendanceSession.course_id.label('course_id'),
+        func.count(Attendance.id).label('attendance_total'),
+        *[func.sum(case((Attendance.status == status, 1), else_=0)).label(f'{status}_count')
+          for status in ATTENDANCE_STATUSES]
+    ).join(
+        AttendanceSession, Attendance.session_id == AttendanceSession.id
+    )
+
+    if student_ids is not None:
+        query = query.filter(Attendance.student_id.in_(student_ids))
+    if course_ids is not None:
+        query = query.filter(AttendanceSession.course_id.in_(course_ids))
+
+    return query.group_by(Attendance.student_id, AttendanceSession.course_id).subquery()
+
+
+def grade_totals(student_ids=None, course_ids=None):
+    """استعلام فرعي: مجموع الدرجات وعددها ومتوسطها لكل (طالب، دورة)"""
+    query = db.session.query(
+        Grade.student_id.label('student_id'),
+        Grade.course_id.label('course_id'),
+        func.sum(Grade.grade).label('grade_sum'),
+        func.count(Grade.id).label('grade_count'),
+        func.avg(Grade.grade).label('avg_grade')
+    )
+
+    if student_ids is not None:
+        query = query.filter(Grade.student_id.in_(student_ids))
+    if course_ids is not None:
+        query = query.filter(Grade.course_id.in_(course_ids))
+
+    return query.group_by(Grade.student_id, Grade.course_id).subquery()
+
+
+def with_student_course_stats(query, student_id_column, course_id_column, student_ids=None, course_ids=None):
+    """
+    إضافة أعمدة الإحصائيات إلى استعلام يحتوي على (طالب، دورة) لكل صف
+
+    تُضاف الأعمدة بالترتيب: attendance_total, present_count, avg_grade, grade_count
+    ويمكن تضييق الاستعلامات الفرعية بـ student_ids أو course_ids (قائمة أو select).
+    """
+    attendance = attendance_totals(student_ids, course_ids)
+    grades = grade_totals(student_ids, course_ids)
+
+    return query.outerjoin(
+        attendance, and_(
+            attendance.c.student_id == student_id_column,
+            attendance.c.course_id == course_id_column
+        )
+    ).outerjoin(
+        grades, and_(
+            grades.c.student_id == student_id_column,
+            grades.c.course_id == course_id_column
+        )
+    ).add_columns(
+        func.coalesce(attendance.c.attendance_total, 0).label('attendance_total'),
+        func.coalesce(attendance.c.present_count, 0).label('present_count'),
+        grades.c.avg_grade.label('avg_grade'),
+        func.coalesce(grades.c.grade_count, 0).label('grade_count')
+    )
+
+
+def course_grade_averages(student_id):
+    """متوسط درجات الطالب في كل دورة كقاموس {course_id: avg}"""
+    grades = grade_totals(student_ids=[student_id])
+    return {
+        course_id: average_grade(avg)
+        for course_id, avg in db.session.query(grades.c.course_id, grades.c.avg_grade)
+    }
+
+
+def course_performance():
+    """متوسط الدرجات وعددها لكل دورة"""
+    grades = grade_totals()
+    return db.session.query(
+        Course.name,
+        (func.sum(grades.c.grade_sum) / func.sum(grades.c.grade_count)).label('avg_grade'),
+        func.sum(grades.c.grade_count).label('grade_count')
+    ).join(
+        grades, grades.c.course_id == Course.id
+    ).group_by(Course.id, Course.name)
+
+
+def course_attendance_rates():
+    """عدد سجلات الحضور والحاضرين لكل دورة"""
+    attendance = attendance_totals()
+    return db.session.query(
+        Course.name,
+        func.sum(attendance.c.attendance_total).label('total_sessions'),
+        func.sum(attendance.c.present_count).label('present_count')
+    ).join(
+        attendance, attendance.c.course_id == Course.id
+    ).group_by(Course.id, Course.name)
+
+
+def attendance_rate(total, present):
+    """نسبة الحضور المئوية"""
+    if not total:
+        return 0
+    return round(((present or 0) / total) * 100, 1)
+
+
+def average_grade(avg):
+    """تقريب المتوسط كما يُعرض في الصفحات"""
+    return round(float(avg), 1) if avg else 0
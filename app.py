@@ -1,41 +1,212 @@
 import os
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+import db_profiles
+import logging_config
+import passwords
+from replicas import RoutingSession
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
+def init_database():
+    """
+    إنشاء الجداول والفهارس وصفوف البداية، وتُنفذ بـ `flask init-db` عند النشر
+    وبعد كل تحديث يضيف جداول أو فهارس، وليس عند استيراد التطبيق
+    """
+    import search
+    import people_search
+    import report_jobs
+    import replicas
+    from flask import current_app
+    
+    # Ensure upload directory exists
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Create all tables
+    db.create_all()
+    
+    # create_all لا يضيف الفهارس الجديدة إلى الجداول الموجودة مسبقاً
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    
+    search.ensure_course_search_index()
+    people_search.ensure_user_search_index()
+    report_jobs.ensure_data_versions()
+    
+    if replicas.replica_configured():
+        replicas.ensure_replica_heartbeat()
+
+def seed_default_data():
+    """المستخدمون الافتراضيون ودورات تجريبية إذا لم توجد (`flask seed-data`)"""
+    # Create default admin user if not exists
+    from models import User, Course
+    from werkzeug.security import generate_password_hash
+    
+    admin = User.query.filter_by(username='admin').first()
+    if not admin:
+        admin_user = User(
+            username='admin',
+            email='admin@example.com',
+            password_hash=generate_password_hash('admin123'),
+            role='admin',
+            full_name='مدير النظام',
+            phone='1234567890'
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+        logging.info("Default admin user created: admin/admin123")
+    
+    # Create default teacher user if not exists
+    teacher = User.query.filter_by(username='teacher').first()
+    if not teacher:
+        teacher_user = User(
+            username='teacher',
+            email='teacher@example.com',
+            password_hash=generate_password_hash('123456'),
+            role='teacher',
+            full_name='أحمد محمد - معلم',
+            phone='0501234567'
+        )
+        db.session.add(teacher_user)
+        db.session.commit()
+        logging.info("Default teacher user created: teacher/123456")
+    
+    # Create sample courses if none exist
+    if Course.query.count() == 0:
+        teacher_user = User.query.filter_by(role='teacher').first()
+        sample_courses = [
+            {
+                'name': 'دورة البرمجة الأساسية',
+                'description': 'دورة تعليمية شاملة لأساسيات البرمجة وعلوم الحاسوب',
+                'teacher_id': teacher_user.id if teacher_user else None,
+                'duration_hours': 40,
+                'fee': 1500.0,
+                'max_students': 25,
+                'is_active': True
+            },
+            {
+                'name': 'دورة تطوير المواقع',
+                'description': 'تعلم تطوير المواقع الإلكترونية باستخدام HTML وCSS وJavaScript',
+                'teacher_id': teacher_user.id if teacher_user else None,
+                'duration_hours': 60,
+                'fee': 2000.0,
+                'max_students': 20,
+                'is_active': True
+            },
+            {
+                'name': 'دورة قواعد البيانات',
+                'description': 'أساسيات قواعد البيانات وSQL والتصميم',
+                'teacher_id': teacher_user.id if teacher_user else None,
+                'duration_hours': 30,
+                'fee': 1200.0,
+                'max_students': 30,
+                'is_active': True
+            },
+            {
+                'name': 'دورة الذكاء الاصطناعي',
+                'description': 'مقدمة في الذكاء الاصطناعي والتعلم الآلي',
+                'teacher_id': teacher_user.id if teacher_user else None,
+                'duration_hours': 50,
+                'fee': 2500.0,
+                'max_students': 15,
+                'is_active': True
+            }
+        ]
+        
+        for course_data in sample_courses:
+            course = Course(**course_data)
+            db.session.add(course)
+        
+        db.session.commit()
+        logging.info("Sample courses created successfully")
+
 def create_app():
     # Create the app
     app = Flask(__name__)
+    
+    # السجلات: طابور وخيط كتابة، وJSON برقم الطلب، ومستويات من LOG_LEVEL وLOG_LEVELS
+    logging_config.configure_logging(app.config)
+    app.before_request(logging_config.assign_request_id)
+    app.after_request(logging_config.add_request_id_header)
     app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
     
     # Configure the database
     database_url = os.environ.get("DATABASE_URL", "sqlite:///student_management.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
+    # إعدادات المحرك حسب نوع قاعدة البيانات (WAL لـ SQLite، وحجم المجموعة لـ PostgreSQL)
+    db_profiles.load_engine_config(app.config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_profiles.engine_options(database_url, app.config)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     
+    # نسخة قراءة للصفحات المعلّمة بـ read_only: أقصى تأخر مقبول بالثواني، ومدة
+    # قراءة المستخدم من الرئيسية بعد كتابته، وفترتا قياس التأخر وتحديث النبض
+    replica_url = os.environ.get("REPLICA_DATABASE_URL")
+    if replica_url:
+        app.config["SQLALCHEMY_BINDS"] = {
+            "replica": {"url": replica_url, **db_profiles.engine_options(replica_url, app.config)}
+        }
+    app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 5))
+    app.config['REPLICA_STICKY_SECONDS'] = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    app.config['REPLICA_LAG_CHECK_INTERVAL'] = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 1))
+    app.config['REPLICA_HEARTBEAT_INTERVAL'] = float(os.environ.get('REPLICA_HEARTBEAT_INTERVAL', 1))
+    
     # File upload configuration
     app.config['UPLOAD_FOLDER'] = 'uploads'
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
     
-    # Ensure upload directory exists
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # معالجة الصور في الخلفية: أقصى عدد بكسلات للصورة (عدد العمليات IMAGE_WORKERS
+    # يُقرأ في db_profiles لأنه يدخل في حساب اتصالات قاعدة البيانات)
+    app.config['IMAGE_MAX_PIXELS'] = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000))
+    
+    # تقديم الملفات المرفوعة: ترك إرسالها للخادم الأمامي عبر X-Accel-Redirect
+    # (nginx، مع موقع internal على UPLOADS_ACCEL_PREFIX) أو X-Sendfile (Apache)
+    app.config['UPLOADS_SENDFILE_HEADER'] = os.environ.get('UPLOADS_SENDFILE_HEADER', '')
+    app.config['UPLOADS_ACCEL_PREFIX'] = os.environ.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+    
+    # الرفع على أجزاء: أقصى حجم للملف، وأقصى عدد للجلسات المفتوحة لكل مستخدم ومجموع
+    # أحجامها، وحجم الجزء (يجب ألا يتجاوز MAX_CONTENT_LENGTH)، وساعات بقاء الجلسة المتروكة
+    app.config['RESUMABLE_UPLOAD_MAX_SIZE'] = int(os.environ.get('RESUMABLE_UPLOAD_MAX_SIZE', 2000 * 1024 * 1024))
+    app.config['RESUMABLE_UPLOAD_MAX_OPEN'] = int(os.environ.get('RESUMABLE_UPLOAD_MAX_OPEN', 3))
+    app.config['RESUMABLE_UPLOAD_MAX_OPEN_BYTES'] = int(
+        os.environ.get('RESUMABLE_UPLOAD_MAX_OPEN_BYTES', app.config['RESUMABLE_UPLOAD_MAX_SIZE'])
+    )
+    app.config['RESUMABLE_UPLOAD_CHUNK_SIZE'] = min(
+        int(os.environ.get('RESUMABLE_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)), app.config['MAX_CONTENT_LENGTH']
+    )
+    app.config['RESUMABLE_UPLOAD_TTL_HOURS'] = float(os.environ.get('RESUMABLE_UPLOAD_TTL_HOURS', 24))
+    
+    # خط تقارير PDF العربي (يُبحث في خطوط النظام الشائعة إذا لم يُحدد)
+    app.config['REPORT_FONT_PATH'] = os.environ.get('REPORT_FONT_PATH')
+    app.config['REPORT_FONT_BOLD_PATH'] = os.environ.get('REPORT_FONT_BOLD_PATH')
+    
+    # طابور التقارير الخلفي: ثواني إعادة استخدام النتيجة المخزنة إذا لم تتغير
+    # البيانات، ومجلد النتائج (خارج مجلد الرفع فلا تُقدم مباشرة)، وساعات
+    # الاحتفاظ بالنتائج. عدد العمليات REPORT_WORKERS يُقرأ في db_profiles
+    app.config['REPORT_CACHE_TTL'] = int(os.environ.get('REPORT_CACHE_TTL', 3600))
+    app.config['REPORT_RESULTS_FOLDER'] = os.environ.get('REPORT_RESULTS_FOLDER', 'report_results')
+    app.config['REPORT_RESULT_RETENTION_HOURS'] = float(os.environ.get('REPORT_RESULT_RETENTION_HOURS', 24))
+    
+    # النسخ الاحتياطي: المجلد، والضغط (gzip، أو zstd مع zstandard)، وعدد النسخ
+    # المحتفظ بها، وصفحات SQLite في كل خطوة والاستراحة بين الخطوات بالثواني،
+    # وبرنامج pg_dump لـ PostgreSQL
+    app.config['BACKUP_FOLDER'] = os.environ.get('BACKUP_FOLDER', 'backups')
+    app.config['BACKUP_COMPRESSION'] = os.environ.get('BACKUP_COMPRESSION', 'gzip')
+    app.config['BACKUP_KEEP'] = int(os.environ.get('BACKUP_KEEP', 14))
+    app.config['BACKUP_PAGES_PER_STEP'] = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+    app.config['BACKUP_STEP_SLEEP'] = float(os.environ.get('BACKUP_STEP_SLEEP', 0.005))
+    app.config['BACKUP_PG_DUMP'] = os.environ.get('BACKUP_PG_DUMP', 'pg_dump')
     
     # Initialize extensions
     db.init_app(app)
@@ -44,99 +215,179 @@ def create_app():
     login_manager.login_message = 'يرجى تسجيل الدخول للوصول إلى هذه الصفحة'
     login_manager.login_message_category = 'info'
     
+    # تجزئة كلمات المرور: معاملات التجزئة، وعدد التجزئات المتزامنة وأقصى طول
+    # للطابور في كل الخادم، ومهلة انتظار الدور بالثواني، ومجلد ملفات الأقفال
+    # التي يتشارك بها العمال الحد (يجب أن يكون نفسه لكل عمليات الخادم)
+    passwords.load_password_config(app.config)
+    passwords.create_hash_slots(app.config)
+    
+    # تخزين هوية المستخدم بين الطلبات: الحجم، وثواني الثقة بالنسخة دون التحقق
+    # من رقم الإصدار (0 = التحقق في كل طلب، وهو الآمن مع أكثر من عامل)
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_REVALIDATE'] = float(os.environ.get('USER_CACHE_REVALIDATE', 0))
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from models import User
-        return User.query.get(int(user_id))
+        from user_cache import load_cached_user
+        return load_cached_user(int(user_id))
     
     with app.app_context():
+        for engine in db.engines.values():
+            db_profiles.configure_engine(engine, app.config)
+        
         # Import models to ensure tables are created
         import models
         
-        # Create all tables
-        db.create_all()
+        # تسجيل مستمعي تحديث إحصائيات الطلاب في الدورات
+        import stats
+        
+        # فهرس البحث النصي للدورات
+        import search
         
-        # Create default admin user if not exists
-        from models import User, Course
-        from werkzeug.security import generate_password_hash
+        # فهرس البحث عن المستخدمين بالبادئة
+        import people_search
         
-        admin = User.query.filter_by(username='admin').first()
-        if not admin:
-            admin_user = User(
-                username='admin',
-                email='admin@example.com',
-                password_hash=generate_password_hash('admin123'),
-                role='admin',
-                full_name='مدير النظام',
-                phone='1234567890'
-            )
-            db.session.add(admin_user)
-            db.session.commit()
-            logging.info("Default admin user created: admin/admin123")
+        # عدادات الإشارة لملفات المستندات المخزنة حسب المحتوى
+        import documents
         
-        # Create default teacher user if not exists
-        teacher = User.query.filter_by(username='teacher').first()
-        if not teacher:
-            teacher_user = User(
-                username='teacher',
-                email='teacher@example.com',
-                password_hash=generate_password_hash('123456'),
-                role='teacher',
-                full_name='أحمد محمد - معلم',
-                phone='0501234567'
-            )
-            db.session.add(teacher_user)
-            db.session.commit()
-            logging.info("Default teacher user created: teacher/123456")
+        # تخزين هوية المستخدم المسجل بين الطلبات
+        import user_cache
+        user_cache.user_cache.maxsize = app.config['USER_CACHE_SIZE']
         
-        # Create sample courses if none exist
-        if Course.query.count() == 0:
-            teacher_user = User.query.filter_by(role='teacher').first()
-            sample_courses = [
-                {
-                    'name': 'دورة البرمجة الأساسية',
-                    'description': 'دورة تعليمية شاملة لأساسيات البرمجة وعلوم الحاسوب',
-                    'teacher_id': teacher_user.id if teacher_user else None,
-                    'duration_hours': 40,
-                    'fee': 1500.0,
-                    'max_students': 25,
-                    'is_active': True
-                },
-                {
-                    'name': 'دورة تطوير المواقع',
-                    'description': 'تعلم تطوير المواقع الإلكترونية باستخدام HTML وCSS وJavaScript',
-                    'teacher_id': teacher_user.id if teacher_user else None,
-                    'duration_hours': 60,
-                    'fee': 2000.0,
-                    'max_students': 20,
-                    'is_active': True
-                },
-                {
-                    'name': 'دورة قواعد البيانات',
-                    'description': 'أساسيات قواعد البيانات وSQL والتصميم',
-                    'teacher_id': teacher_user.id if teacher_user else None,
-                    'duration_hours': 30,
-                    'fee': 1200.0,
-                    'max_students': 30,
-                    'is_active': True
-                },
-                {
-                    'name': 'دورة الذكاء الاصطناعي',
-                    'description': 'مقدمة في الذكاء الاصطناعي والتعلم الآلي',
-                    'teacher_id': teacher_user.id if teacher_user else None,
-                    'duration_hours': 50,
-                    'fee': 2500.0,
-                    'max_students': 15,
-                    'is_active': True
-                }
-            ]
-            
-            for course_data in sample_courses:
-                course = Course(**course_data)
-                db.session.add(course)
-            
-            db.session.commit()
-            logging.info("Sample courses created successfully")
+        # أرقام إصدار الجداول لمفاتيح نتائج التقارير المخزنة
+        import report_jobs
+    
+    @app.cli.command('init-db')
+    @click.option('--seed', is_flag=True, help='إضافة المستخدمين الافتراضيين والدورات التجريبية أيضاً')
+    def init_db_command(seed):
+        """إنشاء الجداول والفهارس الناقصة (عند النشر وبعد كل تحديث)"""
+        init_database()
+        if seed:
+            seed_default_data()
+        print("Database initialized")
+    
+    @app.cli.command('seed-data')
+    def seed_data_command():
+        """إضافة المستخدمين الافتراضيين والدورات التجريبية إذا لم توجد"""
+        seed_default_data()
+        print("Default data seeded")
+    
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """إعادة بناء جدول إحصائيات الطلاب في الدورات"""
+        from stats import rebuild_student_course_stats
+        count = rebuild_student_course_stats()
+        print(f"Rebuilt statistics for {count} student/course pairs")
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """إعادة بناء فهرس البحث النصي للدورات"""
+        from search import rebuild_course_search_index
+        count = rebuild_course_search_index()
+        print(f"Indexed {count} courses")
+    
+    @app.cli.command('rebuild-people-search-index')
+    def rebuild_people_search_index_command():
+        """إعادة بناء فهرس البحث عن المستخدمين"""
+        from people_search import rebuild_user_search_index
+        count = rebuild_user_search_index()
+        print(f"Indexed {count} users")
+    
+    @app.cli.command('rebuild-notification-counters')
+    def rebuild_notification_counters_command():
+        """إعادة بناء عدادات الإشعارات غير المقروءة"""
+        from notifications import rebuild_notification_counters
+        count = rebuild_notification_counters()
+        print(f"Rebuilt unread notification counters for {count} users")
+    
+    @app.cli.command('process-pending-images')
+    def process_pending_images_command():
+        """معالجة الصور العالقة أو الفاشلة"""
+        from images import process_pending_images
+        ready, failed = process_pending_images()
+        print(f"Processed {ready} images, {failed} failed")
+    
+    @app.cli.command('gc-document-blobs')
+    @click.option('--grace-minutes', default=60, show_default=True,
+                  help='عدم حذف الملفات المستخدمة خلال هذه المدة')
+    @click.option('--recount', is_flag=True, help='إعادة حساب عدادات الإشارة من جدول المستندات أولاً')
+    def gc_document_blobs_command(grace_minutes, recount):
+        """حذف ملفات المستندات التي لم يعد يشير إليها أي مستند"""
+        from documents import gc_document_blobs, rebuild_blob_ref_counts
+        if recount:
+            print(f"Recounted references for {rebuild_blob_ref_counts()} blobs")
+        removed, freed = gc_document_blobs(grace_minutes)
+        print(f"Removed {removed} blobs, freed {freed} bytes")
+    
+    @app.cli.command('expire-upload-sessions')
+    def expire_upload_sessions_command():
+        """حذف جلسات الرفع على أجزاء المتروكة وملفاتها المؤقتة"""
+        from resumable_uploads import expire_upload_sessions
+        count = expire_upload_sessions(app.config['RESUMABLE_UPLOAD_TTL_HOURS'])
+        print(f"Expired {count} upload sessions")
+    
+    @app.cli.command('backup-database')
+    @click.option('--compression', type=click.Choice(['gzip', 'zstd']), help='طريقة الضغط (BACKUP_COMPRESSION افتراضياً)')
+    @click.option('--keep', type=int, help='عدد النسخ المحتفظ بها (BACKUP_KEEP افتراضياً، 0 بلا حذف)')
+    @click.option('--verify', is_flag=True, help='التحقق من بصمة النسخة بعد كتابتها')
+    def backup_database_command(compression, keep, verify):
+        """نسخة احتياطية مضغوطة لقاعدة البيانات دون إيقاف التطبيق"""
+        from backups import create_backup, verify_backup
+        path = create_backup(compression, keep)
+        if verify and not verify_backup(path):
+            raise click.ClickException(f"Checksum mismatch for {path}")
+        print(f"Backup written to {path}")
+    
+    @app.cli.command('verify-backup')
+    @click.argument('path')
+    def verify_backup_command(path):
+        """التحقق من ملف نسخة احتياطية ببصمته"""
+        from backups import verify_backup
+        if not verify_backup(path):
+            raise click.ClickException(f"Checksum mismatch for {path}")
+        print(f"{path}: OK")
+    
+    @app.cli.command('sync-sqlite-replica')
+    def sync_sqlite_replica_command():
+        """نسخ قاعدة SQLite الرئيسية إلى ملف REPLICA_DATABASE_URL (للتجربة المحلية)"""
+        from replicas import sync_sqlite_replica
+        sync_sqlite_replica()
+        print("Replica synchronized")
+    
+    @app.cli.command('run-report-jobs')
+    @click.option('--stale-minutes', default=30, show_default=True,
+                  help='إعادة المهام العالقة قيد التنفيذ منذ هذه المدة إلى الطابور')
+    def run_report_jobs_command(stale_minutes):
+        """تنفيذ مهام التقارير المنتظرة (مثلاً بعد إعادة تشغيل الخادم)"""
+        from report_jobs import run_pending_report_jobs
+        count = run_pending_report_jobs(stale_minutes)
+        print(f"Ran {count} report jobs")
+    
+    @app.cli.command('purge-report-jobs')
+    def purge_report_jobs_command():
+        """حذف مهام التقارير المنتهية القديمة وملفات نتائجها"""
+        from report_jobs import purge_report_jobs
+        count = purge_report_jobs(app.config['REPORT_RESULT_RETENTION_HOURS'])
+        print(f"Purged {count} report jobs")
+    
+    # النسخ المصغرة للصور في القوالب، مع صورة بديلة حتى تجهز، ورابط الملف المرفوع
+    from images import image_rendition, PLACEHOLDER_IMAGE
+    from uploads import upload_url
+    app.jinja_env.globals.update(image_rendition=image_rendition, image_placeholder=PLACEHOLDER_IMAGE,
+                                 upload_url=upload_url)
+    
+    # قراءة المستخدم من القاعدة الرئيسية بعد كتابته
+    from replicas import remember_writes
+    app.after_request(remember_writes)
+    
+    @app.context_processor
+    def inject_unread_notifications_count():
+        """عدد الإشعارات غير المقروءة لشارة شريط التنقل"""
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return {}
+        from notifications import get_unread_count
+        return {'unread_notifications_count': get_unread_count(current_user.id)}
     
     # Register blueprints
     from routes import main_bp
@@ -144,14 +395,35 @@ def create_app():
     from admin import admin_bp
     from teacher import teacher_bp
     from student import student_bp
+    from uploads import uploads_bp
+    from resumable_uploads import resumable_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(teacher_bp, url_prefix='/teacher')
     app.register_blueprint(student_bp, url_prefix='/student')
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
+    app.register_blueprint(resumable_bp, url_prefix='/resumable-uploads')
     
     return app
 
-# Create app instance
-app = create_app()
+def preload_heavy_modules(app):
+    """
+    استيراد المكتبات الثقيلة التي تُستورد عند أول استخدام (ReportLab والخط العربي،
+    وPillow) مسبقاً، لتُستدعى في عملية gunicorn الرئيسية مع preload_app فيتشارك
+    العمال صفحات ذاكرتها بعد fork بدلاً من استيرادها في كل عامل
+    """
+    import reports
+    import PIL.Image
+    reports.register_report_fonts(app.config['REPORT_FONT_PATH'], app.config['REPORT_FONT_BOLD_PATH'])
+    PIL.Image.init()
+
+def __getattr__(name):
+    # التطبيق يُنشأ عند أول طلب له (from app import app)، فاستيراد db والنماذج
+    # من السكربتات لا يُنشئه
+    if name == 'app':
+        instance = create_app()
+        globals()['app'] = instance
+        return instance
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
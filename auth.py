@@ -1,12 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 import os
 from models import User, Course, Enrollment
 from forms import LoginForm, StudentRegistrationForm
 from app import db
 from utils import allowed_file, save_uploaded_file
+from passwords import hash_password, verify_password, PasswordHashingBusy
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -20,8 +20,21 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         
-        if user and check_password_hash(user.password_hash, form.password.data):
+        try:
+            password_valid = user is not None and verify_password(user, form.password.data)
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        
+        if password_valid:
             if user.is_active:
+                # حفظ التجزئة الجديدة إذا تغيّرت معاملات التجزئة
+                if db.session.is_modified(user):
+                    try:
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        current_app.logger.error(f"خطأ في تحديث تجزئة كلمة المرور: {str(e)}")
                 login_user(user, remember=form.remember_me.data)
                 next_page = request.args.get('next')
                 flash(f'مرحباً {user.full_name}', 'success')
@@ -70,11 +83,17 @@ def register():
                 flash('البريد الإلكتروني مسجل مسبقاً', 'error')
             return render_template('auth/register.html', form=form)
         
+        try:
+            password_hash = hash_password(form.password.data)
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('auth/register.html', form=form), 503
+        
         # إنشاء المستخدم الجديد
         user = User(
             username=form.username.data,
             email=form.email.data,
-            password_hash=generate_password_hash(form.password.data),
+            password_hash=password_hash,
             full_name=form.full_name.data,
             phone=form.phone.data,
             date_of_birth=form.date_of_birth.data,
@@ -0,0 +1,218 @@
+"""
+النسخ الاحتياطي لقاعدة البيانات أثناء عمل التطبيق
+
+SQLite: واجهة النسخ الاحتياطي في sqlite3 تنتج لقطة متسقة (بخلاف نسخ ملف تُكتب
+فيه بيانات)، وفي وضع WAL تنسخ عدداً محدوداً من الصفحات في كل خطوة مع استراحة
+قصيرة بينها دون حجب الكاتبين. PostgreSQL: مخرجات pg_dump النصية.
+في الحالتين تُضغط النسخة أثناء كتابتها (gzip، أو zstd إذا كانت zstandard
+مثبتة)، ويُكتب بجانبها ملف .sha256 بصيغة sha256sum، وتُحذف النسخ الأقدم من
+BACKUP_KEEP.
+
+للجدولة يكفي سطر cron يستدعي أمر سطر الأوامر:
+
+    0 3 * * * cd /srv/app && flask backup-database --verify
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+from flask import current_app
+
+from app import db
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BACKUP_PREFIX = 'backup_'
+COPY_CHUNK_SIZE = 1024 * 1024
+COMPRESSION_EXTENSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+
+
+class BackupError(Exception):
+    pass
+
+
+class _HashingWriter:
+    """ملف كتابة يحسب بصمة ما يُكتب فيه، فتُحسب بصمة الملف المضغوط دون قراءته ثانية"""
+
+    def __init__(self, file):
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def _compressor(writer, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise BackupError('ضغط zstd يتطلب تثبيت zstandard')
+        return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(writer, closefd=False)
+    return gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=6)
+
+
+def _write_compressed(path, compression, copy):
+    """كتابة ملف مضغوط بنقل ذري، وcopy(output) تكتب المحتوى غير المضغوط. يُرجع البصمة"""
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as raw:
+            writer = _HashingWriter(raw)
+            with _compressor(writer, compression) as output:
+                copy(output)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return writer.hash.hexdigest()
+
+
+def sqlite_snapshot(database, snapshot_path, pages, step_sleep):
+    """
+    لقطة متسقة بواجهة النسخ الاحتياطي
+
+    في وضع WAL تبقى معاملة قراءة مفتوحة على المصدر طوال النسخ، فتُنسخ لقطة
+    ثابتة على خطوات من pages صفحة مع استراحة بينها ويستمر الكاتبون. دون ذلك
+    تعيد كل كتابة من اتصال آخر النسخ من البداية فلا ينتهي تحت الكتابة المستمرة.
+    في وضع journal العادي تحجب معاملة القراءة الكاتبين، فيُنسخ الملف في خطوة
+    واحدة لأقصر مدة حجب ممكنة.
+    """
+    source = sqlite3.connect(f'file:{quote(database)}?mode=ro', uri=True, isolation_level=None)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages, progress=lambda status, remaining, total: time.sleep(step_sleep))
+            source.execute('COMMIT')
+        else:
+            source.backup(target)
+        result = target.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise BackupError(f'فشل فحص النسخة: {result}')
+    finally:
+        target.close()
+        source.close()
+
+
+def _backup_sqlite(url, path, compression):
+    config = current_app.config
+    snapshot_path = path + '.snapshot'
+    try:
+        sqlite_snapshot(url.database, snapshot_path, config['BACKUP_PAGES_PER_STEP'], config['BACKUP_STEP_SLEEP'])
+        with open(snapshot_path, 'rb') as snapshot:
+            return _write_compressed(path, compression,
+                                     lambda output: shutil.copyfileobj(snapshot, output, COPY_CHUNK_SIZE))
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def _backup_postgresql(url, path, compression):
+    """مخرجات pg_dump (يمكن استعادتها بـ psql) تُضغط أثناء قراءتها"""
+    environment = dict(os.environ)
+    if url.password:
+        # كلمة المرور في البيئة وليس في سطر الأوامر الظاهر لبقية المستخدمين
+        environment['PGPASSWORD'] = url.password
+    dsn = url.set(drivername='postgresql', password=None).render_as_string(hide_password=False)
+    command = [current_app.config['BACKUP_PG_DUMP'], '--no-owner', '--no-privileges', f'--dbname={dsn}']
+
+    def copy(output):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environment)
+        try:
+            shutil.copyfileobj(process.stdout, output, COPY_CHUNK_SIZE)
+        finally:
+            process.stdout.close()
+            errors = process.stderr.read().decode('utf-8', 'replace')
+            process.stderr.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise BackupError(f'فشل pg_dump: {errors.strip()}')
+
+    return _write_compressed(path, compression, copy)
+
+
+def list_backups(folder=None):
+    """ملفات النسخ الاحتياطية في المجلد، الأحدث أولاً"""
+    folder = folder or current_app.config['BACKUP_FOLDER']
+    if not os.path.isdir(folder):
+        return []
+    names = [name for name in os.listdir(folder)
+             if name.startswith(BACKUP_PREFIX) and name.rsplit('.', 1)[-1] in COMPRESSION_EXTENSIONS.values()]
+    return [os.path.join(folder, name) for name in sorted(names, reverse=True)]
+
+
+def rotate_backups(keep, folder=None):
+    """حذف النسخ الأقدم من آخر keep نسخة مع ملفات بصماتها، ويُرجع عدد المحذوف"""
+    removed = 0
+    for path in list_backups(folder)[keep:]:
+        for file_path in (path, path + '.sha256'):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        removed += 1
+    return removed
+
+
+def verify_backup(path):
+    """مطابقة بصمة ملف النسخة مع ملف .sha256 بجانبه"""
+    with open(path + '.sha256', encoding='utf-8') as checksum_file:
+        expected = checksum_file.read().split()[0]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as backup:
+        for chunk in iter(lambda: backup.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest() == expected
+
+
+def create_backup(compression=None, keep=None):
+    """
+    إنشاء نسخة احتياطية مضغوطة مع ملف بصمتها، ويُرجع مسار النسخة
+
+    ترفع BackupError إذا لم تكن قاعدة البيانات مدعومة أو فشل النسخ.
+    """
+    config = current_app.config
+    compression = compression or config['BACKUP_COMPRESSION']
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise BackupError(f'طريقة ضغط غير معروفة: {compression}')
+    keep = config['BACKUP_KEEP'] if keep is None else keep
+
+    url = db.engine.url
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        if not url.database or url.database == ':memory:':
+            raise BackupError('لا يمكن نسخ قاعدة بيانات في الذاكرة')
+        backup, extension = _backup_sqlite, 'db'
+    elif backend == 'postgresql':
+        backup, extension = _backup_postgresql, 'sql'
+    else:
+        raise BackupError(f'قاعدة بيانات غير مدعومة للنسخ الاحتياطي: {backend}')
+
+    folder = config['BACKUP_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    filename = (f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                f".{extension}.{COMPRESSION_EXTENSIONS[compression]}")
+    path = os.path.join(folder, filename)
+
+    checksum = backup(url, path, compression)
+    with open(path + '.sha256', 'w', encoding='utf-8') as checksum_file:
+        checksum_file.write(f'{checksum}  {filename}\n')
+
+    if keep:
+        rotate_backups(keep, folder)
+    return path
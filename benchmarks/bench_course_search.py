@@ -0,0 +1,93 @@
+"""
+مقارنة البحث بـ LIKE مع فهرس البحث النصي للدورات
+
+يولّد دورات بأسماء عربية بأشكال كتابة مختلفة (همزات، تاء مربوطة، تشكيل)
+ويقيس زمن البحث وعدد النتائج لكل طريقة.
+
+    python benchmarks/bench_course_search.py --courses 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = ['البرمجة', 'الإحصاء', 'قواعد البيانات', 'الذكاء الاصطناعي', 'التصميم', 'اللغة الإنجليزية',
+            'المحاسبة', 'إدارة المشاريع', 'الشبكات', 'أمن المعلومات', 'الرياضيات', 'الفيزياء']
+LEVELS = ['الأساسية', 'المتقدمة', 'للمبتدئين', 'المكثفة', 'التطبيقية', 'الاحترافية']
+PREFIXES = ['دورة', 'مقدمة في', 'أساسيات', 'ورشة', 'برنامج']
+VARIANTS = {'أ': 'ا', 'إ': 'ا', 'ة': 'ه'}
+DIACRITICS = ['َ', 'ُ', 'ِ', 'ّ']
+
+QUERIES = ['اساسيات', 'الإحصاء', 'قاعدة', 'الذكاء الاصطناعى', 'المتقدمه', 'امن المعلومات', 'ادارة']
+
+
+def noisy(rng, value):
+    """كتابة النص بشكل بديل كما يفعل المستخدمون"""
+    if rng.random() < 0.3:
+        value = ''.join(VARIANTS.get(char, char) for char in value)
+    if rng.random() < 0.2:
+        value = ''.join(char + rng.choice(DIACRITICS) if rng.random() < 0.2 else char for char in value)
+    return value
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=10)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_search_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from sqlalchemy import insert
+    from app import app, db, init_database
+    from models import Course
+    from search import rebuild_course_search_index, search_courses
+
+    rng = random.Random(42)
+    with app.app_context():
+        init_database()
+        started = time.perf_counter()
+        rows = []
+        for i in range(args.courses):
+            name = f'{rng.choice(PREFIXES)} {rng.choice(SUBJECTS)} {rng.choice(LEVELS)}'
+            description = f'تتناول هذه الدورة {rng.choice(SUBJECTS)} و{rng.choice(SUBJECTS)} بشكل عملي'
+            rows.append({'name': noisy(rng, name), 'description': noisy(rng, description), 'is_active': True})
+            if len(rows) >= 10000:
+                db.session.execute(insert(Course), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(Course), rows)
+        db.session.commit()
+        print(f'inserted {args.courses:,} courses in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        rebuild_course_search_index()
+        print(f'built search index in {time.perf_counter() - started:.1f}s\n')
+
+        print(f'{"query":<20} {"LIKE ms":>10} {"LIKE hits":>10} {"index ms":>10} {"index hits":>11}')
+        for query_text in QUERIES:
+            like_query = Course.query.filter(Course.name.contains(query_text))
+            index_query = search_courses(Course.query, query_text)
+
+            timings = []
+            for query in (like_query, index_query):
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    query.order_by(Course.created_at.desc()).limit(12).all()
+                timings.append((time.perf_counter() - started) / args.repeat * 1000)
+
+            print(f'{query_text:<20} {timings[0]:>10.2f} {like_query.count():>10,} '
+                  f'{timings[1]:>10.2f} {index_query.count():>11,}')
+
+
+if __name__ == '__main__':
+    main()
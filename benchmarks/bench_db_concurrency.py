@@ -0,0 +1,128 @@
+"""
+قياس إنتاجية القراءة في SQLite أثناء الكتابة المستمرة
+
+يقارن إعدادات المحرك السابقة (وضع journal العادي، وpool_pre_ping) بإعدادات
+db_profiles (WAL وPRAGMA). خيوط قراءة تنفذ استعلامات تجميع بينما يكتب خيط
+واحد دفعات متتالية، ويطبع عدد القراءات في الثانية وزمن p95 وأخطاء القفل
+وعدد دفعات الكتابة.
+
+    python benchmarks/bench_db_concurrency.py --readers 8 --seconds 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import db_profiles
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=200, help='عدد الصفوف في كل معاملة كتابة')
+    return parser.parse_args()
+
+
+def legacy_engine(url):
+    """المحرك كما كان في create_app قبل إعدادات db_profiles"""
+    return create_engine(url, pool_recycle=300, pool_pre_ping=True, pool_size=20)
+
+
+def tuned_engine(url):
+    config = {}
+    db_profiles.load_engine_config(config)
+    options = db_profiles.engine_options(url, config)
+    engine = create_engine(url, pool_size=20, **options)
+    db_profiles.configure_engine(engine, config)
+    return engine
+
+
+def seed(engine, rows):
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id INTEGER, '
+                                'course_id INTEGER, status TEXT, notes TEXT)'))
+        connection.execute(text('CREATE INDEX ix_attendance_course ON attendance (course_id, status)'))
+        connection.execute(
+            text('INSERT INTO attendance (student_id, course_id, status, notes) VALUES (:s, :c, :st, :n)'),
+            [{'s': rng.randrange(5000), 'c': rng.randrange(50), 'st': rng.choice(['present', 'absent', 'late']),
+              'n': 'x' * 40} for _ in range(rows)]
+        )
+
+
+def run(label, engine, args):
+    deadline = time.perf_counter() + args.seconds
+    latencies = []
+    errors = {'read': 0, 'write': 0}
+    writes = [0]
+    lock = threading.Lock()
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        "SELECT status, count(*) FROM attendance WHERE course_id = :c GROUP BY status"
+                    ), {'c': rng.randrange(50)}).all()
+                local.append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    errors['read'] += 1
+        with lock:
+            latencies.extend(local)
+
+    def writer():
+        rng = random.Random(0)
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(
+                        text('INSERT INTO attendance (student_id, course_id, status, notes) VALUES (:s, :c, :st, :n)'),
+                        [{'s': rng.randrange(5000), 'c': rng.randrange(50), 'st': 'present', 'n': 'y' * 40}
+                         for _ in range(args.batch)]
+                    )
+                    connection.execute(text('UPDATE attendance SET status = :st WHERE id = :id'),
+                                       {'st': 'late', 'id': rng.randrange(1, args.rows)})
+                writes[0] += 1
+            except OperationalError:
+                errors['write'] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(f'{label:<8} reads/s {len(latencies) / args.seconds:9.0f}  p95 {p95:7.2f} ms  '
+          f'write batches {writes[0]:6d}  lock errors read {errors["read"]} write {errors["write"]}')
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_db_')
+    for label, factory in (('legacy', legacy_engine), ('tuned', tuned_engine)):
+        url = f'sqlite:///{os.path.join(workdir, label + ".db")}'
+        engine = factory(url)
+        seed(engine, args.rows)
+        run(label, engine, args)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+قياس زمن استيراد التطبيق وإنشائه (ما يدفعه كل عامل gunicorn عند بدئه)
+
+ينفذ `from app import app` في عملية جديدة مع python -X importtime في مجلد
+مؤقت، ويطبع الزمن الكلي وأبطأ الوحدات، ويتحقق من أن الاستيراد لم يحمّل
+المكتبات المؤجلة (ReportLab وPillow والتشكيل العربي) ولم ينشئ ملفات قاعدة
+بيانات. مع --budget-ms يخرج بحالة 1 إذا تجاوز الزمن الحد أو خالف أحد الشرطين،
+فيصلح فحصاً في CI.
+
+    python benchmarks/bench_import_time.py --budget-ms 600
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# تُستورد عند أول استخدام أو في عملية gunicorn الرئيسية فقط
+DEFERRED_MODULES = ('reportlab', 'PIL', 'arabic_reshaper', 'bidi')
+
+SCRIPT = (
+    "import sys, time\n"
+    f"sys.path.insert(0, {ROOT!r})\n"
+    "started = time.perf_counter()\n"
+    "from app import app\n"
+    "print(f'{(time.perf_counter() - started) * 1000:.1f}')\n"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget-ms', type=float, help='أقصى زمن مقبول لـ from app import app')
+    parser.add_argument('--top', type=int, default=15, help='عدد الوحدات الأبطأ المعروضة')
+    parser.add_argument('--repeat', type=int, default=3, help='يؤخذ أسرع تشغيل')
+    return parser.parse_args()
+
+
+def run_once():
+    workdir = tempfile.mkdtemp(prefix='bench_import_')
+    environment = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT], cwd=workdir,
+                            env=environment, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    created = [name for name in os.listdir(workdir) if name != '__pycache__']
+    return float(result.stdout.strip().splitlines()[-1]), modules, created
+
+
+def main():
+    args = parse_args()
+    runs = [run_once() for _ in range(args.repeat)]
+    elapsed, modules, created = min(runs, key=lambda run: run[0])
+
+    print(f'from app import app: {elapsed:.1f} ms (best of {args.repeat}), {len(modules)} modules')
+    print(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    for name, self_us, cumulative_us in sorted(modules, key=lambda item: item[2], reverse=True)[:args.top]:
+        print(f'{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}')
+
+    loaded = sorted({name for name, _, _ in modules if name.split('.')[0] in DEFERRED_MODULES})
+    print(f'deferred modules loaded at import: {", ".join(loaded) or "none"}')
+    print(f'files created at import: {", ".join(created) or "none"}')
+
+    if args.budget_ms is not None:
+        failed = elapsed > args.budget_ms or loaded or created
+        print(f'budget {args.budget_ms:.0f} ms: {"FAIL" if failed else "OK"}')
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+قياس أثر الفهارس على استعلامات الحضور والدرجات والتسجيلات
+
+يولّد بيانات تجريبية في قاعدة SQLite مؤقتة، ثم يطبع خطة التنفيذ وزمن كل
+استعلام قبل إنشاء الفهارس وبعده.
+
+    python benchmarks/bench_indexes.py --students 20000 --courses 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=30, help='عدد الجلسات لكل دورة')
+    parser.add_argument('--enrollments', type=int, default=3, help='عدد الدورات لكل طالب')
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+
+def generate_dataset(db, args):
+    """توليد البيانات باستخدام إدخال جماعي"""
+    from sqlalchemy import insert
+    from models import User, Course, Enrollment, AttendanceSession, Attendance, Grade
+
+    rng = random.Random(42)
+    db.session.execute(insert(User), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': '-',
+         'role': 'teacher' if i < args.courses else 'student', 'full_name': f'مستخدم {i}',
+         'is_active': True}
+        for i in range(args.students + args.courses)
+    ])
+    db.session.execute(insert(Course), [
+        {'name': f'دورة {i}', 'teacher_id': i + 1, 'is_active': True}
+        for i in range(args.courses)
+    ])
+
+    students = range(args.courses + 1, args.courses + args.students + 1)
+    enrollments = []
+    course_students = {course_id: [] for course_id in range(1, args.courses + 1)}
+    for student_id in students:
+        for course_id in rng.sample(range(1, args.courses + 1), args.enrollments):
+            enrollments.append({'student_id': student_id, 'course_id': course_id,
+                                'is_active': rng.random() > 0.1})
+            course_students[course_id].append(student_id)
+    db.session.execute(insert(Enrollment), enrollments)
+
+    start = date.today() - timedelta(days=args.sessions * 7)
+    sessions = [
+        {'course_id': course_id, 'session_date': start + timedelta(days=7 * n + course_id % 7)}
+        for course_id in course_students for n in range(args.sessions)
+    ]
+    db.session.execute(insert(AttendanceSession), sessions)
+
+    statuses = ['present', 'present', 'present', 'absent', 'late', 'excused']
+    batch = []
+    for session_id, session in enumerate(sessions, start=1):
+        for student_id in course_students[session['course_id']]:
+            batch.append({'student_id': student_id, 'session_id': session_id,
+                          'status': rng.choice(statuses)})
+        if len(batch) >= 50000:
+            db.session.execute(insert(Attendance), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Attendance), batch)
+
+    db.session.execute(insert(Grade), [
+        {'student_id': row['student_id'], 'course_id': row['course_id'],
+         'assignment_name': f'واجب {n}', 'grade': rng.uniform(40, 100), 'max_grade': 100.0}
+        for row in enrollments for n in range(4)
+    ])
+    db.session.commit()
+
+
+def benchmark_queries(args):
+    """الاستعلامات الممثلة لصفحات المعلم والطالب والمدير"""
+    from sqlalchemy import func, case
+    from models import Course, Enrollment, AttendanceSession, Attendance, Grade
+    from utils import get_month_range
+
+    student_id = args.courses + args.students // 2
+    course_id = args.courses // 2 or 1
+    month_start, next_month_start = get_month_range()
+
+    return {
+        'attendance per student/course': lambda db: db.session.query(
+            func.count(Attendance.id),
+            func.sum(case((Attendance.status == 'present', 1), else_=0))
+        ).join(AttendanceSession).filter(
+            Attendance.student_id == student_id,
+            AttendanceSession.course_id == course_id
+        ),
+        'average grade per student/course': lambda db: db.session.query(
+            func.avg(Grade.grade)
+        ).filter(Grade.student_id == student_id, Grade.course_id == course_id),
+        'active enrollment lookup': lambda db: Enrollment.query.filter_by(
+            student_id=student_id, course_id=course_id, is_active=True
+        ),
+        'active students of course': lambda db: db.session.query(Enrollment.student_id).filter(
+            Enrollment.course_id == course_id, Enrollment.is_active == True
+        ),
+        'course sessions by date': lambda db: AttendanceSession.query.filter_by(
+            course_id=course_id
+        ).order_by(AttendanceSession.session_date.desc()),
+        'monthly attendance (date range)': lambda db: db.session.query(
+            func.count(Attendance.id),
+            func.sum(case((Attendance.status == 'present', 1), else_=0))
+        ).join(AttendanceSession).filter(
+            AttendanceSession.session_date >= month_start,
+            AttendanceSession.session_date < next_month_start
+        ),
+        'teacher monthly attendance': lambda db: db.session.query(
+            func.count(Attendance.id)
+        ).join(AttendanceSession).join(Course).filter(
+            Course.teacher_id == course_id,
+            AttendanceSession.session_date >= month_start,
+            AttendanceSession.session_date < next_month_start
+        ),
+    }
+
+
+def explain(db, query):
+    from sqlalchemy import text
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.execute(text(prefix + str(statement))).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def run(db, queries, repeat, label):
+    print(f'\n=== {label} ===')
+    for name, build in queries.items():
+        query = build(db)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query.all()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'{name:<36} {elapsed:9.3f} ms')
+        for line in explain(db, query):
+            print(f'    {line}')
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_indexes_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from sqlalchemy import text
+    from app import app, db, init_database
+
+    with app.app_context():
+        init_database()
+        indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+        started = time.perf_counter()
+        generate_dataset(db, args)
+        print(f'dataset generated in {time.perf_counter() - started:.1f}s')
+        for table in ('user', 'enrollment', 'attendance_session', 'attendance', 'grade'):
+            count = db.session.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+            print(f'  {table:<20} {count:>10,}')
+
+        queries = benchmark_queries(args)
+
+        for index in indexes:
+            index.drop(bind=db.engine, checkfirst=True)
+        db.session.execute(text('ANALYZE'))
+        run(db, queries, args.repeat, 'before (primary keys only)')
+
+        for index in indexes:
+            index.create(bind=db.engine, checkfirst=True)
+        db.session.execute(text('ANALYZE'))
+        run(db, queries, args.repeat, 'after (composite and partial indexes)')
+
+
+if __name__ == '__main__':
+    main()
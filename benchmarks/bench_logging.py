@@ -0,0 +1,95 @@
+"""
+قياس كلفة السجلات لكل طلب: الإعداد السابق مقابل logging_config
+
+الإعداد السابق logging.basicConfig(level=DEBUG): كل استعلام SQLAlchemy يُسجل
+ويُنسق ويُكتب في خيط الطلب. الجديد: المكتبات على WARNING، وما يُسجل يوضع في
+طابور ويُكتب في خيط آخر. كل وضع يعمل في عملية منفصلة (إعداد السجلات عام
+للعملية) ويطلب صفحة الدورات عدة مرات (دون عرض القالب)، والمخرجات إلى
+/dev/null.
+
+    python benchmarks/bench_logging.py --requests 500
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'legacy': 'basicConfig(level=DEBUG)، كل شيء في خيط الطلب',
+    'queue': 'logging_config بالمستويات الافتراضية',
+    'queue-debug': 'logging_config مع LOG_LEVEL=DEBUG وعينة DEBUG',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_mode(mode, requests):
+    import logging
+    from app import app, init_database, seed_default_data
+
+    if mode == 'legacy':
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for name in ('sqlalchemy', 'werkzeug', 'PIL', 'urllib3'):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        logging.basicConfig(level=logging.DEBUG)
+
+    with app.app_context():
+        init_database()
+        seed_default_data()
+
+    # القوالب ليست في المستودع: تُقاس الاستعلامات والسجلات دون عرض الصفحة
+    import routes
+    routes.render_template = lambda name, **context: name
+
+    emitted = [0]
+    counter = logging.Filter()
+    counter.filter = lambda record: emitted.__setitem__(0, emitted[0] + 1) or True
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(counter)
+
+    client = app.test_client()
+    client.get('/courses')
+    emitted[0] = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/courses')
+    elapsed = time.perf_counter() - started
+    print(f'{mode:<12} {elapsed / requests * 1e6:9.0f} us/request  {emitted[0] / requests:6.1f} records/request')
+
+
+def main():
+    args = parse_args()
+    if args.mode:
+        run_mode(args.mode, args.requests)
+        return
+
+    for mode, description in MODES.items():
+        workdir = tempfile.mkdtemp(prefix='bench_logging_')
+        environment = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        if mode == 'queue-debug':
+            environment['LOG_LEVEL'] = 'DEBUG'
+            environment['LOG_LEVELS'] = 'sqlalchemy.engine=DEBUG'
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                                 '--requests', str(args.requests)],
+                                cwd=workdir, env=environment, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+        if result.returncode != 0:
+            print(f'{mode:<12} failed with exit code {result.returncode}')
+            continue
+        print(f'{result.stdout.strip()}   ({description})')
+
+
+if __name__ == '__main__':
+    main()
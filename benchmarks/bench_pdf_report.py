@@ -0,0 +1,108 @@
+"""
+قياس زمن إنشاء تقرير PDF كبير بمحرك التقارير مقابل الطريقة السابقة
+
+الطريقة السابقة: جدول Table واحد بكل الصفوف وعروض أعمدة يقيسها ReportLab من كل
+الخلايا، وأنماط تُبنى في كل استدعاء، وملف في مجلد العمل. المحرك الجديد: LongTable
+مقسمة بعروض محسوبة من عينة، وتشكيل عربي مخزن مؤقتاً، وكتابة في الذاكرة.
+
+    python benchmarks/bench_pdf_report.py --rows 10000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+import reports
+
+NAMES = ['محمد', 'أحمد', 'عبدالله', 'خالد', 'فاطمة', 'نورة', 'سارة', 'عمر', 'يوسف', 'مريم']
+FAMILIES = ['الشمري', 'العتيبي', 'القحطاني', 'الغامدي', 'الزهراني', 'الدوسري', 'المطيري']
+COURSES = ['دورة البرمجة الأساسية', 'دورة تطوير المواقع', 'دورة قواعد البيانات', 'دورة الذكاء الاصطناعي']
+STATUSES = ['حاضر', 'غائب', 'متأخر', 'معذور']
+
+HEADERS = ['#', 'الطالب', 'الدورة', 'التاريخ', 'الحالة', 'الدرجة']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--skip-legacy', action='store_true', help='عدم قياس الطريقة السابقة (بطيئة جداً)')
+    parser.add_argument('--memory', action='store_true',
+                        help='قياس ذروة الذاكرة بـ tracemalloc (يبطئ التنفيذ عدة مرات فلا تُقارن الأزمنة)')
+    return parser.parse_args()
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    return [
+        [i, f'{rng.choice(NAMES)} {rng.choice(NAMES)} {rng.choice(FAMILIES)}', rng.choice(COURSES),
+         f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.choice(STATUSES),
+         round(rng.uniform(40, 100), 1)]
+        for i in range(1, count + 1)
+    ]
+
+
+def legacy_report(title, headers, data, filename):
+    """create_pdf_report كما كانت قبل محرك التقارير"""
+    doc = SimpleDocTemplate(filename, pagesize=A4)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontName='Helvetica-Bold',
+                                 fontSize=16, spaceAfter=30, alignment=1)
+    story = [Paragraph(title, title_style), Spacer(1, 20)]
+    table = Table([headers] + data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    story.append(table)
+    doc.build(story)
+
+
+def measure(label, function, memory=False):
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    line = f'{label:<28} {elapsed:8.2f}s'
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f'  peak {peak / 1024 / 1024:7.1f} MB'
+    print(line)
+    return result
+
+
+def main():
+    args = parse_args()
+    rows = make_rows(args.rows)
+    workdir = tempfile.mkdtemp(prefix='bench_pdf_')
+    print(f'{args.rows} rows, font: {reports.register_report_fonts()}')
+
+    if not args.skip_legacy:
+        measure('legacy Table', lambda: legacy_report('تقرير الحضور', HEADERS, [list(map(str, row)) for row in rows],
+                                                      os.path.join(workdir, 'legacy.pdf')), args.memory)
+    reports.shape_text.cache_clear()
+    buffer = measure('LongTable chunks (cold)',
+                     lambda: reports.build_pdf_report('تقرير الحضور', HEADERS, rows), args.memory)
+    measure('LongTable chunks (warm)', lambda: reports.build_pdf_report('تقرير الحضور', HEADERS, rows), args.memory)
+    print(f'PDF size: {len(buffer.getvalue()) / 1024:.0f} KB, shaping cache: {reports.shape_text.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
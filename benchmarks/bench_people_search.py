@@ -0,0 +1,101 @@
+"""
+قياس زمن الإكمال التلقائي للمستخدمين مقابل البحث بـ LIKE
+
+يولّد طلاباً بأسماء عربية وأرقام هواتف وبريد، ثم يقيس زمن أول عشر نتائج
+لكل بادئة بالطريقتين.
+
+    python benchmarks/bench_people_search.py --users 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST_NAMES = ['محمد', 'أحمد', 'عبدالله', 'خالد', 'فاطمة', 'نورة', 'سارة', 'عمر', 'يوسف', 'مريم',
+               'إبراهيم', 'ريم', 'سلمان', 'هند', 'فيصل', 'لينا', 'ماجد', 'أسماء', 'طارق', 'جود']
+FAMILY_NAMES = ['الشمري', 'العتيبي', 'القحطاني', 'الغامدي', 'الزهراني', 'الدوسري', 'المطيري',
+                'الحربي', 'السبيعي', 'العنزي', 'البقمي', 'الرشيدي', 'الشهري', 'المالكي']
+LATIN = {'محمد': 'mohammed', 'أحمد': 'ahmed', 'عبدالله': 'abdullah', 'خالد': 'khalid', 'فاطمة': 'fatima',
+         'نورة': 'noura', 'سارة': 'sara', 'عمر': 'omar', 'يوسف': 'yousef', 'مريم': 'maryam',
+         'إبراهيم': 'ibrahim', 'ريم': 'reem', 'سلمان': 'salman', 'هند': 'hind', 'فيصل': 'faisal',
+         'لينا': 'lina', 'ماجد': 'majed', 'أسماء': 'asma', 'طارق': 'tariq', 'جود': 'joud'}
+
+QUERIES = ['م', 'محم', 'احمد', 'عبدالله الشمري', 'فاطمه عتيبي', 'kha', 'sara_1', '0551', '5512345', 'زز']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_people_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+
+    from sqlalchemy import insert
+    from app import app, db, init_database
+    from models import User
+    from people_search import rebuild_user_search_index, autocomplete_users
+
+    rng = random.Random(42)
+    with app.app_context():
+        init_database()
+        started = time.perf_counter()
+        rows = []
+        for i in range(args.users):
+            first = rng.choice(FIRST_NAMES)
+            family = rng.choice(FAMILY_NAMES)
+            rows.append({
+                'username': f'{LATIN[first]}_{i}',
+                'email': f'{LATIN[first]}.{i}@example.com',
+                'password_hash': '-',
+                'role': 'student',
+                'full_name': f'{first} {rng.choice(FIRST_NAMES)} {family}',
+                'phone': f'05{rng.randrange(10 ** 8):08d}',
+                'is_active': True
+            })
+            if len(rows) >= 10000:
+                db.session.execute(insert(User), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(User), rows)
+        db.session.commit()
+        print(f'inserted {args.users:,} users in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        rebuild_user_search_index()
+        print(f'built search index in {time.perf_counter() - started:.1f}s\n')
+
+        print(f'{"query":<18} {"LIKE ms":>10} {"index ms":>10} {"results":>8}')
+        for query_text in QUERIES:
+            like_query = User.query.filter(
+                User.role == 'student',
+                (User.full_name.contains(query_text)) |
+                (User.username.contains(query_text)) |
+                (User.email.contains(query_text)) |
+                (User.phone.contains(query_text))
+            ).order_by(User.full_name).limit(10)
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                like_query.all()
+            like_ms = (time.perf_counter() - started) / args.repeat * 1000
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                results = autocomplete_users(query_text, 'student', limit=10)
+            index_ms = (time.perf_counter() - started) / args.repeat * 1000
+
+            print(f'{query_text:<18} {like_ms:>10.2f} {index_ms:>10.2f} {len(results):>8}')
+
+
+if __name__ == '__main__':
+    main()
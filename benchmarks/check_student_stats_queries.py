@@ -0,0 +1,169 @@
+"""
+فحص عدد استعلامات صفحة طلاب المعلم مع زيادة عدد الطلاب
+
+إحصائيات الحضور والدرجات في teacher.students تأتي من جدول StudentCourseStats
+بـ LEFT JOIN في نفس الاستعلام، فعدد الاستعلامات لا يتغير بعدد الطلاب. يولّد
+الفحص N طالباً في دورة للمعلم (مع جلسات حضور ودرجات) في قاعدة SQLite مؤقتة،
+ويعدّ الاستعلامات المنفذة (before_cursor_execute) لطلب الصفحة، ثم يضيف N
+طالباً آخرين ويعيد العد. يخرج بحالة 1 إذا اختلف العدد أو لم تطابق الإحصائيات
+المخزنة الحساب من الجداول الأصلية، فيصلح فحصاً في CI.
+
+    python benchmarks/check_student_stats_queries.py --students 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEACHER = ('teacher', '123456')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=200, help='عدد الطلاب في الجولة الأولى (ويُضاعف في الثانية)')
+    parser.add_argument('--sessions', type=int, default=5, help='عدد جلسات الحضور في الدورة')
+    parser.add_argument('--grades', type=int, default=3, help='عدد الدرجات لكل طالب')
+    return parser.parse_args()
+
+
+def add_students(db, course_id, session_ids, first, count, grades):
+    """إضافة طلاب مسجلين في الدورة مع حضورهم ودرجاتهم بإدخال جماعي"""
+    from sqlalchemy import insert, select
+    from models import User, Enrollment, Attendance, Grade
+    from stats import refresh_student_course_stats
+
+    usernames = [f'student{i}' for i in range(first, first + count)]
+    db.session.execute(insert(User), [
+        {'username': username, 'email': f'{username}@example.com', 'password_hash': '-',
+         'role': 'student', 'full_name': f'طالب {username}', 'is_active': True}
+        for username in usernames
+    ])
+    student_ids = db.session.execute(select(User.id).where(User.username.in_(usernames))).scalars().all()
+    db.session.execute(insert(Enrollment), [
+        {'student_id': student_id, 'course_id': course_id, 'is_active': True} for student_id in student_ids
+    ])
+    db.session.execute(insert(Attendance), [
+        {'student_id': student_id, 'session_id': session_id,
+         'status': 'present' if (student_id + session_id) % 3 else 'absent'}
+        for student_id in student_ids for session_id in session_ids
+    ])
+    db.session.execute(insert(Grade), [
+        {'student_id': student_id, 'course_id': course_id, 'assignment_name': f'تقييم {n}',
+         'grade': float((student_id * 7 + n) % 100), 'max_grade': 100.0, 'grade_type': 'quiz'}
+        for student_id in student_ids for n in range(grades)
+    ])
+    # الإدراج الجماعي يتجاوز أحداث الـ ORM
+    refresh_student_course_stats([(student_id, course_id) for student_id in student_ids])
+    db.session.commit()
+
+
+def count_statements(engine, function):
+    """عدد الاستعلامات المنفذة أثناء function()، مع نتيجتها"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        result = function()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return len(statements), result
+
+
+def measure(app, db, client, course_id):
+    """(استعلامات طلب الصفحة، عدد الصفوف، عدد الصفوف المخزنة المخالفة للحساب الأصلي)"""
+    from sqlalchemy import and_, select
+    from aggregates import with_student_course_stats
+    from models import Enrollment, StudentCourseStats
+
+    with app.app_context():
+        engine = db.engine
+
+    # طلب أول يملأ ما يُخزن بين الطلبات (المستخدم المسجل)، ثم يُعد الطلب الثاني
+    client.get('/teacher/students')
+    view_count, response = count_statements(engine, lambda: client.get('/teacher/students'))
+    if response.status_code != 200:
+        raise SystemExit(f'/teacher/students returned {response.status_code}')
+
+    with app.app_context():
+        query = db.session.query(Enrollment.student_id, StudentCourseStats).outerjoin(
+            StudentCourseStats, and_(
+                StudentCourseStats.student_id == Enrollment.student_id,
+                StudentCourseStats.course_id == Enrollment.course_id
+            )
+        ).filter(Enrollment.course_id == course_id)
+        query = with_student_course_stats(query, Enrollment.student_id, Enrollment.course_id,
+                                          course_ids=[course_id])
+        rows = query.all()
+        stale = sum(
+            1 for _, stats, total, present, avg, grade_count in rows
+            if stats is None or (stats.attendance_total, stats.present_count, stats.grade_count)
+            != (total, present, grade_count)
+        )
+    return view_count, len(rows), stale
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='check_stats_queries_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'check.db')}"
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(workdir)
+
+    from app import app, db, init_database, seed_default_data
+    from models import User, Course, AttendanceSession
+    import teacher
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # القوالب ليست في المستودع: تُعد الاستعلامات دون عرض الصفحة
+    teacher.render_template = lambda name, **context: name
+
+    with app.app_context():
+        init_database()
+        seed_default_data()
+        teacher_id = User.query.filter_by(username=TEACHER[0]).one().id
+        course = Course(name='دورة فحص الاستعلامات', teacher_id=teacher_id, is_active=True)
+        db.session.add(course)
+        db.session.flush()
+        start = date.today() - timedelta(days=7 * args.sessions)
+        sessions = [AttendanceSession(course_id=course.id, session_date=start + timedelta(days=7 * n))
+                    for n in range(args.sessions)]
+        db.session.add_all(sessions)
+        db.session.commit()
+        course_id = course.id
+        session_ids = [session.id for session in sessions]
+
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': TEACHER[0], 'password': TEACHER[1]})
+    if response.status_code != 302:
+        raise SystemExit(f'login failed with status {response.status_code}')
+
+    results = []
+    stale_rows = 0
+    added = 0
+    for target in (args.students, args.students * 2):
+        with app.app_context():
+            add_students(db, course_id, session_ids, added, target - added, args.grades)
+        added = target
+        view_count, rows, stale = measure(app, db, client, course_id)
+        print(f'{target:>7} students: /teacher/students {view_count:3d} queries, '
+              f'{stale} of {rows} stored stats rows stale')
+        results.append(view_count)
+        stale_rows += stale
+
+    failed = len(set(results)) != 1 or stale_rows > 0
+    print(f'constant query count: {"FAIL" if len(set(results)) != 1 else "OK"}, '
+          f'stored stats: {"FAIL" if stale_rows else "OK"}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
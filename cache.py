@@ -0,0 +1,90 @@
+"""
+تخزين مؤقت للمقاييس داخل العملية مع إبطال عند الكتابة
+
+كل مدخل له مدة صلاحية (TTL)، ويُبطَل عند commit أي تغيير على النماذج
+المتابعة. عند انتهاء الصلاحية يحسب طلب واحد فقط القيمة الجديدة بينما
+تنتظر الطلبات المتزامنة النتيجة نفسها.
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MetricsCache:
+    """مخزن مؤقت بسيط بمدة صلاحية وحماية من التدافع"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._generation = 0
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, generation = entry
+        if generation != self._generation or expires_at <= time.monotonic():
+            return None
+        return entry
+
+    def get_or_compute(self, key, compute):
+        """إرجاع القيمة المخزنة أو حسابها مرة واحدة فقط عند انتهاء صلاحيتها"""
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry[0]
+
+        with self._lock_for(key):
+            # قد يكون طلب آخر قد أكمل الحساب أثناء الانتظار
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[0]
+
+            generation = self._generation
+            value = compute()
+            self._entries[key] = (value, time.monotonic() + self.ttl, generation)
+            return value
+
+    def invalidate(self):
+        """إبطال جميع المدخلات، بما فيها أي حساب جارٍ بدأ قبل الإبطال"""
+        self._generation += 1
+        self._entries.clear()
+
+
+def invalidate_on_write(cache, *models):
+    """إبطال المخزن بعد commit أي كتابة على النماذج المحددة، بما فيها العمليات الجماعية"""
+    models = tuple(models)
+    marker = f'invalidate_cache_{id(cache)}'
+
+    @event.listens_for(Session, 'after_flush')
+    def mark_flush(session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, models):
+                session.info[marker] = True
+                return
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def mark_bulk(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, models):
+            orm_execute_state.session.info[marker] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def invalidate_after_commit(session):
+        if session.info.pop(marker, False):
+            cache.invalidate()
+
+    @event.listens_for(Session, 'after_rollback')
+    def clear_after_rollback(session):
+        session.info.pop(marker, None)
+
+    return cache
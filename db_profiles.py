@@ -0,0 +1,116 @@
+"""
+إعدادات محرك قاعدة البيانات حسب نوعها (من DATABASE_URL)
+
+SQLite: وضع WAL فيقرأ القراء أثناء الكتابة بدلاً من أن تحجبهم كل كتابة، مع
+synchronous=NORMAL (آمن مع WAL، ويؤجل fsync إلى نقاط الحفظ)، ومهلة انتظار
+القفل، وذاكرة مؤقتة وmmap أكبر. تُطبق في حدث connect لكل اتصال جديد، ولا حاجة
+لـ pool_pre_ping مع ملف محلي.
+
+PostgreSQL: حجم المجموعة من عدد خيوط العامل، والحد الأقصى (pool_size +
+max_overflow) من نصيب كل عملية من max_connections: عمليات التقارير والصور
+تُنشأ بـ fork من العامل فترث المحرك بنفس الحدود، فيُقسم الحد على العمال
+وعملياتهم معاً فلا تتجاوز كلها حد الخادم. مهلة للاستعلام وللمعاملة المتروكة تُرسل مع الاتصال، وpool_pre_ping
+معطل افتراضياً (جولة إضافية مع كل استعارة) ويُكتفى بـ pool_recycle.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# يستوردها gunicorn.conf.py أيضاً، فيُحسب حجم المجموعة من نفس عدد العمال الذي يشغله
+DEFAULT_WEB_CONCURRENCY = 2
+DEFAULT_WEB_THREADS = 1
+DEFAULT_REPORT_WORKERS = 2
+DEFAULT_IMAGE_WORKERS = 2
+
+
+def load_engine_config(config):
+    """قراءة إعدادات المحرك من البيئة إلى config التطبيق"""
+    # SQLite
+    config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 32 * 1024))
+
+    # PostgreSQL: عدد العمال (WEB_CONCURRENCY يقرؤه gunicorn أيضاً) وخيوط كل عامل،
+    # وعمليات التقارير والصور لكل عامل، وحد اتصالات الخادم مع اتصالات محجوزة
+    # لسطر الأوامر والصيانة
+    config['WEB_CONCURRENCY'] = int(os.environ.get('WEB_CONCURRENCY', DEFAULT_WEB_CONCURRENCY))
+    config['WEB_THREADS'] = int(os.environ.get('WEB_THREADS', DEFAULT_WEB_THREADS))
+    config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', DEFAULT_REPORT_WORKERS))
+    config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', DEFAULT_IMAGE_WORKERS))
+    config['DB_MAX_CONNECTIONS'] = int(os.environ.get('DB_MAX_CONNECTIONS', 100))
+    config['DB_RESERVED_CONNECTIONS'] = int(os.environ.get('DB_RESERVED_CONNECTIONS', 10))
+    config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 300))
+    config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '').lower() in ('1', 'true', 'yes')
+    config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS'] = int(os.environ.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 60000))
+
+
+def postgresql_pool_size(config):
+    """
+    (pool_size, max_overflow) لكل عملية من نصيبها من اتصالات الخادم
+
+    كل عامل ومعه REPORT_WORKERS عملية تقارير وIMAGE_WORKERS عملية صور (الأخيرة
+    لا تتصل حالياً لكنها ترث المحرك نفسه، فتُحسب احتياطاً).
+    """
+    processes = max(1, config['WEB_CONCURRENCY']) * (1 + config['REPORT_WORKERS'] + config['IMAGE_WORKERS'])
+    budget = max(1, (config['DB_MAX_CONNECTIONS'] - config['DB_RESERVED_CONNECTIONS']) // processes)
+    # اتصال لكل خيط طلب، وواحد لخيوط الخلفية (استدعاءات مجموعات العمليات)
+    pool_size = min(config['WEB_THREADS'] + 1, budget)
+    return pool_size, budget - pool_size
+
+
+def engine_options(database_url, config):
+    """خيارات create_engine (SQLALCHEMY_ENGINE_OPTIONS) حسب نوع قاعدة البيانات"""
+    backend = make_url(database_url).get_backend_name()
+    if backend == 'sqlite':
+        # مهلة انتظار القفل في pysqlite بالثواني، وتُعاد بالـ PRAGMA في configure_engine
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    if backend == 'postgresql':
+        pool_size, max_overflow = postgresql_pool_size(config)
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+            'connect_args': {
+                'application_name': 'student_management',
+                'options': (f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+                            f" -c idle_in_transaction_session_timeout={config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS']}"),
+            },
+        }
+
+    return {'pool_recycle': 300, 'pool_pre_ping': True}
+
+
+def sqlite_pragmas(config):
+    return (
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        # القيمة السالبة بالكيلوبايت
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),
+        ('temp_store', 'MEMORY'),
+    )
+
+
+def configure_engine(engine, config):
+    """تسجيل إعدادات الاتصال على المحرك (SQLite فقط) قبل أول اتصال"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
@@ -0,0 +1,234 @@
+"""
+تخزين المستندات حسب المحتوى مع إزالة التكرار
+
+يُحسب sha256 أثناء كتابة الملف المرفوع على القرص، ثم يُحفظ ملف واحد لكل بصمة
+(documents/ab/<digest>.pdf) في DocumentBlob، وتشير صفوف Document إليه عبر
+filename. فإذا رفع ثلاثون طالباً نفس الملف حُفظ مرة واحدة. ref_count يُحدَّث
+مع كل flush يضيف أو يحذف مستنداً، وتحذف gc_document_blobs الملفات التي لم يعد
+يشير إليها أي مستند.
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, select, insert, update, delete, exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+from app import db
+from models import Document, DocumentBlob
+
+BLOB_FOLDER = 'documents'
+TEMP_FOLDER = 'documents/.tmp'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+DIGEST_NAME = re.compile(r'^([0-9a-f]{64})\.[a-z0-9]+$')
+
+
+def blob_digest(filename):
+    """بصمة الملف من مساره (documents/ab/<digest>.pdf)، أو None للملفات القديمة"""
+    if not filename:
+        return None
+    match = DIGEST_NAME.match(os.path.basename(filename))
+    return match.group(1) if match else None
+
+
+def blob_path(digest, extension):
+    return f'{BLOB_FOLDER}/{digest[:2]}/{digest}.{extension}'
+
+
+def _full_path(path):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], path)
+
+
+def temp_upload_path():
+    """مسار ملف مؤقت على نفس القرص حتى يكون نقله إلى مكانه النهائي ذرياً"""
+    folder = _full_path(TEMP_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f'{uuid.uuid4().hex}.part')
+
+
+def _claim_blob(temp_path, digest, size, extension):
+    """
+    ربط الملف المؤقت بصف البصمة في معاملة واحدة، ويُرجع مسار الملف
+
+    يُحجز الصف قبل نقل الملف وتُحذف الصفوف في gc_document_blobs قبل حذف
+    ملفاتها، فلا يحذف التنظيف ملفاً رُفع للتو بنفس البصمة.
+    """
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        existing = connection.execute(
+            update(DocumentBlob).where(DocumentBlob.digest == digest).values(last_used_at=now)
+        ).rowcount
+        if existing:
+            path = connection.execute(
+                select(DocumentBlob.path).where(DocumentBlob.digest == digest)
+            ).scalar()
+            if os.path.exists(_full_path(path)):
+                os.remove(temp_path)
+                return path
+        else:
+            path = blob_path(digest, extension)
+            connection.execute(insert(DocumentBlob).values(
+                digest=digest, path=path, size=size, ref_count=0,
+                created_at=now, last_used_at=now
+            ))
+
+        os.makedirs(os.path.dirname(_full_path(path)), exist_ok=True)
+        os.replace(temp_path, _full_path(path))
+        return path
+
+
+def store_blob(temp_path, digest, size, extension):
+    """نقل ملف مكتوب مسبقاً (بصمته معروفة) إلى مخزن المستندات، ويُرجع مساره"""
+    try:
+        return _claim_blob(temp_path, digest, size, extension)
+    except IntegrityError:
+        # رفع متزامن لنفس الملف أنشأ الصف أولاً، فيُستخدم ملفه
+        return _claim_blob(temp_path, digest, size, extension)
+
+
+def store_document_file(stream, extension):
+    """
+    كتابة الملف المرفوع على القرص مع حساب بصمته في نفس المرور
+
+    يُرجع (المسار، البصمة، الحجم). لا يُنشئ صف Document؛ ref_count يزداد عند
+    حفظ المستند الذي يشير إلى المسار.
+    """
+    temp_path = temp_upload_path()
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as output:
+            while True:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                output.write(chunk)
+                size += len(chunk)
+            output.flush()
+            os.fsync(output.fileno())
+        digest = hasher.hexdigest()
+        return store_blob(temp_path, digest, size, extension.lower()), digest, size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def create_document(user_id, file, description=None):
+    """
+    حفظ ملف مرفوع كمستند للمستخدم، ويُضاف الصف للجلسة دون commit
+
+    يُرجع None إذا كان نوع الملف غير مسموح.
+    """
+    from utils import allowed_file
+    if not file or not file.filename or not allowed_file(file.filename, 'documents'):
+        return None
+
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    path, _, size = store_document_file(file.stream, extension)
+    document = Document(
+        user_id=user_id,
+        filename=path,
+        original_filename=file.filename[:200],
+        file_type=extension,
+        file_size=size,
+        description=description
+    )
+    db.session.add(document)
+    return document
+
+
+@event.listens_for(Session, 'after_flush')
+def update_blob_ref_counts(session, flush_context):
+    """تحديث ref_count للملفات التي أُضيف أو حُذف أو نُقل مستند يشير إليها"""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Document):
+            deltas[blob_digest(obj.filename)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Document):
+            history = attributes.get_history(obj, 'filename')
+            if history.deleted:
+                deltas[blob_digest(history.deleted[0])] -= 1
+                deltas[blob_digest(obj.filename)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Document):
+            history = attributes.get_history(obj, 'filename')
+            deltas[blob_digest(history.deleted[0] if history.deleted else obj.filename)] -= 1
+
+    deltas.pop(None, None)
+    if not any(deltas.values()):
+        return
+
+    connection = session.connection()
+    now = datetime.utcnow()
+    for digest, delta in deltas.items():
+        if delta:
+            connection.execute(
+                update(DocumentBlob).where(DocumentBlob.digest == digest).values(
+                    ref_count=DocumentBlob.ref_count + delta, last_used_at=now
+                )
+            )
+
+
+def rebuild_blob_ref_counts():
+    """إعادة حساب ref_count من جدول Document، بعد تعديلات تجاوزت الـ ORM"""
+    references = select(func.count(Document.id)).where(
+        Document.filename == DocumentBlob.path
+    ).scalar_subquery()
+    result = db.session.execute(update(DocumentBlob).values(ref_count=references))
+    db.session.commit()
+    return result.rowcount
+
+
+def gc_document_blobs(grace_minutes=60):
+    """
+    حذف ملفات المستندات التي لا يشير إليها أي مستند منذ grace_minutes
+
+    يُتحقق من عدم وجود مستند يشير للملف عند الحذف نفسه، فلا يعتمد الحذف على
+    ref_count وحده. تُحذف أيضاً الملفات المؤقتة المتروكة من رفع لم يكتمل.
+    تُرجع (عدد الملفات المحذوفة، البايتات المحررة).
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=grace_minutes)
+    candidates = db.session.execute(
+        select(DocumentBlob.digest, DocumentBlob.path, DocumentBlob.size).where(
+            DocumentBlob.ref_count <= 0, DocumentBlob.last_used_at < cutoff
+        )
+    ).all()
+    db.session.rollback()
+
+    removed = freed = 0
+    for digest, path, size in candidates:
+        with db.engine.begin() as connection:
+            deleted = connection.execute(
+                delete(DocumentBlob).where(
+                    DocumentBlob.digest == digest,
+                    DocumentBlob.last_used_at < cutoff,
+                    ~exists().where(Document.filename == path)
+                )
+            ).rowcount
+            # يُحذف الملف قبل إنهاء المعاملة، فأي رفع متزامن بنفس البصمة ينتظر الصف
+            if deleted:
+                try:
+                    os.remove(_full_path(path))
+                except FileNotFoundError:
+                    pass
+        if deleted:
+            removed += 1
+            freed += size
+
+    temp_folder = _full_path(TEMP_FOLDER)
+    if os.path.isdir(temp_folder):
+        cutoff_timestamp = time.time() - grace_minutes * 60
+        for entry in os.scandir(temp_folder):
+            if entry.is_file() and entry.stat().st_mtime < cutoff_timestamp:
+                os.remove(entry.path)
+    return removed, freed
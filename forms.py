@@ -1,8 +1,8 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, SelectField, TextAreaField, FloatField, IntegerField, DateField, RadioField, SubmitField, BooleanField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional, NumberRange
-from wtforms.widgets import TextArea
+from flask_wtf.file import FileField, FileAllowed, FileRequired
+from wtforms import StringField, PasswordField, SelectField, SelectMultipleField, TextAreaField, FloatField, IntegerField, DateField, RadioField, SubmitField, BooleanField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional, NumberRange, ValidationError
+from wtforms.widgets import TextArea, ListWidget, CheckboxInput
 
 class LoginForm(FlaskForm):
     username = StringField('اسم المستخدم', validators=[DataRequired(), Length(min=3, max=64)])
@@ -56,6 +56,25 @@ class AttendanceForm(FlaskForm):
     topic = StringField('موضوع الجلسة', validators=[Optional(), Length(max=200)])
     submit = SubmitField('إنشاء جلسة حضور')
 
+class RecurringAttendanceForm(FlaskForm):
+    start_date = DateField('من تاريخ', validators=[DataRequired()])
+    end_date = DateField('إلى تاريخ', validators=[DataRequired()])
+    weekdays = SelectMultipleField('أيام الأسبوع',
+                                 choices=[(5, 'السبت'), (6, 'الأحد'), (0, 'الاثنين'), (1, 'الثلاثاء'),
+                                        (2, 'الأربعاء'), (3, 'الخميس'), (4, 'الجمعة')],
+                                 coerce=int, validators=[DataRequired()],
+                                 option_widget=CheckboxInput(), widget=ListWidget(prefix_label=False))
+    session_time = StringField('وقت الجلسة', validators=[Optional(), Length(max=20)])
+    topic = StringField('موضوع الجلسة', validators=[Optional(), Length(max=200)])
+    submit = SubmitField('إنشاء الجدول')
+    
+    def validate_end_date(self, field):
+        if self.start_date.data and field.data:
+            if field.data < self.start_date.data:
+                raise ValidationError('تاريخ النهاية يجب أن يكون بعد تاريخ البداية')
+            if (field.data - self.start_date.data).days > 366:
+                raise ValidationError('لا يمكن أن تتجاوز مدة الجدول سنة واحدة')
+
 class GradeForm(FlaskForm):
     assignment_name = StringField('اسم الواجب/الامتحان', validators=[DataRequired(), Length(max=100)])
     grade_type = SelectField('نوع التقييم', 
@@ -66,6 +85,18 @@ class GradeForm(FlaskForm):
     notes = TextAreaField('ملاحظات', validators=[Optional()], widget=TextArea())
     submit = SubmitField('إضافة التقييم')
 
+class GradebookImportForm(FlaskForm):
+    gradebook_file = FileField('ملف الدرجات', validators=[FileRequired(), FileAllowed(['csv', 'tsv', 'txt'], 'ملفات CSV أو TSV فقط!')])
+    assignment_name = StringField('اسم الواجب/الامتحان', validators=[DataRequired(), Length(max=100)])
+    grade_type = SelectField('نوع التقييم', 
+                           choices=[('exam', 'امتحان'), ('quiz', 'اختبار قصير'), 
+                                  ('assignment', 'واجب'), ('project', 'مشروع')], 
+                           validators=[DataRequired()])
+    max_grade = FloatField('الدرجة الكاملة', validators=[DataRequired(), NumberRange(min=1)], default=100.0)
+    notes = TextAreaField('ملاحظات', validators=[Optional()], widget=TextArea())
+    dry_run = BooleanField('فحص الملف فقط دون حفظ', default=True)
+    submit = SubmitField('استيراد الدرجات')
+
 class EnrollmentForm(FlaskForm):
     student_id = SelectField('الطالب', choices=[], coerce=int, validators=[DataRequired()])
     course_id = SelectField('الدورة', choices=[], coerce=int, validators=[DataRequired()])
@@ -75,6 +106,18 @@ class EnrollmentForm(FlaskForm):
     amount_paid = FloatField('المبلغ المدفوع', validators=[Optional(), NumberRange(min=0)], default=0.0)
     submit = SubmitField('تسجيل الطالب')
 
+class NotificationForm(FlaskForm):
+    target = SelectField('المستلمون', 
+                        choices=[('course', 'طلاب دورة'), ('role', 'حسب الدور')], 
+                        validators=[DataRequired()])
+    course_id = SelectField('الدورة', choices=[], coerce=int, validators=[Optional()])
+    role = SelectField('الدور', 
+                      choices=[('student', 'الطلاب'), ('teacher', 'المعلمون'), ('admin', 'المديرون')], 
+                      validators=[Optional()])
+    title = StringField('العنوان', validators=[DataRequired(), Length(max=200)])
+    message = TextAreaField('نص الإشعار', validators=[DataRequired()], widget=TextArea())
+    submit = SubmitField('إرسال')
+
 class ProfileUpdateForm(FlaskForm):
     full_name = StringField('الاسم الكامل', validators=[DataRequired(), Length(max=100)])
     email = StringField('البريد الإلكتروني', validators=[DataRequired(), Email()])
@@ -0,0 +1,155 @@
+"""
+استيراد كشوف الدرجات من ملفات CSV/TSV
+
+يُقرأ الملف سطراً بسطر دون تحميله كاملاً، ويُتحقق من كل صف مقابل قائمة
+طلاب الدورة المحملة مرة واحدة، ثم تُدرج الدرجات الصالحة دفعة واحدة.
+"""
+import csv
+import io
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from app import db
+from models import User, Enrollment, Grade
+from stats import refresh_student_course_stats
+
+STUDENT_COLUMNS = ('student_id', 'username', 'رقم الطالب', 'اسم المستخدم')
+GRADE_COLUMNS = ('grade', 'الدرجة')
+NOTES_COLUMNS = ('notes', 'ملاحظات')
+
+GRADE_INSERT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+# UTF-8 (مع BOM أو دونه) ثم ترميز Windows العربي
+FILE_ENCODINGS = ('utf-8-sig', 'cp1256')
+
+ARABIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩٫', '0123456789.')
+
+
+def _find_column(fieldnames, candidates):
+    normalized = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def _enrolled_students(course_id):
+    """طلاب الدورة النشطون كقاموسين: بالرقم وباسم المستخدم"""
+    rows = db.session.execute(
+        select(User.id, User.username).join(
+            Enrollment, Enrollment.student_id == User.id
+        ).where(
+            Enrollment.course_id == course_id,
+            Enrollment.is_active == True,
+            User.is_active == True
+        )
+    ).all()
+    by_id = {str(student_id): student_id for student_id, _ in rows}
+    by_username = {username.lower(): student_id for student_id, username in rows}
+    return by_id, by_username
+
+
+def parse_gradebook(file_storage, course_id, max_grade):
+    """
+    قراءة الملف والتحقق من صفوفه
+
+    تُرجع (grades, errors) حيث grades قائمة (student_id, grade, notes) وerrors
+    قائمة (رقم السطر، رسالة). يُقرأ الملف UTF-8، فإذا لم يكن كذلك يُعاد من
+    بدايته بترميز cp1256 (تصدير Excel المعتاد لملفات CSV العربية).
+    """
+    raw = file_storage.stream
+    for encoding in FILE_ENCODINGS:
+        stream = io.TextIOWrapper(raw, encoding=encoding, newline='')
+        try:
+            return _parse_rows(stream, course_id, max_grade)
+        except UnicodeDecodeError:
+            pass
+        finally:
+            stream.detach()
+        if not raw.seekable():
+            break
+        raw.seek(0)
+    return [], [(1, 'تعذرت قراءة ترميز الملف، يرجى حفظه بترميز UTF-8')]
+
+
+def _parse_rows(stream, course_id, max_grade):
+    first_line = stream.readline()
+    delimiter = '\t' if '\t' in first_line else ','
+    try:
+        fieldnames = next(csv.reader([first_line], delimiter=delimiter), [])
+    except csv.Error as e:
+        return [], [(1, f'سطر العناوين غير صالح: {e}')]
+
+    student_column = _find_column(fieldnames, STUDENT_COLUMNS)
+    grade_column = _find_column(fieldnames, GRADE_COLUMNS)
+    notes_column = _find_column(fieldnames, NOTES_COLUMNS)
+
+    if not student_column or not grade_column:
+        return [], [(1, 'يجب أن يحتوي الملف على عمود للطالب (student_id أو username) وعمود للدرجة (grade)')]
+
+    by_id, by_username = _enrolled_students(course_id)
+    grades = []
+    errors = []
+    seen = {}
+
+    reader = csv.DictReader(stream, fieldnames=fieldnames, delimiter=delimiter)
+    try:
+        for line_number, row in enumerate(reader, start=2):
+            student_key = (row.get(student_column) or '').strip()
+            grade_text = (row.get(grade_column) or '').strip().translate(ARABIC_DIGITS)
+
+            if not student_key and not grade_text:
+                continue
+
+            student_id = by_id.get(student_key) or by_username.get(student_key.lower())
+            if student_id is None:
+                errors.append((line_number, f'الطالب "{student_key}" غير مسجل في هذه الدورة'))
+                continue
+
+            if student_id in seen:
+                errors.append((line_number, f'الطالب "{student_key}" مكرر (السطر {seen[student_id]})'))
+                continue
+            seen[student_id] = line_number
+
+            try:
+                grade_value = float(grade_text)
+            except ValueError:
+                errors.append((line_number, f'الدرجة "{grade_text}" ليست رقماً'))
+                continue
+
+            if not 0 <= grade_value <= max_grade:
+                errors.append((line_number, f'الدرجة {grade_value} خارج النطاق 0 - {max_grade}'))
+                continue
+
+            notes = (row.get(notes_column) or '').strip() if notes_column else ''
+            grades.append((student_id, grade_value, notes or None))
+    except csv.Error as e:
+        # لا تُتابع القراءة بعد سطر تالف؛ line_num عدد الأسطر المقروءة بعد سطر العناوين
+        errors.append((reader.line_num + 2, f'الملف غير صالح: {e}'))
+
+    return grades, errors
+
+
+def import_grades(course_id, grades, assignment_name, grade_type, max_grade, notes=None):
+    """إدراج الدرجات دفعة واحدة دون commit، وتُرجع عدد الدرجات المدرجة"""
+    now = datetime.utcnow()
+    for start in range(0, len(grades), GRADE_INSERT_CHUNK_SIZE):
+        db.session.execute(insert(Grade), [
+            {
+                'student_id': student_id,
+                'course_id': course_id,
+                'assignment_name': assignment_name,
+                'grade': grade_value,
+                'max_grade': max_grade,
+                'grade_type': grade_type,
+                'date_recorded': now,
+                'notes': row_notes or notes
+            }
+            for student_id, grade_value, row_notes in grades[start:start + GRADE_INSERT_CHUNK_SIZE]
+        ])
+
+    # الإدراج الجماعي يتجاوز أحداث الـ ORM فتُحدَّث الإحصائيات صراحةً
+    refresh_student_course_stats([(student_id, course_id) for student_id, _, _ in grades])
+    return len(grades)
@@ -0,0 +1,38 @@
+"""
+إعدادات gunicorn
+
+    flask --app main init-db
+    gunicorn -c gunicorn.conf.py main:app
+
+مع preload_app يُنشأ التطبيق مرة في العملية الرئيسية وتُستورد المكتبات الثقيلة
+(ReportLab والخط العربي وPillow) قبل fork، فيتشارك العمال صفحات ذاكرتها ويبدأ
+كل عامل دون استيرادها. create_app لا يتصل بقاعدة البيانات، ومع ذلك تُترك أي
+اتصالات موروثة في كل عامل جديد.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_profiles import DEFAULT_WEB_CONCURRENCY, DEFAULT_WEB_THREADS
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# نفس القيم والافتراضيات التي يحسب منها db_profiles حجم مجموعة اتصالات PostgreSQL
+workers = int(os.environ.get('WEB_CONCURRENCY', DEFAULT_WEB_CONCURRENCY))
+threads = int(os.environ.get('WEB_THREADS', DEFAULT_WEB_THREADS))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app import app, preload_heavy_modules
+        preload_heavy_modules(app)
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app import app, db
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
@@ -0,0 +1,208 @@
+"""
+معالجة الصور المرفوعة خارج الطلب
+
+يُحفظ الملف الأصلي فوراً بعد فحص ترويسته (النوع والأبعاد)، ثم تُنشأ النسخ
+المصغرة (thumb وmedium بصيغتي JPEG وWebP) في مجموعة عمليات منفصلة فلا
+يتحمل الطلب زمن فك الصورة وتصغيرها ولا ذاكرتها. حالة كل صورة في جدول
+ImageUpload، وتعرض القوالب صورة بديلة حتى تصبح النسخ جاهزة.
+"""
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import insert, select, update
+
+from app import db
+from models import ImageUpload
+
+DEFAULT_MAX_IMAGE_PIXELS = 40_000_000
+THUMBNAIL_SIZE = (160, 160)
+
+# (الصيغة، الامتداد، خيارات الحفظ) لكل نسخة
+RENDITION_FORMATS = (
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+)
+
+PLACEHOLDER_IMAGE = 'img/placeholder.svg'
+
+
+def rendition_path(path, name, extension='jpg'):
+    """مسار النسخة المصغرة بجانب الأصل: profiles/abc.png -> profiles/abc_thumb.jpg"""
+    stem = path.rsplit('.', 1)[0]
+    return f'{stem}_{name}.{extension}'
+
+
+def check_image(stream, max_pixels):
+    """
+    فحص ترويسة الصورة دون فك بياناتها، ويُرجع رسالة خطأ أو None
+
+    يُعاد مؤشر الملف إلى البداية ليُحفظ كما هو.
+    """
+    # Pillow يُستورد عند أول صورة وليس عند بدء التطبيق
+    from PIL import Image
+    try:
+        with Image.open(stream) as image:
+            width, height = image.size
+            image_format = image.format
+    except (Image.DecompressionBombError, OSError, ValueError):
+        return 'الملف ليس صورة صالحة'
+    finally:
+        stream.seek(0)
+    if image_format not in ('JPEG', 'PNG', 'GIF', 'WEBP'):
+        return 'صيغة الصورة غير مدعومة'
+    if width * height > max_pixels:
+        return 'أبعاد الصورة كبيرة جداً'
+    return None
+
+
+def render_image(source, renditions, max_pixels):
+    """
+    إنشاء النسخ المصغرة لصورة واحدة، وتُنفذ داخل عملية المعالجة
+
+    renditions قائمة (name, (width, height)) من الأكبر للأصغر. تُرجع مسارات
+    الملفات المكتوبة.
+    """
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    warnings.simplefilter('error', Image.DecompressionBombWarning)
+
+    written = []
+    with Image.open(source) as image:
+        largest = max(size for _, size in renditions)
+        # فك JPEG بدقة مخفضة مباشرة (1/2، 1/4، 1/8) بدلاً من فك الصورة كاملة
+        image.draft('RGB', largest)
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        for name, size in renditions:
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            for image_format, extension, options in RENDITION_FORMATS:
+                target = rendition_path(source, name, extension)
+                image.save(target + '.tmp', image_format, **options)
+                os.replace(target + '.tmp', target)
+                written.append(target)
+    return written
+
+
+def _renditions(medium_size=(800, 800)):
+    return [('medium', tuple(medium_size)), ('thumb', THUMBNAIL_SIZE)]
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # fork: عمليات المعالجة لا تحتاج إلا Pillow، ولا يُعاد استيراد التطبيق فيها
+                _pool = ProcessPoolExecutor(
+                    max_workers=current_app.config['IMAGE_WORKERS'],
+                    mp_context=multiprocessing.get_context('fork')
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _set_status(app, path, status, error=None):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(ImageUpload).where(ImageUpload.path == path).values(
+                    status=status, error=error, processed_at=datetime.utcnow()
+                )
+            )
+
+
+def schedule_renditions(path, medium_size=(800, 800)):
+    """
+    تسجيل الصورة كـ pending وإرسالها لعمليات المعالجة
+
+    يُسجل الصف في معاملة مستقلة حتى تجده العملية عند الانتهاء مهما كانت نتيجة
+    معاملة الطلب.
+    """
+    app = current_app._get_current_object()
+    with db.engine.begin() as connection:
+        connection.execute(insert(ImageUpload).values(path=path, status='pending',
+                                                      created_at=datetime.utcnow()))
+
+    future = _get_pool().submit(render_image, os.path.join(app.config['UPLOAD_FOLDER'], path),
+                                _renditions(medium_size), app.config['IMAGE_MAX_PIXELS'])
+
+    def done(future):
+        error = future.exception()
+        if error is None:
+            _set_status(app, path, 'ready')
+        else:
+            app.logger.error(f"خطأ في معالجة الصورة {path}: {error}")
+            _set_status(app, path, 'failed', str(error)[:500])
+
+    future.add_done_callback(done)
+    return future
+
+
+def process_pending_images(older_than_minutes=10):
+    """
+    معالجة الصور العالقة (توقفت العملية قبل تحديث حالتها) أو الفاشلة
+
+    تُنفذ مباشرة في العملية الحالية، للاستخدام من سطر الأوامر. تُرجع
+    (عدد الصور الجاهزة، عدد الفاشلة).
+    """
+    app = current_app._get_current_object()
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    paths = db.session.execute(
+        select(ImageUpload.path).where(
+            (ImageUpload.status == 'failed') |
+            ((ImageUpload.status == 'pending') & (ImageUpload.created_at < cutoff))
+        )
+    ).scalars().all()
+
+    ready = failed = 0
+    for path in paths:
+        try:
+            render_image(os.path.join(app.config['UPLOAD_FOLDER'], path),
+                         _renditions(), app.config['IMAGE_MAX_PIXELS'])
+        except Exception as e:
+            _set_status(app, path, 'failed', str(e)[:500])
+            failed += 1
+        else:
+            _set_status(app, path, 'ready')
+            ready += 1
+    return ready, failed
+
+
+def image_rendition(path, name='thumb', extension='jpg'):
+    """
+    مسار النسخة المطلوبة للقوالب، أو None حتى تصبح جاهزة (فتُعرض الصورة البديلة)
+
+    الصور المرفوعة قبل المعالجة الخلفية ليس لها صف، فيُرجع مسارها الأصلي.
+    الحالات تُحفظ لكل طلب حتى لا تتكرر الاستعلامات في القوائم.
+    """
+    if not path:
+        return None
+    statuses = g.setdefault('image_statuses', {})
+    if path not in statuses:
+        statuses[path] = db.session.execute(
+            select(ImageUpload.status).where(ImageUpload.path == path)
+        ).scalar()
+    status = statuses[path]
+    if status is None:
+        return path
+    if status != 'ready':
+        return None
+    return rendition_path(path, name, extension)
@@ -0,0 +1,168 @@
+"""
+إعداد السجلات: طابور بين خيط الطلب والكتابة، وسجلات JSON برقم الطلب
+
+خيط الطلب يضيف رقم الطلب إلى السجل ويضعه في طابور في الذاكرة فقط. تنسيق
+الرسالة وتحويلها إلى JSON والكتابة إلى stderr تتم في خيط QueueListener
+واحد. المستويات من LOG_LEVEL (الجذر) وLOG_LEVELS لكل logger، مثلاً:
+
+    LOG_LEVEL=INFO LOG_LEVELS="sqlalchemy.engine=WARNING,report_jobs=DEBUG"
+
+سجلات DEBUG كثيرة التكرار تُؤخذ منها عينة: الأول ثم واحد من كل
+LOG_DEBUG_SAMPLE_EVERY لكل (logger، نص الرسالة)، وتُسقط البقية قبل الطابور.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# مكتبات كثيرة السجلات تبقى على WARNING ما لم تُحدد في LOG_LEVELS
+DEFAULT_LOGGER_LEVELS = {
+    'sqlalchemy': 'WARNING',
+    'werkzeug': 'INFO',
+    'PIL': 'WARNING',
+    'urllib3': 'WARNING',
+}
+
+_state = {'handler': None, 'listener': None, 'formatter': None}
+
+
+class JsonFormatter(logging.Formatter):
+    """سجل واحد في سطر JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    QueueHandler لا ينسق الرسالة في خيط الطلب
+
+    QueueHandler الأصلي ينسق كل سجل قبل وضعه في الطابور. هنا يُضاف رقم الطلب
+    فقط (لا يُعرف خارج خيط الطلب) ويُنسق السجل في خيط الكتابة، فلا تُعدل
+    المعاملات (args) بعد تسجيلها.
+    """
+
+    def prepare(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return record
+
+
+class DebugSampler(logging.Filter):
+    """يُمرر أول سجل DEBUG لكل (logger، نص الرسالة) ثم واحداً من كل every"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            count = self.counts.get(key, 0)
+            if len(self.counts) >= 10000:
+                self.counts.clear()
+            self.counts[key] = count + 1
+        return count % self.every == 0
+
+
+def parse_levels(value):
+    """'a=DEBUG,b.c=WARNING' -> {'a': 'DEBUG', 'b.c': 'WARNING'}"""
+    levels = {}
+    for item in (value or '').split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener(handler):
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(_state['formatter'])
+    handler.queue = queue.SimpleQueue()
+    listener = QueueListener(handler.queue, output, respect_handler_level=False)
+    listener.start()
+    _state['listener'] = listener
+
+
+def _restart_after_fork():
+    # خيط الكتابة لا ينتقل مع fork (عمليات معالجة الصور والتقارير)، فيُبدأ
+    # خيط وطابور جديدان في الابن
+    if _state['handler'] is not None:
+        _start_listener(_state['handler'])
+
+
+def configure_logging(config):
+    """تركيب خط السجلات مرة واحدة للعملية، وقراءة إعداداته من البيئة إلى config"""
+    config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    config['LOG_LEVELS'] = os.environ.get('LOG_LEVELS', '')
+    config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+    config['LOG_DEBUG_SAMPLE_EVERY'] = int(os.environ.get('LOG_DEBUG_SAMPLE_EVERY', 10))
+    if _state['handler'] is not None:
+        return
+
+    if config['LOG_FORMAT'] == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s')
+
+    handler = RequestQueueHandler(queue.SimpleQueue())
+    handler.addFilter(DebugSampler(config['LOG_DEBUG_SAMPLE_EVERY']))
+    _state.update(handler=handler, formatter=formatter)
+    _start_listener(handler)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config['LOG_LEVEL'])
+    for name, level in {**DEFAULT_LOGGER_LEVELS, **parse_levels(config['LOG_LEVELS'])}.items():
+        logging.getLogger(name).setLevel(level)
+
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """كتابة ما تبقى في الطابور، عند خروج العملية"""
+    listener = _state['listener']
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def assign_request_id():
+    """before_request: رقم الطلب من X-Request-ID (من الخادم الأمامي) أو رقم جديد"""
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = request_id if _REQUEST_ID.match(request_id) else uuid.uuid4().hex
+
+
+def add_request_id_header(response):
+    """after_request: إرجاع رقم الطلب ليُربط بسجلاته"""
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
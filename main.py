@@ -1,4 +1,9 @@
-from app import app
+from app import app, init_database, seed_default_data
 
 if __name__ == '__main__':
+    # خادم التطوير: إنشاء الجداول والبيانات الافتراضية قبل التشغيل، وفي النشر
+    # يُنفذ ذلك بـ flask init-db
+    with app.app_context():
+        init_database()
+        seed_default_data()
     app.run(host='0.0.0.0', port=5000, debug=True)
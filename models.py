@@ -18,6 +18,12 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    # الفهارس: عدّ المستخدمين حسب الدور والحالة، وقوائم المستخدمين بترتيب الإضافة
+    __table_args__ = (
+        db.Index('ix_user_role_active', 'role', 'is_active'),
+        db.Index('ix_user_role_created', 'role', 'created_at', 'id'),
+    )
+    
     # Relationships
     taught_courses = db.relationship('Course', backref='teacher', lazy=True)
     student_enrollments = db.relationship('Enrollment', backref='student', lazy=True)
@@ -37,6 +43,13 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    # الفهارس: دورات المعلم النشطة، وقائمة الدورات بترتيب الإضافة
+    __table_args__ = (
+        db.Index('ix_course_teacher_active', 'teacher_id',
+                 sqlite_where=is_active == True, postgresql_where=is_active == True),
+        db.Index('ix_course_created', 'created_at', 'id'),
+    )
+    
     # Relationships
     enrollments = db.relationship('Enrollment', backref='course', lazy=True)
     attendance_sessions = db.relationship('AttendanceSession', backref='course', lazy=True)
@@ -50,6 +63,13 @@ class Enrollment(db.Model):
     payment_status = db.Column(db.String(20), default='pending')  # pending, paid, partial
     amount_paid = db.Column(db.Float, default=0.0)
     is_active = db.Column(db.Boolean, default=True)
+    
+    # الفهارس: تسجيلات الطالب، وطلاب الدورة النشطون (فهرس جزئي حيث يدعمه المحرك)
+    __table_args__ = (
+        db.Index('ix_enrollment_student_course_active', 'student_id', 'course_id', 'is_active'),
+        db.Index('ix_enrollment_course_student_active', 'course_id', 'student_id',
+                 sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class AttendanceSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -59,6 +79,12 @@ class AttendanceSession(db.Model):
     topic = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # الفهارس: جلسات الدورة مرتبة بالتاريخ، وجلسات فترة زمنية لكل الدورات
+    __table_args__ = (
+        db.Index('ix_attendance_session_course_date', 'course_id', 'session_date'),
+        db.Index('ix_attendance_session_date', 'session_date'),
+    )
+    
     # Relationships
     attendance_records = db.relationship('Attendance', backref='session', lazy=True)
 
@@ -66,20 +92,66 @@ class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     session_id = db.Column(db.Integer, db.ForeignKey('attendance_session.id'), nullable=False)
-    status = db.Column(db.String(20), default='absent')  # present, absent, late, excused
+    # active_history لحفظ القيمة السابقة عند التعديل حتى تُحدَّث الإحصائيات بدقة
+    status = db.column_property(db.Column(db.String(20), default='absent'), active_history=True)  # present, absent, late, excused
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # الفهارس: سجل الطالب في الجلسة، وتوزيع الحالات داخل الجلسة
+    __table_args__ = (
+        db.Index('ix_attendance_student_session', 'student_id', 'session_id'),
+        db.Index('ix_attendance_session_status', 'session_id', 'status'),
+    )
 
 class Grade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     assignment_name = db.Column(db.String(100), nullable=False)
-    grade = db.Column(db.Float, nullable=False)
+    grade = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
     max_grade = db.Column(db.Float, default=100.0)
     grade_type = db.Column(db.String(50))  # exam, quiz, assignment, project
     date_recorded = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
+    
+    # الفهارس: درجات الطالب في الدورة، وأحدث درجات الدورة
+    __table_args__ = (
+        db.Index('ix_grade_student_course', 'student_id', 'course_id'),
+        db.Index('ix_grade_course_date', 'course_id', 'date_recorded'),
+    )
+
+class StudentCourseStats(db.Model):
+    """إحصائيات مجمّعة لكل طالب في كل دورة، تُحدَّث تلقائياً مع الحضور والدرجات"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    
+    # الحضور حسب الحالة
+    attendance_total = db.Column(db.Integer, nullable=False, default=0)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    excused_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # الدرجات
+    grade_sum = db.Column(db.Float, nullable=False, default=0.0)
+    grade_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    last_activity = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('student_id', 'course_id', name='unique_student_course_stats'),)
+    
+    def get_attendance_rate(self):
+        """نسبة الحضور المئوية"""
+        if not self.attendance_total:
+            return 0
+        return round((self.present_count / self.attendance_total) * 100, 1)
+    
+    def get_average_grade(self):
+        """متوسط الدرجات"""
+        if not self.grade_count:
+            return 0
+        return round(self.grade_sum / self.grade_count, 1)
 
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -94,6 +166,54 @@ class Document(db.Model):
     # Relationship
     user = db.relationship('User', backref='documents')
 
+class DocumentBlob(db.Model):
+    """ملف مستند واحد لكل بصمة sha256 مهما تكرر رفعه، وref_count عدد صفوف Document التي تشير إليه"""
+    digest = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(200), nullable=False, unique=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # آخر رفع أو إشارة، حتى لا يحذف التنظيف ملفاً يُربط به مستند في هذه اللحظة
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_document_blob_unreferenced', 'ref_count', 'last_used_at'),
+    )
+
+class UploadSession(db.Model):
+    """رفع مستند كبير على أجزاء يمكن استئنافه؛ الأجزاء تُكتب مباشرة في ملف مؤقت بحجمه النهائي"""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    # بصمة sha256 للملف كاملاً إذا أرسلها العميل، للتحقق عند الإكمال
+    expected_digest = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, complete
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_upload_session_status_updated', 'status', 'updated_at'),
+    )
+
+class UploadChunk(db.Model):
+    """جزء وصل وتحقق من بصمته، فيعرف العميل عند الاستئناف ما بقي"""
+    upload_id = db.Column(db.String(32), db.ForeignKey('upload_session.id', ondelete='CASCADE'), primary_key=True)
+    index = db.Column(db.Integer, primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)
+
+class ImageUpload(db.Model):
+    """حالة معالجة الصورة المرفوعة: pending حتى تُنشأ نسخها المصغرة، ثم ready أو failed"""
+    path = db.Column(db.String(200), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -102,9 +222,77 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # الفهارس: إشعارات المستخدم غير المقروءة مرتبة بالأحدث
+    __table_args__ = (
+        db.Index('ix_notification_user_read_created', 'user_id', 'is_read', 'created_at'),
+    )
+    
     # Relationship
     user = db.relationship('User', backref='notifications')
 
+class NotificationCounter(db.Model):
+    """عداد الإشعارات غير المقروءة لكل مستخدم لعرض شارة الإشعارات دون COUNT"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserVersion(db.Model):
+    """رقم إصدار لكل مستخدم يزداد مع كل تعديل، لإبطال نسخة المستخدم المخزنة مؤقتاً"""
+    # دون مفتاح أجنبي ليبقى الرقم بعد حذف المستخدم فتُبطل نسخه في العمال الآخرين
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReplicaHeartbeat(db.Model):
+    """صف واحد يُحدث مع الكتابة على القاعدة الرئيسية، والفرق بين قيمته فيها وفي النسخة المقروءة هو تأخر النسخة"""
+    id = db.Column(db.Integer, primary_key=True)
+    written_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DataVersion(db.Model):
+    """رقم إصدار لكل جدول يزداد مع كل كتابة عليه، ليكون جزءاً من مفتاح تخزين نتائج التقارير"""
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReportJob(db.Model):
+    """مهمة تقرير في طابور المعالجة الخلفية، ونتيجتها المخزنة"""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    # بصمة (نوع التقرير، صيغته، معاملاته، إصدارات جداوله): التقارير المتطابقة تشترك في النتيجة
+    cache_key = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.Integer)
+    result_path = db.Column(db.String(200))
+    result_size = db.Column(db.BigInteger)
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    # الفهارس: البحث عن نتيجة مخزنة بالمفتاح، والطابور بترتيب الإضافة
+    __table_args__ = (
+        db.Index('ix_report_job_cache_key', 'cache_key', 'status', 'finished_at'),
+        db.Index('ix_report_job_status_created', 'status', 'created_at'),
+    )
+
+
+class UserSearchTerm(db.Model):
+    """كلمات البحث الموحدة لكل مستخدم (الاسم، اسم المستخدم، البريد، الهاتف) للبحث بالبادئة"""
+    # ترتيب البايتات في PostgreSQL ليعمل البحث بالمدى على الفهرس كما في SQLite
+    role = db.Column(db.String(20).with_variant(db.String(20, collation='C'), 'postgresql'), primary_key=True)
+    term = db.Column(db.String(64).with_variant(db.String(64, collation='C'), 'postgresql'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+
+    # الفهارس: التحقق من بقية كلمات البحث لنفس المستخدم
+    __table_args__ = (
+        db.Index('ix_user_search_term_user_term', 'user_id', 'term'),
+    )
+
 
 class TeacherEvaluation(db.Model):
     """نموذج تقييم المعلمين من قبل الطلاب"""
@@ -0,0 +1,153 @@
+"""
+إرسال الإشعارات لمجموعات من المستخدمين
+
+تُدرج الإشعارات على دفعات ويُحدَّث عداد غير المقروء لكل مستخدم في نفس
+المعاملة، فتقرأ شارة الإشعارات صفاً واحداً بدلاً من COUNT في كل صفحة.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import User, Enrollment, Notification, NotificationCounter
+
+NOTIFICATION_CHUNK_SIZE = 1000
+
+
+def _insert_counters_ignoring_existing(rows):
+    """إدراج عدادات مع تجاهل الموجود منها (ON CONFLICT DO NOTHING)
+
+    قد تُنشئ معاملة متزامنة عداد نفس المستخدم بين القراءة والإدراج، فيُترك
+    عدادها كما هو؛ وإشعارات هذه المعاملة تُضاف إليه بعد ذلك بـ +1.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(NotificationCounter).on_conflict_do_nothing(index_elements=['user_id'])
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(NotificationCounter).on_conflict_do_nothing(index_elements=['user_id'])
+    else:
+        statement = insert(NotificationCounter)
+    db.session.execute(statement, rows)
+
+
+def _ensure_counters(user_ids):
+    """إنشاء عدادات المستخدمين الذين لا يملكون عداداً، بقيمة غير المقروء الحالية"""
+    existing = set(db.session.execute(
+        select(NotificationCounter.user_id).where(NotificationCounter.user_id.in_(user_ids))
+    ).scalars())
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return
+
+    unread = dict(db.session.execute(
+        select(Notification.user_id, func.count(Notification.id)).where(
+            Notification.user_id.in_(missing),
+            Notification.is_read == False
+        ).group_by(Notification.user_id)
+    ).all())
+    _insert_counters_ignoring_existing([
+        {'user_id': user_id, 'unread_count': unread.get(user_id, 0)}
+        for user_id in missing
+    ])
+
+
+def _fan_out(user_ids, title, message):
+    """إدراج الإشعارات وتحديث العدادات على دفعات، دون commit"""
+    now = datetime.utcnow()
+    for start in range(0, len(user_ids), NOTIFICATION_CHUNK_SIZE):
+        chunk = user_ids[start:start + NOTIFICATION_CHUNK_SIZE]
+        _ensure_counters(chunk)
+        db.session.execute(insert(Notification), [
+            {'user_id': user_id, 'title': title, 'message': message,
+             'is_read': False, 'created_at': now}
+            for user_id in chunk
+        ])
+        db.session.execute(
+            update(NotificationCounter).where(
+                NotificationCounter.user_id.in_(chunk)
+            ).values(unread_count=NotificationCounter.unread_count + 1)
+        )
+    return len(user_ids)
+
+
+def notify_users(user_ids, title, message):
+    """إرسال إشعار لقائمة مستخدمين، وتُرجع عدد الإشعارات المرسلة"""
+    return _fan_out(list(dict.fromkeys(user_ids)), title, message)
+
+
+def notify_course(course_id, title, message):
+    """إرسال إشعار لجميع الطلاب النشطين المسجلين في الدورة"""
+    user_ids = db.session.execute(
+        select(Enrollment.student_id).join(
+            User, Enrollment.student_id == User.id
+        ).where(
+            Enrollment.course_id == course_id,
+            Enrollment.is_active == True,
+            User.is_active == True
+        ).distinct()
+    ).scalars().all()
+    return _fan_out(user_ids, title, message)
+
+
+def notify_role(role, title, message):
+    """إرسال إشعار لجميع المستخدمين النشطين في دور معين"""
+    user_ids = db.session.execute(
+        select(User.id).where(User.role == role, User.is_active == True).order_by(User.id)
+    ).scalars().all()
+    return _fan_out(user_ids, title, message)
+
+
+def mark_all_read(user_id):
+    """تمييز كل إشعارات المستخدم كمقروءة بعبارة UPDATE واحدة، دون commit
+
+    يُنقص العداد بعدد الصفوف المحدَّثة بدلاً من تصفيره، فلا يضيع إشعار أُرسل
+    في معاملة متزامنة لم يشمله هذا التحديث.
+    """
+    _ensure_counters([user_id])
+    result = db.session.execute(
+        update(Notification).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).values(is_read=True).execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(NotificationCounter).where(
+            NotificationCounter.user_id == user_id
+        ).values(unread_count=NotificationCounter.unread_count - result.rowcount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def get_unread_count(user_id):
+    """عدد الإشعارات غير المقروءة من العداد، مع الرجوع إلى COUNT للمستخدمين القدامى"""
+    unread_count = db.session.execute(
+        select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+    ).scalar()
+    if unread_count is None:
+        unread_count = db.session.execute(
+            select(func.count(Notification.id)).where(
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            )
+        ).scalar()
+    return unread_count
+
+
+def rebuild_notification_counters():
+    """إعادة بناء عدادات غير المقروء لكل المستخدمين"""
+    db.session.execute(NotificationCounter.__table__.delete())
+    db.session.execute(
+        insert(NotificationCounter).from_select(
+            ['user_id', 'unread_count'],
+            select(
+                User.id,
+                func.count(Notification.id)
+            ).outerjoin(
+                Notification, (Notification.user_id == User.id) & (Notification.is_read == False)
+            ).group_by(User.id)
+        )
+    )
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(NotificationCounter)).scalar()
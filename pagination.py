@@ -0,0 +1,155 @@
+"""
+ترقيم الصفحات بالمؤشر (keyset) بدلاً من OFFSET
+
+تُرتب القائمة بمفاتيح ثابتة مثل (created_at, id) ويحمل المؤشر قيم آخر صف
+في الصفحة، فتبدأ الصفحة التالية من الفهرس مباشرة مهما كان عمقها ولا حاجة
+إلى COUNT كامل. العدد الإجمالي اختياري ومحدود بسقف، ويُقدَّر من مخطط
+الاستعلام في PostgreSQL عند تجاوز السقف.
+"""
+import base64
+import json
+from datetime import datetime, date
+
+from sqlalchemy import and_, or_, select, func
+
+from app import db
+
+# أقصى عدد صفوف يُعدّ فعلياً قبل الاكتفاء بالتقدير
+APPROXIMATE_COUNT_CAP = 10000
+
+
+class KeysetPage:
+    """صفحة نتائج مع مؤشري الصفحة التالية والسابقة"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def encode_cursor(direction, values):
+    """مؤشر نصي معتم من اتجاه الصفحة وقيم المفاتيح"""
+    values = [value.isoformat() if isinstance(value, (datetime, date)) else value for value in values]
+    payload = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _from_json(key, value):
+    if value is None:
+        return None
+    python_type = key.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def decode_cursor(cursor, keys):
+    """فك المؤشر إلى (direction, values)، أو (None, None) إذا كان غير صالح"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('next', 'prev') or len(values) != len(keys):
+            return None, None
+        return direction, [_from_json(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError, NotImplementedError):
+        return None, None
+
+
+def _after(keys, values, descending):
+    """
+    شرط الصفوف التي تأتي بعد values بترتيب المفاتيح
+
+    الشرط الأول المكرر على المفتاح الأول يتيح للمحرك البدء من موضع المؤشر
+    في الفهرس بدلاً من تصفية الصفوف من البداية.
+    """
+    def beyond(key, value):
+        return key < value if descending else key > value
+
+    alternatives = [
+        and_(*[key == value for key, value in zip(keys[:i], values[:i])], beyond(keys[i], values[i]))
+        for i in range(len(keys))
+    ]
+    first = keys[0] <= values[0] if descending else keys[0] >= values[0]
+    return and_(first, or_(*alternatives))
+
+
+def approximate_count(query, cap=APPROXIMATE_COUNT_CAP):
+    """
+    عدد صفوف الاستعلام، وتُرجع (count, is_estimate)
+
+    يُعدّ حتى cap صف فقط؛ بعدها يُستخدم تقدير المخطط في PostgreSQL أو يُرجع
+    السقف نفسه مع is_estimate.
+    """
+    query = query.order_by(None)
+    counted = db.session.execute(
+        select(func.count()).select_from(query.limit(cap + 1).subquery())
+    ).scalar()
+    if counted <= cap:
+        return counted, False
+
+    if db.engine.dialect.name == 'postgresql':
+        compiled = query.statement.compile(dialect=db.engine.dialect,
+                                           compile_kwargs={'render_postcompile': True})
+        plan = db.session.connection().exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+        return max(int(plan[0]['Plan']['Plan Rows']), cap), True
+    return cap, True
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=20, descending=True, with_total=False):
+    """
+    صفحة من الاستعلام مرتبة بالمفاتيح keys
+
+    يجب أن تنتهي keys بمفتاح فريد (مثل id) ليكون الترتيب ثابتاً. الاستعلام
+    يُمرَّر دون ترتيب. المؤشر غير الصالح يعيد الصفحة الأولى.
+    """
+    keys = list(keys)
+    entity_count = len(query.column_descriptions)
+    direction, values = decode_cursor(cursor, keys) if cursor else (None, None)
+    backwards = direction == 'prev'
+    forward_descending = descending != backwards
+
+    page_query = query.order_by(None).add_columns(*keys)
+    if values is not None:
+        page_query = page_query.filter(_after(keys, values, forward_descending))
+    order = [key.desc() if forward_descending else key.asc() for key in keys]
+    rows = page_query.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        if not rows:
+            return keyset_paginate(query, keys, None, per_page, descending, with_total)
+        rows.reverse()
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    items = [row[0] if entity_count == 1 else tuple(row[:entity_count]) for row in rows]
+    page = KeysetPage(
+        items, per_page,
+        next_cursor=encode_cursor('next', rows[-1][entity_count:]) if has_next and rows else None,
+        prev_cursor=encode_cursor('prev', rows[0][entity_count:]) if has_prev and rows else None
+    )
+    if with_total:
+        page.total, page.total_is_estimate = approximate_count(query)
+    return page
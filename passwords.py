@@ -0,0 +1,266 @@
+"""
+تجزئة كلمات المرور والتحقق منها بحد مشترك بين كل عمليات الخادم
+
+تجزئة scrypt تستهلك المعالج بالكامل، فإذا نُفذت مباشرة في كل طلب دخول
+أوقفت موجة تسجيلات الدخول بقية الطلبات. الحد هنا لكل الخادم وليس لكل عملية:
+عمال gunicorn المتزامنون يعالج كل منهم طلباً واحداً، فحد داخل العملية لا
+يمنع تجزئة في كل عامل على كل نواة. لذلك يُمثَّل كل مكان بملف قفل في
+PASSWORD_HASH_LOCK_DIR تحجزه العملية بـ flock: PASSWORD_HASH_WORKERS تجزئة في
+الوقت نفسه على الأكثر، وPASSWORD_HASH_QUEUE_SIZE طلباً ينتظر دوره، وما زاد
+يُرفض فوراً برسالة "الخادم مشغول" بدلاً من انتظار مفتوح. النظام يحرر أقفال
+العملية عند موتها، فلا يضيع مكان إذا قُتل عامل (SIGKILL) أثناء التجزئة.
+التجزئة نفسها في خيط الطلب (hashlib يحرر الـ GIL أثناءها). عند الدخول تُعاد
+تجزئة كلمة المرور إذا تغيّرت معاملات التجزئة في الإعدادات.
+"""
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+# فترة إعادة المحاولة أثناء انتظار مكان تجزئة
+SLOT_POLL_INTERVAL = 0.01
+
+
+class PasswordHashingBusy(Exception):
+    """الطابور ممتلئ أو انتهت مهلة انتظار الدور"""
+
+
+def load_password_config(config):
+    """قراءة إعدادات التجزئة من البيئة إلى config التطبيق"""
+    config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+    # لكل الخادم: نصف الأنوية افتراضياً، ويبقى النصف الآخر لبقية الطلبات
+    config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))
+    config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    config['PASSWORD_HASH_LOCK_DIR'] = os.environ.get(
+        'PASSWORD_HASH_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'password-hash-slots')
+    )
+
+
+class HashSlots:
+    """
+    أماكن مشتركة بين العمليات كملفات أقفال: running لعدد التجزئات المتزامنة،
+    وadmitted لها مع المنتظرين
+
+    كل مكان ملف يُحجز بـ flock غير حاجز على وصف ملف مفتوح خاص به، فتتنافس
+    عليه خيوط العملية الواحدة والعمليات الأخرى بالطريقة نفسها، ويحرره النظام
+    عند إغلاق الوصف أو موت العملية.
+    """
+
+    def __init__(self, lock_dir, workers, queue_size):
+        self.lock_dir = lock_dir
+        self.workers = workers
+        self.queue_size = queue_size
+        os.makedirs(lock_dir, exist_ok=True)
+        self._admitted_paths = [os.path.join(lock_dir, f'admitted-{n}.lock') for n in range(workers + queue_size)]
+        self._running_paths = [os.path.join(lock_dir, f'running-{n}.lock') for n in range(workers)]
+        self._held = set()
+        self._held_lock = threading.Lock()
+        # العملية الابنة (مجموعات fork للتقارير والصور) ترث الأوصاف المفتوحة؛
+        # تُغلق فيها نسختها فيبقى القفل للأب وحده ويُحرر بإغلاقه
+        os.register_at_fork(after_in_child=self._close_inherited)
+
+    def _try_lock(self, paths):
+        for path in paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            with self._held_lock:
+                self._held.add(fd)
+            return fd
+        return None
+
+    def release(self, fd):
+        with self._held_lock:
+            self._held.discard(fd)
+        os.close(fd)
+
+    def _close_inherited(self):
+        for fd in self._held:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._held = set()
+        self._held_lock = threading.Lock()
+
+    def admit(self):
+        """حجز مكان في السعة الكلية دون انتظار، أو None إذا امتلأت"""
+        return self._try_lock(self._admitted_paths)
+
+    def acquire_running(self, timeout):
+        """انتظار مكان تجزئة حتى timeout ثانية، أو None عند انتهاء المهلة"""
+        deadline = time.monotonic() + timeout
+        while True:
+            fd = self._try_lock(self._running_paths)
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def admitted_count(self):
+        """عدد التجزئات الجارية والمنتظرة في كل العمليات"""
+        count = 0
+        for path in self._admitted_paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                count += 1
+            finally:
+                os.close(fd)
+        return count
+
+
+_slots = None
+
+
+def create_hash_slots(config):
+    """إنشاء الحد المشترك مرة واحدة لكل عملية من create_app"""
+    global _slots
+    if _slots is None:
+        _slots = HashSlots(
+            config['PASSWORD_HASH_LOCK_DIR'],
+            config['PASSWORD_HASH_WORKERS'],
+            config['PASSWORD_HASH_QUEUE_SIZE']
+        )
+    return _slots
+
+
+class PasswordHasher:
+    """تجزئة كلمات المرور ضمن الحد المشترك، مع مقاييس هذه العملية"""
+
+    def __init__(self, slots, method=DEFAULT_HASH_METHOD, timeout=10):
+        self.slots = slots
+        self.method = method
+        self.timeout = timeout
+        self._metrics_lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {'completed': 0, 'rejected': 0, 'timed_out': 0, 'rehashed': 0}
+        self._wait_seconds = 0.0
+        self._hash_seconds = 0.0
+        self._method_prefix = None
+
+    def _run(self, function, *args):
+        # السعة = العمال + الطابور في كل الخادم؛ ما زاد يُرفض دون انتظار
+        admitted = self.slots.admit()
+        if admitted is None:
+            self._count('rejected')
+            raise PasswordHashingBusy()
+
+        submitted_at = time.perf_counter()
+        with self._metrics_lock:
+            self._in_flight += 1
+        try:
+            running = self.slots.acquire_running(self.timeout)
+            if running is None:
+                self._count('timed_out')
+                raise PasswordHashingBusy()
+            started_at = time.perf_counter()
+            try:
+                result = function(*args)
+            finally:
+                self.slots.release(running)
+                finished_at = time.perf_counter()
+                with self._metrics_lock:
+                    self._wait_seconds += started_at - submitted_at
+                    self._hash_seconds += finished_at - started_at
+        finally:
+            with self._metrics_lock:
+                self._in_flight -= 1
+            self.slots.release(admitted)
+        self._count('completed')
+        return result
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._counters[name] += 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def rehash(self, password):
+        """تجزئة جديدة بالمعاملات الحالية لكلمة مرور قديمة"""
+        password_hash = self.hash(password)
+        self._count('rehashed')
+        return password_hash
+
+    def needs_rehash(self, password_hash):
+        """
+        هل جُزئت كلمة المرور بمعاملات غير المعتمدة حالياً؟
+
+        أول استدعاء يجزئ نصاً فارغاً ضمن الحد، وقد يرفع PasswordHashingBusy.
+        """
+        if self._method_prefix is None:
+            # werkzeug يُكمل المعاملات الافتراضية (scrypt -> scrypt:32768:8:1)
+            self._method_prefix = self._run(generate_password_hash, '', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def metrics(self):
+        with self._metrics_lock:
+            finished = self._counters['completed']
+            return {
+                'workers': self.slots.workers,
+                'queue_size': self.slots.queue_size,
+                'method': self.method,
+                'in_flight': self._in_flight,
+                'server_in_flight': self.slots.admitted_count(),
+                **self._counters,
+                'avg_wait_ms': round(self._wait_seconds / finished * 1000, 2) if finished else 0,
+                'avg_hash_ms': round(self._hash_seconds / finished * 1000, 2) if finished else 0
+            }
+
+
+_hasher = None
+_hasher_pid = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """مُجزئ هذه العملية على الحد المشترك، يُنشأ عند أول استخدام (وبعد fork من جديد)"""
+    global _hasher, _hasher_pid
+    if _hasher is None or _hasher_pid != os.getpid():
+        with _hasher_lock:
+            if _hasher is None or _hasher_pid != os.getpid():
+                config = current_app.config
+                _hasher = PasswordHasher(
+                    create_hash_slots(config),
+                    method=config['PASSWORD_HASH_METHOD'],
+                    timeout=config['PASSWORD_HASH_TIMEOUT']
+                )
+                _hasher_pid = os.getpid()
+    return _hasher
+
+
+def hash_password(password):
+    """تجزئة كلمة مرور جديدة، وترفع PasswordHashingBusy عند امتلاء الطابور"""
+    return get_password_hasher().hash(password)
+
+
+def verify_password(user, password, rehash=True):
+    """
+    التحقق من كلمة مرور المستخدم مع إعادة تجزئتها بالمعاملات الحالية عند الحاجة
+
+    تُعدّل user.password_hash دون commit عند إعادة التجزئة.
+    """
+    hasher = get_password_hasher()
+    if not hasher.verify(user.password_hash, password):
+        return False
+    if rehash:
+        try:
+            if hasher.needs_rehash(user.password_hash):
+                user.password_hash = hasher.rehash(password)
+        except PasswordHashingBusy:
+            # لا يُرفض دخول صحيح بسبب الضغط؛ تُعاد التجزئة في دخول لاحق
+            pass
+    return True
@@ -0,0 +1,221 @@
+"""
+فهرس البحث عن المستخدمين بالبادئة
+
+لكل مستخدم كلمات موحدة في جدول UserSearchTerm: كلمات الاسم بعد توحيد
+الكتابة العربية (بأداة التعريف ودونها)، اسم المستخدم، أجزاء البريد قبل @،
+وأرقام الهاتف. البحث بالبادئة مدى على المفتاح (role, term) فيقرأ الإكمال
+التلقائي أول النتائج من الفهرس مباشرة بدلاً من فحص جدول المستخدمين بـ LIKE.
+"""
+import re
+
+from sqlalchemy import event, select, exists, bindparam, inspect
+from sqlalchemy.orm import Session, aliased
+
+from app import db
+from models import User, UserSearchTerm
+from search import normalize_arabic, search_tokens
+
+SEARCH_FIELDS = ('role', 'full_name', 'username', 'email', 'phone')
+MAX_TERM_LENGTH = 64
+MIN_PHONE_DIGITS = 3
+
+# طول الرقم الوطني بدون مفتاح الدولة أو الصفر (مثل 5XXXXXXXX)
+PHONE_NATIONAL_DIGITS = 9
+
+PHONE_PATTERN = re.compile(r'^\+?[\d٠-٩()\-\s]+$')
+EMAIL_SEPARATORS = re.compile(r'[._\-+]+')
+
+# أكبر محرف في Unicode لإغلاق مدى البادئة
+PREFIX_END = '\U0010ffff'
+
+# عدد الصفوف المقروءة لكل نتيجة، فقد تطابق البادئة أكثر من كلمة لنفس المستخدم
+AUTOCOMPLETE_OVERFETCH = 4
+
+
+def _phone_digits(value):
+    return re.sub(r'\D', '', normalize_arabic(value).replace(' ', ''))
+
+
+def user_search_terms(full_name, username, email, phone):
+    """كلمات الفهرس لمستخدم واحد"""
+    terms = set(search_tokens(full_name))
+    # والكلمات بأداة التعريف أيضاً: query_terms لا تحذفها من بادئة قصيرة، فيُعثر
+    # على "القحطاني" أثناء كتابة "ال" و"الق" قبل أن يتبقى بعدها حرفان
+    terms.update(normalize_arabic(full_name).split())
+
+    username = normalize_arabic(username).replace(' ', '')
+    if username:
+        terms.add(username)
+        terms.update(part for part in username.split('_') if part)
+
+    local_part = (email or '').split('@')[0]
+    terms.update(search_tokens(EMAIL_SEPARATORS.sub(' ', local_part)))
+
+    digits = _phone_digits(phone) if phone else ''
+    if digits:
+        # الرقم كما هو، وبدون الأصفار البادئة، وبدون مفتاح الدولة، ليُعثر على
+        # 0501234567 و+966501234567 بكتابة 50...
+        terms.add(digits)
+        if digits.lstrip('0'):
+            terms.add(digits.lstrip('0'))
+        if len(digits) > PHONE_NATIONAL_DIGITS:
+            terms.add(digits[-PHONE_NATIONAL_DIGITS:])
+
+    return {term[:MAX_TERM_LENGTH] for term in terms if term}
+
+
+def query_terms(query_text):
+    """بادئات البحث من عبارة المستخدم بنفس توحيد الفهرسة"""
+    terms = []
+    for word in (query_text or '').split():
+        if '@' in word:
+            word = word.split('@')[0]
+        if PHONE_PATTERN.match(word):
+            digits = _phone_digits(word)
+            if len(digits) >= MIN_PHONE_DIGITS:
+                terms.append(digits.lstrip('0') or digits)
+                continue
+        if '_' in word:
+            # اسم مستخدم مثل ahmed_99 يُطابق كما هو
+            terms.append(normalize_arabic(word).replace(' ', ''))
+        else:
+            terms.extend(search_tokens(EMAIL_SEPARATORS.sub(' ', word)))
+    return [term[:MAX_TERM_LENGTH] for term in dict.fromkeys(terms) if term]
+
+
+def _index_users(connection, users):
+    """إعادة فهرسة مستخدمين، users قائمة (id, role, full_name, username, email, phone)"""
+    if not users:
+        return
+    table = UserSearchTerm.__table__
+    connection.execute(table.delete().where(table.c.user_id == bindparam('uid')),
+                       [{'uid': user[0]} for user in users])
+    rows = [
+        {'role': role, 'term': term, 'user_id': user_id}
+        for user_id, role, full_name, username, email, phone in users
+        for term in user_search_terms(full_name, username, email, phone)
+    ]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def rebuild_user_search_index(chunk_size=1000):
+    """إعادة بناء فهرس البحث لكل المستخدمين"""
+    with db.engine.begin() as connection:
+        connection.execute(UserSearchTerm.__table__.delete())
+        batch = []
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(User.id, User.role, User.full_name, User.username, User.email, User.phone)
+        )
+        for row in result:
+            batch.append(tuple(row))
+            if len(batch) >= chunk_size:
+                _index_users(connection, batch)
+                batch = []
+        _index_users(connection, batch)
+    return db.session.query(User.id).count()
+
+
+def ensure_user_search_index():
+    """بناء الفهرس عند أول تشغيل بعد إضافته لقاعدة بيانات فيها مستخدمون"""
+    with db.engine.connect() as connection:
+        has_terms = connection.execute(select(UserSearchTerm.user_id).limit(1)).first()
+        has_users = connection.execute(select(User.id).limit(1)).first()
+    if has_users and not has_terms:
+        rebuild_user_search_index()
+
+
+def _search_fields_changed(user):
+    state = inspect(user)
+    return any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS)
+
+
+@event.listens_for(Session, 'after_flush')
+def update_user_search_index(session, flush_context):
+    """تحديث الفهرس عند إضافة المستخدمين أو تعديل حقول البحث أو حذفهم"""
+    changed = [obj for obj in session.new if isinstance(obj, User)]
+    changed += [obj for obj in session.dirty if isinstance(obj, User) and _search_fields_changed(obj)]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, User)]
+    if not changed and not deleted:
+        return
+
+    connection = session.connection()
+    _index_users(connection, [
+        (user.id, user.role, user.full_name, user.username, user.email, user.phone)
+        for user in changed
+    ])
+    if deleted:
+        table = UserSearchTerm.__table__
+        connection.execute(table.delete().where(table.c.user_id.in_(deleted)))
+
+
+def _prefix(column, term):
+    return (column >= term) & (column < term + PREFIX_END)
+
+
+def _matching_terms(terms, role):
+    """
+    استعلام (user_id, term) للمستخدمين المطابقين لكل البادئات
+
+    تُقرأ أطول بادئة من الفهرس (وهي الأكثر انتقائية غالباً)، ويُتحقق من
+    البقية لكل مستخدم عبر فهرس (user_id, term).
+    """
+    driver, *others = sorted(terms, key=len, reverse=True)
+    statement = select(UserSearchTerm.user_id, UserSearchTerm.term).where(
+        UserSearchTerm.role == role,
+        _prefix(UserSearchTerm.term, driver)
+    )
+    for term in others:
+        other = aliased(UserSearchTerm)
+        statement = statement.where(exists().where(
+            other.user_id == UserSearchTerm.user_id,
+            _prefix(other.term, term)
+        ))
+    return statement
+
+
+def search_users(query, query_text, role):
+    """تصفية استعلام مستخدمين بعبارة البحث عبر الفهرس"""
+    terms = query_terms(query_text)
+    if not terms:
+        return query
+    matches = _matching_terms(terms, role).with_only_columns(UserSearchTerm.user_id)
+    return query.filter(User.id.in_(matches))
+
+
+def autocomplete_users(query_text, role, limit=10, user_ids=None):
+    """
+    أفضل المستخدمين المطابقين بالبادئة للإكمال التلقائي
+
+    تُرتب النتائج حسب الكلمة المطابقة فتأتي المطابقة التامة أولاً. user_ids
+    استعلام اختياري لحصر البحث (مثل طلاب المعلم).
+    """
+    terms = query_terms(query_text)
+    if not terms:
+        return []
+
+    statement = _matching_terms(terms, role)
+    if user_ids is not None:
+        statement = statement.where(UserSearchTerm.user_id.in_(user_ids))
+    rows = db.session.execute(
+        statement.order_by(UserSearchTerm.term).limit(limit * AUTOCOMPLETE_OVERFETCH)
+    ).all()
+
+    ordered_ids = list(dict.fromkeys(user_id for user_id, _ in rows))[:limit]
+    if not ordered_ids:
+        return []
+    users = {user.id: user for user in User.query.filter(User.id.in_(ordered_ids))}
+    return [users[user_id] for user_id in ordered_ids if user_id in users]
+
+
+def user_suggestion(user):
+    """تمثيل المستخدم في استجابة الإكمال التلقائي"""
+    return {
+        'id': user.id,
+        'full_name': user.full_name,
+        'username': user.username,
+        'email': user.email,
+        'phone': user.phone,
+        'role': user.role,
+        'is_active': user.is_active
+    }
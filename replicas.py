@@ -0,0 +1,178 @@
+"""
+توجيه قراءات الصفحات المعلّمة بـ read_only إلى نسخة قراءة من قاعدة البيانات
+
+تُعرّف النسخة بـ REPLICA_DATABASE_URL (bind باسم replica). جلسة RoutingSession
+ترسل استعلامات SELECT إليها فقط إذا:
+
+- كانت الصفحة معلّمة بـ read_only،
+- ولم تكتب الجلسة شيئاً في هذا الطلب (وإلا تُقرأ الكتابة من الرئيسية)،
+- ولم يكتب المستخدم نفسه خلال REPLICA_STICKY_SECONDS (قراءة كتاباته)،
+- وكان تأخر النسخة ضمن REPLICA_MAX_LAG ثانية.
+
+التأخر يُقاس بصف ReplicaHeartbeat: يُحدث في معاملة الكتابة على الرئيسية مرة
+كل REPLICA_HEARTBEAT_INTERVAL على الأكثر، والفرق بين قيمته في الرئيسية وفي
+النسخة هو ما لم يصل إليها بعد. يعمل مع أي نسخ متماثل (PostgreSQL streaming
+replication)، ومحلياً مع ملفي SQLite يُزامنهما `flask sync-sqlite-replica`.
+"""
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select, update
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = 'replica'
+STICKY_SESSION_KEY = '_primary_until'
+HEARTBEAT_ID = 1
+
+
+class RoutingSession(Session):
+    """جلسة Flask-SQLAlchemy ترسل قراءات الصفحات المعلّمة إلى نسخة القراءة"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        return (
+            isinstance(clause, Select) and clause._for_update_arg is None
+            and not self._flushing and not self.info.get('wrote')
+            and has_app_context() and g.get('_use_replica', False)
+        )
+
+
+def _db():
+    return current_app.extensions['sqlalchemy']
+
+
+def replica_configured():
+    return REPLICA_BIND in _db().engines
+
+
+_heartbeat_lock = threading.Lock()
+_last_heartbeat = 0.0
+
+
+def _record_write(session):
+    """الجلسة كتبت: قراءاتها التالية ومن نفس المستخدم لفترة تذهب إلى الرئيسية"""
+    global _last_heartbeat
+    session.info['wrote'] = True
+    if has_request_context():
+        g._db_wrote = True
+    if not has_app_context() or not replica_configured():
+        return
+
+    with _heartbeat_lock:
+        now = time.monotonic()
+        if now - _last_heartbeat < current_app.config['REPLICA_HEARTBEAT_INTERVAL']:
+            return
+        _last_heartbeat = now
+    from models import ReplicaHeartbeat
+    session.connection().execute(
+        update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == HEARTBEAT_ID).values(written_at=datetime.utcnow())
+    )
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_flush(session, flush_context):
+    _record_write(session)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def record_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _record_write(orm_execute_state.session)
+
+
+def ensure_replica_heartbeat():
+    """إنشاء صف النبض مرة واحدة، فلا تحتاج الكتابات إلى INSERT متزامن"""
+    from models import ReplicaHeartbeat
+    db = _db()
+    if db.session.get(ReplicaHeartbeat, HEARTBEAT_ID) is None:
+        db.session.add(ReplicaHeartbeat(id=HEARTBEAT_ID))
+        db.session.commit()
+
+
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': None, 'lag': None}
+
+
+def _heartbeat(engine):
+    from models import ReplicaHeartbeat
+    with engine.connect() as connection:
+        return connection.execute(
+            select(ReplicaHeartbeat.written_at).where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+        ).scalar()
+
+
+def replica_lag():
+    """
+    تأخر نسخة القراءة بالثواني، أو None إذا تعذر الوصول إليها
+
+    يُقاس مرة كل REPLICA_LAG_CHECK_INTERVAL لكل عملية.
+    """
+    interval = current_app.config['REPLICA_LAG_CHECK_INTERVAL']
+    checked_at = _lag_state['checked_at']
+    if checked_at is not None and time.monotonic() - checked_at < interval:
+        return _lag_state['lag']
+
+    with _lag_lock:
+        checked_at = _lag_state['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < interval:
+            return _lag_state['lag']
+        engines = _db().engines
+        try:
+            primary = _heartbeat(engines[None])
+            replica = _heartbeat(engines[REPLICA_BIND])
+            if primary is None:
+                lag = 0.0
+            elif replica is None:
+                lag = None
+            else:
+                lag = max(0.0, (primary - replica).total_seconds())
+        except Exception as e:
+            current_app.logger.error(f"خطأ في قياس تأخر نسخة القراءة: {str(e)}")
+            lag = None
+        _lag_state.update(checked_at=time.monotonic(), lag=lag)
+    return lag
+
+
+def replica_usable():
+    """هل تُرسل قراءات هذا الطلب إلى نسخة القراءة"""
+    if not replica_configured():
+        return False
+    if session.get(STICKY_SESSION_KEY, 0) > time.time():
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= current_app.config['REPLICA_MAX_LAG']
+
+
+def read_only(f):
+    """ديكوريتر للصفحات التي تقرأ فقط: قراءاتها من نسخة القراءة إذا كانت صالحة"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._use_replica = replica_usable()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def remember_writes(response):
+    """after_request: المستخدم الذي كتب يقرأ من الرئيسية لفترة حتى تصل كتابته إلى النسخة"""
+    if g.get('_db_wrote') and replica_configured():
+        session[STICKY_SESSION_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+def sync_sqlite_replica():
+    """نسخ قاعدة SQLite الرئيسية إلى ملف النسخة، لتجربة التوجيه محلياً"""
+    from backups import sqlite_snapshot
+    engines = _db().engines
+    primary, replica = engines[None].url, engines[REPLICA_BIND].url
+    if primary.get_backend_name() != 'sqlite' or replica.get_backend_name() != 'sqlite':
+        raise ValueError('المزامنة المحلية لملفات SQLite فقط')
+    config = current_app.config
+    sqlite_snapshot(primary.database, replica.database, config['BACKUP_PAGES_PER_STEP'], config['BACKUP_STEP_SLEEP'])
@@ -0,0 +1,560 @@
+"""
+طابور تقارير خلفي مع تخزين النتائج
+
+التقارير الثقيلة (PDF والتصدير الكامل) تُنفذ في مجموعة عمليات منفصلة بدلاً من
+طلب الويب فلا تتجاوز مهلة gunicorn. كل مهمة صف في ReportJob: يرسلها المدير،
+ويتابع تقدمها، ثم يحمّل النتيجة. مفتاح النتيجة بصمة لنوع التقرير ومعاملاته
+وأرقام إصدار الجداول التي يقرأ منها (DataVersion، تزداد بعد commit كل
+كتابة)، فالطلب المتطابق خلال REPORT_CACHE_TTL يُرجع النتيجة السابقة ما لم
+تتغير البيانات، والطلب المتطابق لمهمة لم تنته بعد ينضم إليها.
+
+الطابور في قاعدة البيانات، فالمهام التي لم تكتمل بسبب إعادة تشغيل الخادم
+تُنفذ بـ `flask run-report-jobs`.
+"""
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, date
+
+from flask import current_app
+from sqlalchemy import event, select, insert, update, func, or_, and_
+from sqlalchemy.orm import Session
+
+from app import db
+from models import (User, Course, Enrollment, Attendance, AttendanceSession, Grade,
+                    DataVersion, ReportJob)
+from utils import get_attendance_status_text, get_grade_type_text, CSV_YIELD_PER
+
+REPORT_FORMATS = ('pdf', 'csv')
+REPORT_BATCH_SIZE = 1000
+PROGRESS_INTERVAL = 1.0
+
+# الجداول التي تُتابع أرقام إصدارها
+TRACKED_MODELS = (User, Course, Enrollment, AttendanceSession, Attendance, Grade)
+
+ReportDefinition = namedtuple('ReportDefinition', 'title headers query key to_row models')
+
+
+# ---------------------------------------------------------------------------
+# تعريفات التقارير: الاستعلام، ومفتاح الترتيب للقراءة على دفعات، وتحويل الصف
+# ---------------------------------------------------------------------------
+
+def _date_text(value, format_string='%Y-%m-%d'):
+    return value.strftime(format_string) if value else ''
+
+
+def _students_query():
+    return db.session.query(
+        User.id, User.username, User.full_name, User.email, User.phone,
+        User.date_of_birth, User.gender, User.created_at, User.is_active
+    ).filter(User.role == 'student')
+
+
+def _student_row(student):
+    return [
+        student.id,
+        student.username,
+        student.full_name,
+        student.email,
+        student.phone or '',
+        _date_text(student.date_of_birth),
+        'ذكر' if student.gender == 'male' else 'أنثى' if student.gender == 'female' else '',
+        _date_text(student.created_at),
+        'نشط' if student.is_active else 'غير نشط'
+    ]
+
+
+def _courses_query():
+    # عدد المسجلين لكل الدورات في استعلام فرعي واحد
+    enrolled_counts = db.session.query(
+        Enrollment.course_id,
+        func.count(Enrollment.id).label('enrolled_count')
+    ).filter(Enrollment.is_active == True).group_by(Enrollment.course_id).subquery()
+
+    # أعمدة وليس كائنات Course: الدفعات تُقرأ ثم تنتهي معاملتها، فكائنات
+    # الـ ORM تنتهي صلاحيتها ويُعاد تحميل كل صف منها باستعلام مستقل
+    return db.session.query(
+        Course.id, Course.name, User.full_name.label('teacher_name'), Course.duration_hours,
+        Course.start_date, Course.end_date, Course.fee, Course.max_students,
+        func.coalesce(enrolled_counts.c.enrolled_count, 0).label('enrolled_count'), Course.is_active
+    ).outerjoin(
+        User, Course.teacher_id == User.id
+    ).outerjoin(
+        enrolled_counts, enrolled_counts.c.course_id == Course.id
+    )
+
+
+def _course_row(course):
+    return [
+        course.id,
+        course.name,
+        course.teacher_name or 'بدون معلم',
+        course.duration_hours or '',
+        _date_text(course.start_date),
+        _date_text(course.end_date),
+        course.fee or 0,
+        course.max_students or '',
+        course.enrolled_count,
+        'نشطة' if course.is_active else 'غير نشطة'
+    ]
+
+
+def _attendance_query(course_id=None, date_from=None, date_to=None):
+    query = db.session.query(
+        Attendance.id, AttendanceSession.session_date, Course.name.label('course_name'),
+        User.full_name.label('student_name'), Attendance.status, Attendance.notes
+    ).join(
+        AttendanceSession, Attendance.session_id == AttendanceSession.id
+    ).join(
+        Course, AttendanceSession.course_id == Course.id
+    ).join(
+        User, Attendance.student_id == User.id
+    )
+    if course_id:
+        query = query.filter(AttendanceSession.course_id == course_id)
+    if date_from:
+        query = query.filter(AttendanceSession.session_date >= date_from)
+    if date_to:
+        query = query.filter(AttendanceSession.session_date <= date_to)
+    return query
+
+
+def _attendance_row(record):
+    return [
+        _date_text(record.session_date),
+        record.course_name,
+        record.student_name,
+        get_attendance_status_text(record.status),
+        record.notes or ''
+    ]
+
+
+def _grades_query(course_id=None, date_from=None, date_to=None):
+    query = db.session.query(
+        Grade.id, Grade.date_recorded, Course.name.label('course_name'),
+        User.full_name.label('student_name'), Grade.assignment_name, Grade.grade_type,
+        Grade.grade, Grade.max_grade
+    ).join(
+        Course, Grade.course_id == Course.id
+    ).join(
+        User, Grade.student_id == User.id
+    )
+    if course_id:
+        query = query.filter(Grade.course_id == course_id)
+    if date_from:
+        query = query.filter(Grade.date_recorded >= date_from)
+    if date_to:
+        query = query.filter(Grade.date_recorded < date_to + timedelta(days=1))
+    return query
+
+
+def _grade_row(record):
+    return [
+        _date_text(record.date_recorded),
+        record.course_name,
+        record.student_name,
+        record.assignment_name,
+        get_grade_type_text(record.grade_type),
+        record.grade,
+        record.max_grade
+    ]
+
+
+REPORTS = {
+    'students': ReportDefinition(
+        'تقرير الطلاب',
+        ['ID', 'اسم المستخدم', 'الاسم الكامل', 'البريد الإلكتروني',
+         'رقم الجوال', 'تاريخ الميلاد', 'الجنس', 'تاريخ التسجيل', 'الحالة'],
+        _students_query, User.id, _student_row, (User,)
+    ),
+    'courses': ReportDefinition(
+        'تقرير الدورات',
+        ['ID', 'اسم الدورة', 'المعلم', 'المدة بالساعات', 'تاريخ البداية',
+         'تاريخ النهاية', 'الرسوم', 'أقصى عدد طلاب', 'عدد المسجلين', 'الحالة'],
+        _courses_query, Course.id, _course_row, (Course, User, Enrollment)
+    ),
+    'attendance': ReportDefinition(
+        'تقرير الحضور',
+        ['التاريخ', 'الدورة', 'الطالب', 'الحالة', 'ملاحظات'],
+        _attendance_query, Attendance.id, _attendance_row, (Attendance, AttendanceSession, Course, User)
+    ),
+    'grades': ReportDefinition(
+        'تقرير الدرجات',
+        ['التاريخ', 'الدورة', 'الطالب', 'التقييم', 'النوع', 'الدرجة', 'الدرجة القصوى'],
+        _grades_query, Grade.id, _grade_row, (Grade, Course, User)
+    ),
+}
+
+# المعاملات المقبولة لكل تقرير
+REPORT_PARAMS = {
+    'attendance': ('course_id', 'date_from', 'date_to'),
+    'grades': ('course_id', 'date_from', 'date_to'),
+}
+
+
+def clean_report_params(kind, raw):
+    """المعاملات المعروفة للتقرير فقط بقيم صالحة، وترفع ValueError عند الخطأ"""
+    params = {}
+    for name in REPORT_PARAMS.get(kind, ()):
+        value = raw.get(name)
+        if value in (None, ''):
+            continue
+        if name == 'course_id':
+            params[name] = int(value)
+        else:
+            params[name] = date.fromisoformat(str(value)).isoformat()
+    return params
+
+
+def _query_params(params):
+    return {name: date.fromisoformat(value) if name.startswith('date_') else value
+            for name, value in params.items()}
+
+
+def report_rows(kind, params=None, yield_per=CSV_YIELD_PER):
+    """صفوف التقرير في طلب الويب (التصدير المتدفق) بقراءة متدفقة من قاعدة البيانات"""
+    definition = REPORTS[kind]
+    query = definition.query(**_query_params(params or {})).order_by(definition.key)
+    return (definition.to_row(record) for record in query.yield_per(yield_per))
+
+
+def _batched_records(definition, params, batch_size=REPORT_BATCH_SIZE):
+    """
+    قراءة صفوف التقرير على دفعات بالمفتاح (keyset) بدلاً من مؤشر مفتوح
+
+    لا يبقى استعلام مفتوح بين الدفعات، فيمكن تحديث تقدم المهمة من اتصال آخر
+    حتى في SQLite.
+    """
+    base = definition.query(**_query_params(params)).add_columns(definition.key.label('_report_key'))
+    last_key = None
+    while True:
+        query = base
+        if last_key is not None:
+            query = query.filter(definition.key > last_key)
+        batch = query.order_by(definition.key).limit(batch_size).all()
+        db.session.rollback()
+        for record in batch:
+            yield record
+        if len(batch) < batch_size:
+            return
+        last_key = batch[-1][-1]
+
+
+# ---------------------------------------------------------------------------
+# أرقام إصدار البيانات
+# ---------------------------------------------------------------------------
+
+def ensure_data_versions():
+    """إنشاء صفوف الإصدار للجداول المتابعة، فلا تحتاج الزيادة لاحقاً إلى INSERT متزامن"""
+    names = {model.__table__.name for model in TRACKED_MODELS}
+    existing = set(db.session.execute(select(DataVersion.table_name)).scalars())
+    missing = names - existing
+    if missing:
+        db.session.execute(insert(DataVersion), [{'table_name': name, 'version': 0} for name in sorted(missing)])
+        db.session.commit()
+
+
+def _bump_data_versions(connection, table_names):
+    for table_name in sorted(table_names):
+        result = connection.execute(
+            update(DataVersion).where(DataVersion.table_name == table_name).values(version=DataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(DataVersion).values(table_name=table_name, version=1))
+
+
+def _remember_changed_tables(session, table_names):
+    if table_names:
+        # المحرك الذي كُتب عليه، فالزيادة بعد commit لا تمر بالجلسة
+        engine = session.connection().engine
+        session.info.setdefault('changed_tables', {}).setdefault(engine, set()).update(table_names)
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changed_tables(session, flush_context):
+    """تسجيل الجداول المتابعة التي تغيرت في هذا الـ flush، لزيادة إصدارها بعد commit"""
+    changed = {obj.__table__.name for obj in session.new if isinstance(obj, TRACKED_MODELS)}
+    changed.update(obj.__table__.name for obj in session.deleted if isinstance(obj, TRACKED_MODELS))
+    changed.update(obj.__table__.name for obj in session.dirty
+                   if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj))
+    _remember_changed_tables(session, changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def record_changed_tables_bulk(orm_execute_state):
+    """العمليات الجماعية (query.update وغيرها) لا تمر بالـ flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, TRACKED_MODELS):
+        _remember_changed_tables(orm_execute_state.session, {mapper.class_.__table__.name})
+
+
+@event.listens_for(Session, 'after_commit')
+def bump_data_versions(session):
+    """
+    زيادة إصدار الجداول التي تغيرت، في معاملة قصيرة مستقلة بعد commit
+
+    لو زيدت داخل معاملة الكاتب لبقي قفل صف الإصدار حتى نهايتها، فتصطف كل
+    الكتابات المتزامنة على الجدول نفسه (وأي تسجيل دخول يغير User) وقد تتقاطع
+    أقفال جدولين. بين commit والزيادة قد تُرجع التقارير النتيجة السابقة للحظة.
+    """
+    for engine, table_names in session.info.pop('changed_tables', {}).items():
+        try:
+            with engine.begin() as connection:
+                _bump_data_versions(connection, table_names)
+        except Exception as e:
+            current_app.logger.error(f"خطأ في تحديث أرقام إصدار البيانات: {str(e)}")
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def discard_changed_tables(session, transaction):
+    # التغييرات التي تراجعت عنها المعاملة لا تغير الإصدار
+    if transaction.parent is None:
+        session.info.pop('changed_tables', None)
+
+
+def report_cache_key(kind, report_format, params):
+    definition = REPORTS[kind]
+    names = sorted({model.__table__.name for model in definition.models})
+    versions = dict(db.session.execute(
+        select(DataVersion.table_name, DataVersion.version).where(DataVersion.table_name.in_(names))
+    ).all())
+    payload = json.dumps([kind, report_format, params, [versions.get(name, 0) for name in names]],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# الطابور
+# ---------------------------------------------------------------------------
+
+def result_file_path(job):
+    return os.path.join(current_app.config['REPORT_RESULTS_FOLDER'], job.result_path)
+
+
+def submit_report_job(kind, report_format, params, user_id=None):
+    """
+    إرسال تقرير للطابور، ويُرجع (المهمة، هل النتيجة من المخزن)
+
+    يُرجع مهمة سابقة إذا كانت بنفس المفتاح وما زالت تعمل أو انتهت خلال
+    REPORT_CACHE_TTL. يُنفذ commit لتجد العملية الخلفية المهمة.
+    """
+    if kind not in REPORTS or report_format not in REPORT_FORMATS:
+        raise ValueError('نوع التقرير أو صيغته غير معروفة')
+    params = clean_report_params(kind, params)
+    cache_key = report_cache_key(kind, report_format, params)
+
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['REPORT_CACHE_TTL'])
+    existing = ReportJob.query.filter(
+        ReportJob.cache_key == cache_key,
+        or_(ReportJob.status.in_(('queued', 'running')),
+            and_(ReportJob.status == 'done', ReportJob.finished_at >= cutoff))
+    ).order_by(ReportJob.created_at.desc()).first()
+    if existing is not None:
+        if existing.status != 'done':
+            return existing, False
+        if os.path.exists(result_file_path(existing)):
+            return existing, True
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        format=report_format,
+        params=json.dumps(params, sort_keys=True),
+        cache_key=cache_key,
+        status='queued',
+        requested_by=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    _enqueue(job.id)
+    return job, False
+
+
+def _update_job(job_id, **values):
+    """تحديث المهمة في معاملة مستقلة، فيراه من يتابع التقدم فوراً"""
+    with db.engine.begin() as connection:
+        connection.execute(update(ReportJob).where(ReportJob.id == job_id).values(**values))
+
+
+def _with_progress(job_id, rows, total):
+    done = 0
+    reported_at = time.monotonic()
+    for row in rows:
+        yield row
+        done += 1
+        if time.monotonic() - reported_at >= PROGRESS_INTERVAL:
+            # 100% تُسجل عند اكتمال الملف، فبناء صفحات PDF يأتي بعد آخر صف
+            _update_job(job_id, progress=min(95, done * 95 // max(total, 1)))
+            reported_at = time.monotonic()
+
+
+def _write_csv(output, headers, rows):
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def run_report_job(job_id):
+    """
+    تنفيذ مهمة واحدة إذا كانت في الطابور، ويُرجع True إذا نُفذت
+
+    حجز المهمة بتحديث شرطي على حالتها، فلا تُنفذ مرتين إذا التقطها عامل
+    وسطر الأوامر معاً.
+    """
+    claimed = db.session.execute(
+        update(ReportJob).where(ReportJob.id == job_id, ReportJob.status == 'queued').values(
+            status='running', started_at=datetime.utcnow(), progress=0
+        )
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+
+    job = db.session.get(ReportJob, job_id)
+    definition = REPORTS[job.kind]
+    params = json.loads(job.params)
+    folder = current_app.config['REPORT_RESULTS_FOLDER']
+    filename = f'{job.id}.{job.format}'
+    temp_path = os.path.join(folder, filename + '.tmp')
+
+    try:
+        total = definition.query(**_query_params(params)).order_by(None).count()
+        db.session.rollback()
+        _update_job(job_id, total_rows=total)
+
+        rows = _with_progress(job_id, (definition.to_row(record) for record in
+                                       _batched_records(definition, params)), total)
+        os.makedirs(folder, exist_ok=True)
+        with open(temp_path, 'wb') as output:
+            if job.format == 'pdf':
+                # ReportLab يُستورد عند أول تقرير PDF وليس عند بدء التطبيق
+                from reports import build_pdf_report
+                build_pdf_report(definition.title, definition.headers, rows, output)
+            else:
+                _write_csv(output, definition.headers, rows)
+        os.replace(temp_path, os.path.join(folder, filename))
+
+        _update_job(job_id, status='done', progress=100, result_path=filename,
+                    result_size=os.path.getsize(os.path.join(folder, filename)),
+                    finished_at=datetime.utcnow())
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في تنفيذ التقرير {job_id}: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        _update_job(job_id, status='failed', error=str(e)[:1000], finished_at=datetime.utcnow())
+    return True
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_worker_app = None
+
+
+def _init_worker(app):
+    """تُنفذ مرة في كل عملية: اتصالات قاعدة البيانات الموروثة من الأب لا تُستخدم في الابن"""
+    global _worker_app
+    _worker_app = app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _run_in_worker(job_id):
+    with _worker_app.app_context():
+        return run_report_job(job_id)
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # fork كما في معالجة الصور: لا يُعاد استيراد التطبيق وتُورث تعريفات التقارير
+                _pool = ProcessPoolExecutor(
+                    max_workers=current_app.config['REPORT_WORKERS'],
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=(current_app._get_current_object(),)
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _enqueue(job_id):
+    app = current_app._get_current_object()
+    future = _get_pool().submit(_run_in_worker, job_id)
+
+    def done(future):
+        # توقف العملية نفسها (وليس خطأ التقرير الذي تسجله المهمة بنفسها)
+        error = future.exception()
+        if error is not None:
+            app.logger.error(f"توقفت عملية التقرير {job_id}: {error}")
+            with app.app_context():
+                _update_job(job_id, status='failed', error=str(error)[:1000], finished_at=datetime.utcnow())
+
+    future.add_done_callback(done)
+    return future
+
+
+def run_pending_report_jobs(stale_minutes=30):
+    """
+    تنفيذ المهام المنتظرة في العملية الحالية، للاستخدام من سطر الأوامر
+
+    المهام العالقة في running منذ stale_minutes (توقفت عمليتها) تُعاد للطابور
+    أولاً. يُرجع عدد المهام المنفذة.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes)
+    db.session.execute(
+        update(ReportJob).where(ReportJob.status == 'running', ReportJob.started_at < cutoff).values(status='queued')
+    )
+    db.session.commit()
+
+    job_ids = db.session.execute(
+        select(ReportJob.id).where(ReportJob.status == 'queued').order_by(ReportJob.created_at)
+    ).scalars().all()
+    return sum(1 for job_id in job_ids if run_report_job(job_id))
+
+
+def purge_report_jobs(retention_hours=24):
+    """حذف المهام المنتهية الأقدم من retention_hours وملفات نتائجها، ويُرجع عددها"""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    jobs = ReportJob.query.filter(
+        ReportJob.status.in_(('done', 'failed')), ReportJob.finished_at < cutoff
+    ).all()
+    for job in jobs:
+        if job.result_path and os.path.exists(result_file_path(job)):
+            os.remove(result_file_path(job))
+        db.session.delete(job)
+    db.session.commit()
+    return len(jobs)
+
+
+def report_job_payload(job, cached=False):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'format': job.format,
+        'params': json.loads(job.params),
+        'status': job.status,
+        'progress': job.progress,
+        'total_rows': job.total_rows,
+        'result_size': job.result_size,
+        'error': job.error,
+        'cached': cached,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
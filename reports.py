@@ -0,0 +1,209 @@
+"""
+محرك تقارير PDF
+
+يُسجل خط عربي TTF مرة واحدة للعملية (عند أول تقرير، أو في عملية gunicorn
+الرئيسية مع preload) وتُبنى الأنماط مرة واحدة، ويُشكَّل النص العربي (وصل
+الحروف) ويُرتب من اليمين لليسار قبل رسمه، فـ ReportLab لا يفعل ذلك بنفسه. يُكتب التقرير في ذاكرة (BytesIO) أو أي ملف مفتوح بدلاً من ملف
+في مجلد العمل، والجداول الكبيرة تُقسم إلى LongTable بعدد محدود من الصفوف مع
+تكرار صف العناوين، بعروض أعمدة محسوبة مرة واحدة من عينة من الصفوف، فلا يقيس
+ReportLab كل خلية ولا يعيد نسخ الجدول المتبقي عند كل صفحة.
+"""
+import io
+import logging
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+import arabic_reshaper
+from bidi import get_display
+from flask import current_app, has_app_context
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+
+logger = logging.getLogger(__name__)
+
+# مسارات شائعة لخطوط تدعم العربية، تُجرب بالترتيب إذا لم يُحدد REPORT_FONT_PATH
+FONT_CANDIDATES = (
+    ('/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf',
+     '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf', None),
+    ('/usr/share/fonts/truetype/amiri/Amiri-Regular.ttf',
+     '/usr/share/fonts/truetype/amiri/Amiri-Bold.ttf'),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+     '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+)
+
+REPORT_FONT = 'ReportArabic'
+REPORT_FONT_BOLD = 'ReportArabic-Bold'
+
+# عدد صفوف كل LongTable، وعدد الصفوف المستخدمة لحساب عروض الأعمدة
+TABLE_CHUNK_ROWS = 500
+WIDTH_SAMPLE_ROWS = 200
+
+FONT_SIZE = 9
+CELL_PADDING = 4
+
+_RTL_TEXT = re.compile('[\u0590-\u08ff\ufb1d-\ufdff\ufe70-\ufefc]')
+
+_fonts = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold', 'loaded': False}
+
+
+def register_report_fonts(font_path=None, bold_font_path=None):
+    """
+    تسجيل الخط العربي مرة واحدة للعملية، ويُرجع اسم الخط المستخدم
+
+    إذا لم يوجد خط يدعم العربية تبقى Helvetica وتظهر الحروف العربية مربعات.
+    """
+    if _fonts['regular'] == REPORT_FONT:
+        return REPORT_FONT
+    _fonts['loaded'] = True
+
+    candidates = ((font_path, bold_font_path),) if font_path else FONT_CANDIDATES
+    for regular, bold in candidates:
+        if not os.path.exists(regular):
+            continue
+        pdfmetrics.registerFont(TTFont(REPORT_FONT, regular))
+        _fonts['regular'] = _fonts['bold'] = REPORT_FONT
+        if bold and os.path.exists(bold):
+            pdfmetrics.registerFont(TTFont(REPORT_FONT_BOLD, bold))
+            _fonts['bold'] = REPORT_FONT_BOLD
+        _styles.cache_clear()
+        return REPORT_FONT
+
+    logger.warning("لم يُعثر على خط عربي لتقارير PDF، حدد REPORT_FONT_PATH")
+    return _fonts['regular']
+
+
+@lru_cache(maxsize=65536)
+def shape_text(text):
+    """
+    وصل الحروف العربية وترتيب السطر من اليمين لليسار للرسم في PDF
+
+    القيم المتكررة في التقارير (الحالات، أسماء الدورات) تُشكَّل مرة واحدة.
+    """
+    if not _RTL_TEXT.search(text):
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def _ensure_fonts():
+    """تسجيل الخط عند أول تقرير في العملية إذا لم يُسجل مسبقاً"""
+    if not _fonts['loaded']:
+        config = current_app.config if has_app_context() else {}
+        register_report_fonts(config.get('REPORT_FONT_PATH'), config.get('REPORT_FONT_BOLD_PATH'))
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M')
+    elif hasattr(value, 'strftime'):
+        value = value.strftime('%Y-%m-%d')
+    elif isinstance(value, bool):
+        value = 'نعم' if value else 'لا'
+    elif isinstance(value, float):
+        value = f'{value:g}'
+    return shape_text(str(value))
+
+
+@lru_cache(maxsize=None)
+def _styles(font, bold_font):
+    return {
+        'title': ParagraphStyle('ReportTitle', fontName=bold_font, fontSize=16, leading=22,
+                                alignment=TA_CENTER, spaceAfter=6),
+        'subtitle': ParagraphStyle('ReportSubtitle', fontName=font, fontSize=9, leading=12,
+                                   alignment=TA_RIGHT, textColor=colors.grey),
+        'table': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            ('FONTNAME', (0, 0), (-1, 0), bold_font),
+            ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f4f6f7')]),
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), CELL_PADDING),
+            ('RIGHTPADDING', (0, 0), (-1, -1), CELL_PADDING),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#bdc3c7')),
+        ]),
+    }
+
+
+def _column_widths(header, sample, available_width, font, bold_font):
+    """عروض الأعمدة من عينة الصفوف، مصغرة بالتناسب لتتسع في عرض الصفحة"""
+    widths = [stringWidth(text, bold_font, FONT_SIZE) for text in header]
+    for row in sample:
+        for index, text in enumerate(row):
+            widths[index] = max(widths[index], stringWidth(text, font, FONT_SIZE))
+    widths = [width + 2 * CELL_PADDING + 2 for width in widths]
+    total = sum(widths)
+    if total > available_width:
+        widths = [width * available_width / total for width in widths]
+    return widths
+
+
+def build_pdf_report(title, headers, rows, output=None, subtitle=None, orientation=None):
+    """
+    كتابة تقرير PDF بجدول في output (ملف مفتوح أو BytesIO جديد)، ويُرجع output
+
+    rows أي مكرر من القوائم، مثل استعلام بـ yield_per. الأعمدة تُعرض من اليمين
+    لليسار كما في الصفحات العربية. orientation: 'landscape' أو 'portrait'،
+    وتُختار تلقائياً حسب عدد الأعمدة إذا لم تُحدد.
+    """
+    if output is None:
+        output = io.BytesIO()
+    _ensure_fonts()
+    font, bold_font = _fonts['regular'], _fonts['bold']
+    styles = _styles(font, bold_font)
+
+    if orientation is None:
+        orientation = 'landscape' if len(headers) > 6 else 'portrait'
+    pagesize = landscape(A4) if orientation == 'landscape' else A4
+    margin = 1.5 * cm
+    doc = SimpleDocTemplate(output, pagesize=pagesize, leftMargin=margin, rightMargin=margin,
+                            topMargin=margin, bottomMargin=margin, title=title)
+
+    story = [Paragraph(escape(shape_text(title)), styles['title'])]
+    if subtitle is None:
+        subtitle = f"تاريخ الإنشاء: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    if subtitle:
+        story.append(Paragraph(escape(shape_text(subtitle)), styles['subtitle']))
+    story.append(Spacer(1, 10))
+
+    # ترتيب الأعمدة معكوس: العمود الأول في أقصى اليمين
+    header = [shape_text(str(text)) for text in reversed(headers)]
+    chunk = []
+    widths = None
+    tables = 0
+
+    def flush(chunk):
+        nonlocal tables
+        table = LongTable([header] + chunk, colWidths=widths, repeatRows=1, hAlign='RIGHT')
+        table.setStyle(styles['table'])
+        story.append(table)
+        tables += 1
+
+    for row in rows:
+        chunk.append([_cell_text(value) for value in reversed(row)])
+        if widths is None and len(chunk) >= WIDTH_SAMPLE_ROWS:
+            widths = _column_widths(header, chunk, doc.width, font, bold_font)
+        if len(chunk) >= TABLE_CHUNK_ROWS:
+            flush(chunk)
+            chunk = []
+    if widths is None:
+        widths = _column_widths(header, chunk, doc.width, font, bold_font)
+    if chunk or not tables:
+        flush(chunk)
+
+    doc.build(story)
+    return output
@@ -0,0 +1,388 @@
+"""
+رفع المستندات الكبيرة على أجزاء مع إمكانية الاستئناف
+
+الرفع العادي يصل في طلب multipart واحد يحفظه Werkzeug كاملاً قبل معالجته،
+ومحدود بـ MAX_CONTENT_LENGTH. هنا يبدأ العميل جلسة بحجم الملف، ثم يرسل كل
+جزء في طلب PUT مستقل ببصمته sha256، فيُكتب الجزء مباشرة في موضعه من ملف مؤقت
+دون تخزين وسيط ويُسجل بعد التحقق من بصمته. إذا انقطع الاتصال يسأل العميل عن
+الأجزاء المستلمة ويكمل الباقي فقط، ولا يشغل أي طلب العامل أكثر من زمن جزء
+واحد. عند الإكمال يُربط الملف بمخزن المستندات حسب المحتوى (documents.py)،
+ولا يُحذف الملف المؤقت إلا بعد commit فيمكن إعادة طلب الإكمال إذا فشل.
+
+    POST   /resumable-uploads                         {"filename", "size", "sha256"?, "description"?}
+    GET    /resumable-uploads/<id>                    الأجزاء المستلمة
+    PUT    /resumable-uploads/<id>/chunks/<index>     جسم الطلب = الجزء، X-Chunk-SHA256: بصمته
+    POST   /resumable-uploads/<id>/complete
+    DELETE /resumable-uploads/<id>
+"""
+import hashlib
+import math
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import select, delete, update, func
+from werkzeug.exceptions import ClientDisconnected
+
+from app import db
+from models import Document, UploadSession, UploadChunk
+from documents import store_blob, temp_upload_path, HASH_CHUNK_SIZE
+from utils import allowed_file
+
+resumable_bp = Blueprint('resumable', __name__)
+
+RESUMABLE_FOLDER = 'documents/.resumable'
+COPY_BLOCK_SIZE = 256 * 1024
+
+
+class UploadError(Exception):
+    """خطأ في طلب الرفع، مع رمز حالة HTTP المناسب"""
+
+    def __init__(self, message, status=400, missing=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.missing = missing
+
+
+def _part_path(upload_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], RESUMABLE_FOLDER, f'{upload_id}.part')
+
+
+def total_chunks(upload):
+    return math.ceil(upload.total_size / upload.chunk_size)
+
+
+def received_chunks(upload_id):
+    return db.session.execute(
+        select(UploadChunk.index).where(UploadChunk.upload_id == upload_id).order_by(UploadChunk.index)
+    ).scalars().all()
+
+
+def start_upload(user_id, filename, total_size, expected_digest=None, description=None):
+    """إنشاء جلسة رفع وملف مؤقت بالحجم النهائي، ويُضاف الصف للجلسة دون commit"""
+    if not filename or not allowed_file(filename, 'large_documents'):
+        raise UploadError('نوع الملف غير مسموح')
+    # bool من int في بايثون، فـ JSON true ليس حجماً
+    if type(total_size) is not int or total_size <= 0:
+        raise UploadError('حجم الملف غير صالح')
+    config = current_app.config
+    if total_size > config['RESUMABLE_UPLOAD_MAX_SIZE']:
+        raise UploadError('حجم الملف أكبر من المسموح', 413)
+
+    # كل جلسة تحجز ملفاً بحجمها النهائي، فيُحد عدد الجلسات المفتوحة للمستخدم ومجموع أحجامها
+    open_count, open_bytes = db.session.execute(
+        select(func.count(UploadSession.id), func.coalesce(func.sum(UploadSession.total_size), 0)).where(
+            UploadSession.user_id == user_id, UploadSession.status == 'open'
+        )
+    ).one()
+    if open_count >= config['RESUMABLE_UPLOAD_MAX_OPEN']:
+        raise UploadError('لديك عدد كبير من عمليات الرفع المفتوحة، أكملها أو ألغها أولاً', 429)
+    if open_bytes + total_size > config['RESUMABLE_UPLOAD_MAX_OPEN_BYTES']:
+        raise UploadError('مجموع أحجام عمليات الرفع المفتوحة أكبر من المسموح', 413)
+    if expected_digest is not None:
+        expected_digest = str(expected_digest).lower()
+        if len(expected_digest) != 64:
+            raise UploadError('بصمة الملف غير صالحة')
+
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=filename[:200],
+        description=description,
+        total_size=total_size,
+        chunk_size=current_app.config['RESUMABLE_UPLOAD_CHUNK_SIZE'],
+        expected_digest=expected_digest,
+        status='open'
+    )
+    part_path = _part_path(upload.id)
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    # ملف متناثر (sparse) بالحجم النهائي، فيُكتب كل جزء في موضعه بأي ترتيب
+    with open(part_path, 'wb') as part:
+        part.truncate(total_size)
+    db.session.add(upload)
+    return upload
+
+
+def write_chunk(upload, index, stream, checksum):
+    """
+    كتابة جزء في موضعه من الملف المؤقت مع حساب بصمته أثناء القراءة
+
+    يُسجل الجزء فقط إذا اكتمل حجمه وطابقت بصمته، وإعادة إرسال جزء مسجل
+    تستبدله. تُرجع حجم الجزء.
+    """
+    if upload.status != 'open':
+        raise UploadError('جلسة الرفع مغلقة', 409)
+    if not 0 <= index < total_chunks(upload):
+        raise UploadError('رقم الجزء غير صالح')
+    if not checksum or len(checksum) != 64:
+        raise UploadError('بصمة الجزء مطلوبة (X-Chunk-SHA256)')
+
+    offset = index * upload.chunk_size
+    expected_size = min(upload.chunk_size, upload.total_size - offset)
+    hasher = hashlib.sha256()
+    written = 0
+    with open(_part_path(upload.id), 'r+b') as part:
+        part.seek(offset)
+        while True:
+            try:
+                block = stream.read(COPY_BLOCK_SIZE)
+            except ClientDisconnected:
+                raise UploadError('انقطع الاتصال قبل اكتمال الجزء')
+            if not block:
+                break
+            written += len(block)
+            if written > expected_size:
+                raise UploadError('حجم الجزء أكبر من المتوقع')
+            hasher.update(block)
+            part.write(block)
+        part.flush()
+        os.fsync(part.fileno())
+
+    if written != expected_size:
+        raise UploadError('الجزء غير مكتمل')
+    if hasher.hexdigest() != checksum.lower():
+        raise UploadError('بصمة الجزء غير مطابقة', 422)
+
+    db.session.merge(UploadChunk(upload_id=upload.id, index=index, size=written, checksum=checksum.lower()))
+    upload.updated_at = datetime.utcnow()
+    return written
+
+
+def _link_to_temp(part_path):
+    """
+    رابط ثابت للملف المؤقت (أو نسخة إن لم يدعمه نظام الملفات) ينقله store_blob،
+    فيبقى الملف المؤقت حتى commit
+    """
+    temp_path = temp_upload_path()
+    try:
+        os.link(part_path, temp_path)
+    except OSError:
+        shutil.copyfile(part_path, temp_path)
+    return temp_path
+
+
+def remove_part_file(upload_id):
+    """حذف الملف المؤقت بعد commit الإكمال أو عند الإلغاء"""
+    if os.path.exists(_part_path(upload_id)):
+        os.remove(_part_path(upload_id))
+
+
+def _completed_document(upload):
+    # طلب إكمال آخر سبق هذا الطلب؛ تُقرأ حالته بعد commit
+    db.session.rollback()
+    if upload.status != 'complete':
+        raise UploadError('ملف الرفع المؤقت غير موجود، يرجى بدء الرفع من جديد', 410)
+    return db.session.get(Document, upload.document_id)
+
+
+def complete_upload(upload):
+    """
+    التحقق من وصول كل الأجزاء وربط الملف بمخزن المستندات، ويُرجع Document
+
+    إعادة الطلب بعد نجاحه أو أثناءه تُرجع نفس المستند: الإكمال يُحجز بتحديث
+    شرطي على الحالة. الملف المؤقت يبقى، ويحذفه المستدعي بـ remove_part_file بعد
+    commit. لا يُنفذ commit إلا لحذف سجلات الأجزاء التالفة.
+    """
+    if upload.status == 'complete':
+        return db.session.get(Document, upload.document_id)
+
+    checksums = dict(db.session.execute(
+        select(UploadChunk.index, UploadChunk.checksum).where(UploadChunk.upload_id == upload.id)
+    ).all())
+    missing = [index for index in range(total_chunks(upload)) if index not in checksums]
+    if missing:
+        raise UploadError('لم تصل كل الأجزاء بعد', 409, missing=missing)
+
+    # بصمة الملف كاملاً لا تُركب من بصمات الأجزاء، فتُحسب بقراءة واحدة من القرص
+    # يُعاد فيها التحقق من كل جزء أيضاً: إعادة إرسال جزء مسجل ثم انقطاعها تُفسد موضعه
+    part_path = _part_path(upload.id)
+    if not os.path.exists(part_path):
+        return _completed_document(upload)
+    hasher = hashlib.sha256()
+    corrupted = []
+    with open(part_path, 'rb') as part:
+        for index in range(total_chunks(upload)):
+            chunk_hasher = hashlib.sha256()
+            remaining = min(upload.chunk_size, upload.total_size - index * upload.chunk_size)
+            while remaining:
+                block = part.read(min(HASH_CHUNK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                chunk_hasher.update(block)
+                hasher.update(block)
+            if chunk_hasher.hexdigest() != checksums[index]:
+                corrupted.append(index)
+    if corrupted:
+        # تُحذف من السجل فوراً حتى تظهر للعميل كأجزاء ناقصة فيعيد إرسالها
+        db.session.execute(delete(UploadChunk).where(
+            UploadChunk.upload_id == upload.id, UploadChunk.index.in_(corrupted)
+        ))
+        db.session.commit()
+        raise UploadError('بعض الأجزاء تالفة ويجب إعادة إرسالها', 409, missing=corrupted)
+
+    digest = hasher.hexdigest()
+    if upload.expected_digest and digest != upload.expected_digest:
+        raise UploadError('بصمة الملف غير مطابقة', 422)
+
+    # store_blob يكتب في معاملة مستقلة، فيسبق حجز الإكمال (قفل الكتابة في SQLite)
+    extension = upload.filename.rsplit('.', 1)[1].lower()
+    path = store_blob(_link_to_temp(part_path), digest, upload.total_size, extension)
+
+    claimed = db.session.execute(
+        update(UploadSession).where(UploadSession.id == upload.id, UploadSession.status == 'open').values(
+            status='complete', updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        return _completed_document(upload)
+
+    document = Document(
+        user_id=upload.user_id,
+        filename=path,
+        original_filename=upload.filename,
+        file_type=extension,
+        file_size=upload.total_size,
+        description=upload.description
+    )
+    db.session.add(document)
+    db.session.flush()
+
+    upload.document_id = document.id
+    db.session.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload.id))
+    return document
+
+
+def abort_upload(upload):
+    """إلغاء جلسة مفتوحة وحذف ملفها المؤقت، دون commit"""
+    db.session.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload.id))
+    db.session.delete(upload)
+    remove_part_file(upload.id)
+
+
+def expire_upload_sessions(ttl_hours=24):
+    """حذف الجلسات المتروكة (لم يصل لها جزء منذ ttl_hours) وملفاتها، والجلسات المكتملة القديمة"""
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    expired = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for upload in expired:
+        abort_upload(upload)
+    db.session.commit()
+    return len(expired)
+
+
+def _get_own_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.user_id != current_user.id:
+        raise UploadError('جلسة الرفع غير موجودة', 404)
+    return upload
+
+
+def _session_payload(upload):
+    return {
+        'upload_id': upload.id,
+        'status': upload.status,
+        'size': upload.total_size,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': total_chunks(upload),
+        'received': received_chunks(upload.id),
+        'document_id': upload.document_id
+    }
+
+
+@resumable_bp.errorhandler(UploadError)
+def handle_upload_error(error):
+    db.session.rollback()
+    payload = {'success': False, 'message': error.message}
+    if error.missing is not None:
+        payload['missing'] = error.missing
+    return jsonify(payload), error.status
+
+
+@resumable_bp.route('', methods=['POST'])
+@login_required
+def init_upload():
+    """بدء جلسة رفع جديدة"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        upload = start_upload(
+            current_user.id,
+            payload.get('filename'),
+            payload.get('size'),
+            expected_digest=payload.get('sha256'),
+            description=payload.get('description')
+        )
+        db.session.commit()
+    except UploadError:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في بدء جلسة الرفع: {str(e)}")
+        return jsonify({'success': False, 'message': 'حدث خطأ في بدء الرفع'}), 500
+
+    return jsonify({'success': True, **_session_payload(upload)}), 201
+
+
+@resumable_bp.route('/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    """حالة الجلسة والأجزاء المستلمة، للاستئناف بعد انقطاع الاتصال"""
+    upload = _get_own_upload(upload_id)
+    return jsonify({'success': True, **_session_payload(upload)})
+
+
+@resumable_bp.route('/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    """استقبال جزء واحد وكتابته مباشرة على القرص"""
+    upload = _get_own_upload(upload_id)
+    try:
+        size = write_chunk(upload, index, request.stream, request.headers.get('X-Chunk-SHA256', ''))
+        db.session.commit()
+    except UploadError:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في استقبال الجزء {index} من {upload_id}: {str(e)}")
+        return jsonify({'success': False, 'message': 'حدث خطأ في استقبال الجزء'}), 500
+
+    return jsonify({'success': True, 'index': index, 'size': size})
+
+
+@resumable_bp.route('/<upload_id>/complete', methods=['POST'])
+@login_required
+def finish_upload(upload_id):
+    """إكمال الرفع وإنشاء المستند"""
+    upload = _get_own_upload(upload_id)
+    try:
+        document = complete_upload(upload)
+        db.session.commit()
+        remove_part_file(upload_id)
+    except UploadError:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في إكمال الرفع {upload_id}: {str(e)}")
+        return jsonify({'success': False, 'message': 'حدث خطأ في إكمال الرفع'}), 500
+
+    return jsonify({
+        'success': True,
+        'document_id': document.id,
+        'filename': document.filename,
+        'size': document.file_size
+    })
+
+
+@resumable_bp.route('/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    """إلغاء الرفع"""
+    upload = _get_own_upload(upload_id)
+    if upload.status != 'open':
+        raise UploadError('جلسة الرفع مكتملة', 409)
+    abort_upload(upload)
+    db.session.commit()
+    return jsonify({'success': True})
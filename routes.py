@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import User, Course, Enrollment
 from app import db
+from search import filter_courses_by_search
+from pagination import keyset_paginate
+from replicas import read_only
 
 main_bp = Blueprint('main', __name__)
 
@@ -25,19 +28,23 @@ def index():
                          latest_courses=latest_courses)
 
 @main_bp.route('/courses')
+@read_only
 def courses():
     """صفحة عرض جميع الدورات"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '', type=str)
     search = request.args.get('search', '', type=str)
     
     # فلترة الدورات حسب البحث
     query = Course.query.filter_by(is_active=True)
+    rank = None
     if search:
-        query = query.filter(Course.name.contains(search))
+        query, rank = filter_courses_by_search(query, search)
     
-    courses = query.order_by(Course.created_at.desc()).paginate(
-        page=page, per_page=12, error_out=False
-    )
+    # نتائج البحث مرتبة حسب الصلة، وبقية القائمة حسب تاريخ الإضافة
+    if rank is not None:
+        courses = keyset_paginate(query, (rank, Course.id), cursor, per_page=12, descending=False)
+    else:
+        courses = keyset_paginate(query, (Course.created_at, Course.id), cursor, per_page=12)
     
     return render_template('courses.html', courses=courses, search=search)
 
@@ -0,0 +1,200 @@
+"""
+فهرس البحث النصي للدورات مع توحيد الكتابة العربية
+
+يُطبَّق نفس التوحيد (إزالة التشكيل والتطويل، توحيد أشكال الألف والهمزة،
+التاء المربوطة والألف المقصورة، حذف أداة التعريف) على النص عند الفهرسة وعلى
+عبارة البحث،
+ثم يُستخدم FTS5 مع SQLite أو tsvector مع PostgreSQL حسب المحرك.
+"""
+import re
+
+from sqlalchemy import event, text, inspect, select, Integer, Float
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Course
+
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و',
+    'ة': 'ه',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# أدوات التعريف التي تُحذف من بداية الكلمة (الأطول أولاً)
+ARABIC_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+# وزن الاسم مقابل الوصف عند ترتيب النتائج
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def normalize_arabic(value):
+    """توحيد النص العربي للفهرسة والبحث"""
+    if not value:
+        return ''
+    value = ARABIC_DIACRITICS.sub('', value)
+    value = value.translate(ARABIC_LETTER_MAP).lower()
+    return ' '.join(NON_WORD.sub(' ', value).split())
+
+
+def search_tokens(value):
+    """كلمات النص بعد التوحيد وحذف أداة التعريف، للفهرسة وللبحث"""
+    tokens = []
+    for token in normalize_arabic(value).split():
+        for prefix in ARABIC_ARTICLES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                token = token[len(prefix):]
+                break
+        tokens.append(token)
+    return tokens
+
+
+def _backend():
+    return db.engine.dialect.name
+
+
+def ensure_course_search_index():
+    """إنشاء جدول الفهرس إذا لم يكن موجوداً وبناؤه لأول مرة"""
+    backend = _backend()
+    if backend not in ('sqlite', 'postgresql'):
+        return False
+
+    if inspect(db.engine).has_table('course_search'):
+        return True
+
+    with db.engine.begin() as connection:
+        if backend == 'sqlite':
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE course_search USING fts5("
+                "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+        else:
+            connection.execute(text(
+                "CREATE TABLE course_search ("
+                "course_id INTEGER PRIMARY KEY REFERENCES course(id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"
+            ))
+            connection.execute(text(
+                "CREATE INDEX ix_course_search_document ON course_search USING GIN (document)"
+            ))
+    rebuild_course_search_index()
+    return True
+
+
+def _index_courses(connection, courses):
+    """إضافة أو تحديث دورات في الفهرس، courses قائمة (id, name, description)"""
+    if not courses:
+        return
+    rows = [
+        {
+            'course_id': course_id,
+            'name': ' '.join(search_tokens(name)),
+            'description': ' '.join(search_tokens(description))
+        }
+        for course_id, name, description in courses
+    ]
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("DELETE FROM course_search WHERE rowid = :course_id"), rows)
+        connection.execute(text(
+            "INSERT INTO course_search (rowid, name, description) VALUES (:course_id, :name, :description)"
+        ), rows)
+    else:
+        connection.execute(text(
+            "INSERT INTO course_search (course_id, document) VALUES (:course_id, "
+            "setweight(to_tsvector('simple', :name), 'A') || setweight(to_tsvector('simple', :description), 'B')) "
+            "ON CONFLICT (course_id) DO UPDATE SET document = EXCLUDED.document"
+        ), rows)
+
+
+def _remove_courses(connection, course_ids):
+    if not course_ids:
+        return
+    column = 'rowid' if connection.dialect.name == 'sqlite' else 'course_id'
+    connection.execute(text(f"DELETE FROM course_search WHERE {column} = :course_id"),
+                       [{'course_id': course_id} for course_id in course_ids])
+
+
+def rebuild_course_search_index(chunk_size=1000):
+    """إعادة بناء الفهرس لكل الدورات"""
+    with db.engine.begin() as connection:
+        connection.execute(text("DELETE FROM course_search"))
+        batch = []
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(Course.id, Course.name, Course.description)
+        )
+        for row in result:
+            batch.append(tuple(row))
+            if len(batch) >= chunk_size:
+                _index_courses(connection, batch)
+                batch = []
+        _index_courses(connection, batch)
+    return db.session.query(Course.id).count()
+
+
+@event.listens_for(Session, 'after_flush')
+def update_course_search_index(session, flush_context):
+    """تحديث الفهرس مع إضافة الدورات أو تعديلها أو حذفها"""
+    changed = [obj for obj in (*session.new, *session.dirty)
+               if isinstance(obj, Course) and session.is_modified(obj)]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Course)]
+    if not changed and not deleted:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name not in ('sqlite', 'postgresql'):
+        return
+    _index_courses(connection, [(course.id, course.name, course.description) for course in changed])
+    _remove_courses(connection, deleted)
+
+
+def course_search_subquery(query_text):
+    """
+    استعلام فرعي بالأعمدة (course_id, rank) للدورات المطابقة
+
+    الترتيب تصاعدي (الأقل أفضل). يُرجع None إذا كانت العبارة فارغة أو المحرك
+    غير مدعوم، فتستخدم الصفحة البحث العادي.
+    """
+    tokens = search_tokens(query_text)
+    backend = _backend()
+    if not tokens or backend not in ('sqlite', 'postgresql'):
+        return None
+
+    if backend == 'sqlite':
+        # كل كلمة كبادئة بين علامتي تنصيص لتجنب صيغة استعلام FTS5
+        match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        statement = text(
+            "SELECT rowid AS course_id, "
+            f"bm25(course_search, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank "
+            "FROM course_search WHERE course_search MATCH :match"
+        ).bindparams(match=match)
+    else:
+        match = ' & '.join(f'{token}:*' for token in tokens)
+        statement = text(
+            "SELECT course_id, -ts_rank(document, to_tsquery('simple', :match)) AS rank "
+            "FROM course_search WHERE document @@ to_tsquery('simple', :match)"
+        ).bindparams(match=match)
+
+    return statement.columns(course_id=Integer, rank=Float).subquery('course_search_results')
+
+
+def filter_courses_by_search(query, query_text):
+    """
+    تطبيق البحث على استعلام دورات دون ترتيب، وتُرجع (query, rank)
+
+    rank عمود الصلة (الأقل أفضل) أو None عند استخدام البحث العادي.
+    """
+    results = course_search_subquery(query_text)
+    if results is None:
+        return query.filter(Course.name.contains(query_text)), None
+    return query.join(results, results.c.course_id == Course.id), results.c.rank
+
+
+def search_courses(query, query_text):
+    """تطبيق البحث على استعلام دورات مرتباً حسب الصلة"""
+    query, rank = filter_courses_by_search(query, query_text)
+    return query if rank is None else query.order_by(rank)
@@ -270,6 +270,10 @@
     function initializeFileUpload() {
         var fileInputs = document.querySelectorAll('input[type="file"]');
         fileInputs.forEach(function(input) {
+            // الملفات الكبيرة تُرفع على أجزاء عبر ResumableUpload دون حد الـ 5 ميجابايت
+            if (input.hasAttribute('data-resumable-upload')) {
+                return;
+            }
             input.addEventListener('change', function(e) {
                 var file = e.target.files[0];
                 if (file) {
@@ -370,6 +374,10 @@
             });
         });
 
+        // الإكمال التلقائي من الخادم
+        var autocompleteInputs = document.querySelectorAll('[data-autocomplete-url]');
+        autocompleteInputs.forEach(initializeAutocomplete);
+
         // فلاتر الصفحة
         var filterSelects = document.querySelectorAll('.page-filter');
         filterSelects.forEach(function(select) {
@@ -379,6 +387,52 @@
         });
     }
 
+    // ربط حقل البحث بقائمة اقتراحات من الخادم
+    function initializeAutocomplete(input) {
+        var list = document.createElement('datalist');
+        list.id = (input.id || input.name) + '-suggestions';
+        input.setAttribute('list', list.id);
+        input.setAttribute('autocomplete', 'off');
+        input.parentNode.appendChild(list);
+
+        var debounceTimer;
+        var controller;
+        input.addEventListener('input', function() {
+            clearTimeout(debounceTimer);
+            var query = input.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            debounceTimer = setTimeout(function() {
+                // إلغاء الطلب السابق حتى لا تظهر نتائج قديمة
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                var url = input.dataset.autocompleteUrl +
+                    (input.dataset.autocompleteUrl.includes('?') ? '&' : '?') +
+                    'q=' + encodeURIComponent(query);
+                fetch(url, { signal: controller.signal })
+                    .then(response => response.json())
+                    .then(data => {
+                        list.innerHTML = '';
+                        (data.results || []).forEach(function(user) {
+                            var option = document.createElement('option');
+                            option.value = user.full_name;
+                            option.label = user.username + (user.phone ? ' - ' + user.phone : '');
+                            list.appendChild(option);
+                        });
+                    })
+                    .catch(error => {
+                        if (error.name !== 'AbortError') {
+                            console.log('خطأ في جلب الاقتراحات:', error);
+                        }
+                    });
+            }, 150);
+        });
+    }
+
     // تنفيذ البحث السريع
     function performQuickSearch(query, target) {
         var elements = document.querySelectorAll(target || '.searchable');
@@ -541,6 +595,124 @@
         }
     };
 
+    // رفع الملفات الكبيرة على أجزاء مع الاستئناف بعد انقطاع الاتصال
+    window.ResumableUpload = {
+        endpoint: '/resumable-uploads',
+        maxRetries: 5,
+
+        // رفع ملف وإرجاع Promise بنتيجة الإكمال {document_id, filename, size}
+        upload: function(file, options) {
+            options = options || {};
+            var self = this;
+            // معرف الجلسة محفوظ لنفس الملف، فإعادة المحاولة بعد إغلاق الصفحة تكمل من حيث توقفت
+            var storageKey = 'resumable-upload:' + [file.name, file.size, file.lastModified].join(':');
+
+            return self._resume(localStorage.getItem(storageKey))
+                .then(function(session) {
+                    return session || self._request('POST', self.endpoint, JSON.stringify({
+                        filename: file.name,
+                        size: file.size,
+                        description: options.description
+                    }), { 'Content-Type': 'application/json' });
+                })
+                .then(function(session) {
+                    localStorage.setItem(storageKey, session.upload_id);
+                    return self._sendChunks(file, session, options.onProgress);
+                })
+                .then(function(session) {
+                    return self._request('POST', self.endpoint + '/' + session.upload_id + '/complete')
+                        .catch(function(error) {
+                            // أجزاء تالفة: تُعاد ثم يُطلب الإكمال مرة أخرى
+                            if (!error.missing) throw error;
+                            session.received = session.received.filter(function(index) {
+                                return error.missing.indexOf(index) === -1;
+                            });
+                            return self._sendChunks(file, session, options.onProgress).then(function() {
+                                return self._request('POST', self.endpoint + '/' + session.upload_id + '/complete');
+                            });
+                        });
+                })
+                .then(function(result) {
+                    localStorage.removeItem(storageKey);
+                    return result;
+                });
+        },
+
+        _resume: function(uploadId) {
+            if (!uploadId) return Promise.resolve(null);
+            return this._request('GET', this.endpoint + '/' + uploadId)
+                .then(function(session) {
+                    return session.status === 'open' ? session : null;
+                })
+                .catch(function() {
+                    return null;
+                });
+        },
+
+        _sendChunks: function(file, session, onProgress) {
+            var self = this;
+            var received = new Set(session.received);
+            var index = 0;
+
+            function next() {
+                while (index < session.total_chunks && received.has(index)) index++;
+                if (onProgress) onProgress(received.size / session.total_chunks);
+                if (index >= session.total_chunks) return Promise.resolve(session);
+
+                var current = index++;
+                var start = current * session.chunk_size;
+                var blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+                return blob.arrayBuffer()
+                    .then(function(buffer) {
+                        return crypto.subtle.digest('SHA-256', buffer).then(function(hash) {
+                            var checksum = Array.from(new Uint8Array(hash)).map(function(b) {
+                                return b.toString(16).padStart(2, '0');
+                            }).join('');
+                            return self._withRetry(function() {
+                                return self._request('PUT', self.endpoint + '/' + session.upload_id + '/chunks/' + current,
+                                    buffer, { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum });
+                            });
+                        });
+                    })
+                    .then(function() {
+                        received.add(current);
+                        session.received = Array.from(received);
+                        return next();
+                    });
+            }
+            return next();
+        },
+
+        // إعادة المحاولة مع انتظار متزايد عند انقطاع الشبكة أو خطأ الخادم
+        _withRetry: function(send, attempt) {
+            var self = this;
+            attempt = attempt || 0;
+            return send().catch(function(error) {
+                if (attempt >= self.maxRetries || (error.status && error.status < 500)) throw error;
+                return new Promise(function(resolve) {
+                    setTimeout(resolve, Math.min(1000 * Math.pow(2, attempt), 30000));
+                }).then(function() {
+                    return self._withRetry(send, attempt + 1);
+                });
+            });
+        },
+
+        _request: function(method, url, body, headers) {
+            return fetch(url, { method: method, body: body, headers: headers || {}, credentials: 'same-origin' })
+                .then(function(response) {
+                    return response.json().catch(function() { return {}; }).then(function(data) {
+                        if (!response.ok || data.success === false) {
+                            var error = new Error(data.message || 'حدث خطأ في رفع الملف');
+                            error.status = response.status;
+                            error.missing = data.missing;
+                            throw error;
+                        }
+                        return data;
+                    });
+                });
+        }
+    };
+
     // تهيئة وظائف خاصة بكل صفحة
     var currentPage = document.body.dataset.page;
     if (currentPage) {
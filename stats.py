@@ -0,0 +1,266 @@
+"""
+صيانة جدول StudentCourseStats
+
+تُحسب التغييرات على سجلات الحضور والدرجات عند كل flush وتُطبَّق كفروقات
+(زيادة/نقصان) على صف الطالب في الدورة، فتبقى صفحات المعلم والطالب استعلاماً
+واحداً مهما كان عدد الطلاب. العمليات الجماعية التي تتجاوز الـ ORM يجب أن
+تستدعي refresh_student_course_stats للأزواج التي عدّلتها، أو
+apply_student_course_deltas إذا كانت فروقاتها معروفة.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, func, case, select, insert, update, delete, tuple_, bindparam
+from sqlalchemy.orm import Session, attributes
+
+from app import db
+from models import Attendance, AttendanceSession, Grade, StudentCourseStats
+
+ATTENDANCE_STATUS_COLUMNS = {
+    'present': 'present_count',
+    'absent': 'absent_count',
+    'late': 'late_count',
+    'excused': 'excused_count',
+}
+
+STATS_COLUMNS = ('attendance_total', 'present_count', 'absent_count', 'late_count',
+                 'excused_count', 'grade_sum', 'grade_count')
+
+STATS_CHUNK_SIZE = 500
+
+
+def _old_and_new(obj, *names):
+    """القيم قبل التعديل وبعده لمجموعة من الحقول"""
+    old, new = {}, {}
+    for name in names:
+        history = attributes.get_history(obj, name)
+        current = getattr(obj, name)
+        new[name] = current
+        old[name] = history.deleted[0] if history.deleted else current
+    return old, new
+
+
+def _attendance_delta(status, sign):
+    delta = {'attendance_total': sign}
+    column = ATTENDANCE_STATUS_COLUMNS.get(status or 'absent')
+    if column:
+        delta[column] = sign
+    return delta
+
+
+def _grade_delta(grade, sign):
+    return {'grade_sum': sign * (grade or 0.0), 'grade_count': sign}
+
+
+def _collect_deltas(session):
+    """تجميع الفروقات من الكائنات الجديدة والمعدلة والمحذوفة في هذا الـ flush"""
+    # (student_id, session_id أو course_id) -> delta
+    attendance_changes = []
+    grade_changes = []
+
+    for obj in session.new:
+        if isinstance(obj, Attendance):
+            attendance_changes.append((obj.student_id, obj.session_id, _attendance_delta(obj.status, 1)))
+        elif isinstance(obj, Grade):
+            grade_changes.append((obj.student_id, obj.course_id, _grade_delta(obj.grade, 1)))
+
+    for obj in session.dirty:
+        if isinstance(obj, Attendance):
+            old, new = _old_and_new(obj, 'student_id', 'session_id', 'status')
+            if old != new:
+                attendance_changes.append((old['student_id'], old['session_id'], _attendance_delta(old['status'], -1)))
+                attendance_changes.append((new['student_id'], new['session_id'], _attendance_delta(new['status'], 1)))
+        elif isinstance(obj, Grade):
+            old, new = _old_and_new(obj, 'student_id', 'course_id', 'grade')
+            if old != new:
+                grade_changes.append((old['student_id'], old['course_id'], _grade_delta(old['grade'], -1)))
+                grade_changes.append((new['student_id'], new['course_id'], _grade_delta(new['grade'], 1)))
+
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            old, _ = _old_and_new(obj, 'student_id', 'session_id', 'status')
+            attendance_changes.append((old['student_id'], old['session_id'], _attendance_delta(old['status'], -1)))
+        elif isinstance(obj, Grade):
+            old, _ = _old_and_new(obj, 'student_id', 'course_id', 'grade')
+            grade_changes.append((old['student_id'], old['course_id'], _grade_delta(old['grade'], -1)))
+
+    return attendance_changes, grade_changes
+
+
+def _apply_deltas(connection, deltas):
+    """تطبيق الفروقات بثلاث عبارات بغض النظر عن عدد الأزواج"""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    table = StudentCourseStats.__table__
+    now = datetime.utcnow()
+    keys = list(deltas)
+
+    existing = set()
+    for start in range(0, len(keys), STATS_CHUNK_SIZE):
+        chunk = keys[start:start + STATS_CHUNK_SIZE]
+        existing.update(connection.execute(
+            select(table.c.student_id, table.c.course_id).where(
+                tuple_(table.c.student_id, table.c.course_id).in_(chunk)
+            )
+        ).all())
+
+    missing = [key for key in keys if key not in existing]
+    if missing:
+        connection.execute(insert(table), [
+            dict({column: 0 for column in STATS_COLUMNS}, student_id=student_id,
+                 course_id=course_id, last_activity=now)
+            for student_id, course_id in missing
+        ])
+
+    statement = update(table).where(
+        table.c.student_id == bindparam('b_student_id'),
+        table.c.course_id == bindparam('b_course_id'),
+    ).values(
+        last_activity=now,
+        **{column: table.c[column] + bindparam(f'd_{column}') for column in STATS_COLUMNS}
+    )
+    connection.execute(statement, [
+        dict({f'd_{column}': delta.get(column, 0) for column in STATS_COLUMNS},
+             b_student_id=student_id, b_course_id=course_id)
+        for (student_id, course_id), delta in deltas.items()
+    ])
+
+
+@event.listens_for(Session, 'before_flush')
+def load_deleted_stats_values(session, flush_context, instances):
+    """تحميل قيم السجلات المحذوفة قبل حذفها حتى يمكن طرحها من الإحصائيات"""
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            obj.student_id, obj.session_id, obj.status
+        elif isinstance(obj, Grade):
+            obj.student_id, obj.course_id, obj.grade
+
+
+@event.listens_for(Session, 'after_flush')
+def update_student_course_stats(session, flush_context):
+    """تحديث الإحصائيات بعد كتابة تغييرات الحضور والدرجات"""
+    attendance_changes, grade_changes = _collect_deltas(session)
+    if not attendance_changes and not grade_changes:
+        return
+
+    connection = session.connection()
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    if attendance_changes:
+        session_ids = {session_id for _, session_id, _ in attendance_changes}
+        course_by_session = dict(connection.execute(
+            select(AttendanceSession.id, AttendanceSession.course_id).where(
+                AttendanceSession.id.in_(session_ids)
+            )
+        ).all())
+        for student_id, session_id, delta in attendance_changes:
+            course_id = course_by_session.get(session_id)
+            if course_id is None:
+                continue
+            for column, value in delta.items():
+                deltas[(student_id, course_id)][column] += value
+
+    for student_id, course_id, delta in grade_changes:
+        for column, value in delta.items():
+            deltas[(student_id, course_id)][column] += value
+
+    _apply_deltas(connection, deltas)
+
+
+def _aggregate_rows(pairs=None):
+    """حساب الإحصائيات من الجداول الأصلية، لكل الأزواج أو لأزواج محددة"""
+    attendance_query = select(
+        Attendance.student_id,
+        AttendanceSession.course_id,
+        func.count(Attendance.id),
+        *[func.coalesce(func.sum(case((Attendance.status == status, 1), else_=0)), 0)
+          for status in ATTENDANCE_STATUS_COLUMNS],
+        func.max(Attendance.created_at),
+    ).join(AttendanceSession, Attendance.session_id == AttendanceSession.id).group_by(
+        Attendance.student_id, AttendanceSession.course_id
+    )
+    grade_query = select(
+        Grade.student_id,
+        Grade.course_id,
+        func.coalesce(func.sum(Grade.grade), 0.0),
+        func.count(Grade.id),
+        func.max(Grade.date_recorded),
+    ).group_by(Grade.student_id, Grade.course_id)
+
+    if pairs is not None:
+        attendance_query = attendance_query.where(
+            tuple_(Attendance.student_id, AttendanceSession.course_id).in_(pairs)
+        )
+        grade_query = grade_query.where(tuple_(Grade.student_id, Grade.course_id).in_(pairs))
+
+    rows = {}
+    for student_id, course_id, total, present, absent, late, excused, last in \
+            db.session.execute(attendance_query.execution_options(yield_per=STATS_CHUNK_SIZE)):
+        rows[(student_id, course_id)] = {
+            'student_id': student_id, 'course_id': course_id,
+            'attendance_total': total, 'present_count': present, 'absent_count': absent,
+            'late_count': late, 'excused_count': excused,
+            'grade_sum': 0.0, 'grade_count': 0, 'last_activity': last,
+        }
+
+    for student_id, course_id, grade_sum, grade_count, last in \
+            db.session.execute(grade_query.execution_options(yield_per=STATS_CHUNK_SIZE)):
+        row = rows.setdefault((student_id, course_id), {
+            'student_id': student_id, 'course_id': course_id,
+            'attendance_total': 0, 'present_count': 0, 'absent_count': 0,
+            'late_count': 0, 'excused_count': 0, 'last_activity': last,
+        })
+        row['grade_sum'] = float(grade_sum)
+        row['grade_count'] = grade_count
+        if last and (row['last_activity'] is None or last > row['last_activity']):
+            row['last_activity'] = last
+
+    return rows
+
+
+def _replace_rows(rows, pairs=None):
+    table = StudentCourseStats.__table__
+    if pairs is None:
+        db.session.execute(delete(table))
+    else:
+        for start in range(0, len(pairs), STATS_CHUNK_SIZE):
+            chunk = pairs[start:start + STATS_CHUNK_SIZE]
+            db.session.execute(delete(table).where(
+                tuple_(table.c.student_id, table.c.course_id).in_(chunk)
+            ))
+
+    values = list(rows.values())
+    for start in range(0, len(values), STATS_CHUNK_SIZE):
+        db.session.execute(insert(table), values[start:start + STATS_CHUNK_SIZE])
+
+
+def apply_student_course_deltas(deltas):
+    """
+    تطبيق فروقات عملية جماعية معروفة مسبقاً دون إعادة الحساب من الجداول
+
+    deltas قاموس {(student_id, course_id): {column: value}}، ولا تقوم بالـ commit.
+    """
+    _apply_deltas(db.session.connection(), deltas)
+    return len(deltas)
+
+
+def refresh_student_course_stats(pairs):
+    """إعادة حساب أزواج (student_id, course_id) محددة بعد عمليات جماعية"""
+    pairs = list(set(pairs))
+    if not pairs:
+        return 0
+    rows = {}
+    for start in range(0, len(pairs), STATS_CHUNK_SIZE):
+        rows.update(_aggregate_rows(pairs[start:start + STATS_CHUNK_SIZE]))
+    _replace_rows(rows, pairs)
+    return len(rows)
+
+
+def rebuild_student_course_stats():
+    """إعادة بناء الجدول بالكامل من سجلات الحضور والدرجات"""
+    rows = _aggregate_rows()
+    _replace_rows(rows)
+    db.session.commit()
+    return len(rows)
@@ -1,13 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from functools import wraps
-from sqlalchemy import func, case
+from sqlalchemy import func, case, and_
 from datetime import datetime
-from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession, Notification, TeacherEvaluation
+from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession, Notification, TeacherEvaluation, StudentCourseStats
 from forms import ProfileUpdateForm, PasswordChangeForm, TeacherEvaluationForm
 from app import db
-from werkzeug.security import check_password_hash, generate_password_hash
+from passwords import hash_password, verify_password, PasswordHashingBusy
 from utils import save_uploaded_file
+from aggregates import course_grade_averages
+from notifications import mark_all_read
+from replicas import read_only
 
 student_bp = Blueprint('student', __name__)
 
@@ -24,6 +27,7 @@ def student_required(f):
 @student_bp.route('/dashboard')
 @login_required
 @student_required
+@read_only
 def dashboard():
     """لوحة تحكم الطالب"""
     # الدورات المسجل فيها الطالب
@@ -136,52 +140,30 @@ def profile():
 @student_required
 def courses():
     """دوراتي"""
-    # الدورات المسجل فيها الطالب مع التفاصيل
-    enrollments_data = db.session.query(Enrollment, Course, User).join(
+    # الدورات المسجل فيها الطالب مع التفاصيل والإحصائيات المجمّعة
+    enrollments_data = db.session.query(Enrollment, Course, User, StudentCourseStats).join(
         Course, Enrollment.course_id == Course.id
     ).outerjoin(
         User, Course.teacher_id == User.id
+    ).outerjoin(
+        StudentCourseStats, and_(
+            StudentCourseStats.student_id == Enrollment.student_id,
+            StudentCourseStats.course_id == Enrollment.course_id
+        )
     ).filter(
         Enrollment.student_id == current_user.id,
         Enrollment.is_active == True
     ).all()
     
-    # حساب الإحصائيات لكل دورة
     courses_with_stats = []
-    for enrollment, course, teacher in enrollments_data:
-        # معدل الحضور للدورة
-        attendance_stats = db.session.query(
-            func.count(Attendance.id).label('total'),
-            func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present')
-        ).join(AttendanceSession).filter(
-            Attendance.student_id == current_user.id,
-            AttendanceSession.course_id == course.id
-        ).first()
-        
-        attendance_rate = 0
-        if attendance_stats.total and attendance_stats.total > 0:
-            attendance_rate = round((attendance_stats.present / attendance_stats.total) * 100, 1)
-        
-        # متوسط الدرجات للدورة
-        avg_grade = db.session.query(func.avg(Grade.grade)).filter(
-            Grade.student_id == current_user.id,
-            Grade.course_id == course.id
-        ).scalar() or 0
-        avg_grade = round(float(avg_grade), 1) if avg_grade else 0
-        
-        # عدد الواجبات والامتحانات
-        total_assignments = Grade.query.filter(
-            Grade.student_id == current_user.id,
-            Grade.course_id == course.id
-        ).count()
-        
+    for enrollment, course, teacher, stats in enrollments_data:
         courses_with_stats.append({
             'enrollment': enrollment,
             'course': course,
             'teacher': teacher,
-            'attendance_rate': attendance_rate,
-            'avg_grade': avg_grade,
-            'total_assignments': total_assignments
+            'attendance_rate': stats.get_attendance_rate() if stats else 0,
+            'avg_grade': stats.get_average_grade() if stats else 0,
+            'total_assignments': stats.grade_count if stats else 0
         })
     
     return render_template('student/courses.html', courses_data=courses_with_stats)
@@ -292,6 +274,7 @@ def attendance():
 @student_bp.route('/grades')
 @login_required
 @student_required
+@read_only
 def grades():
     """درجاتي"""
     course_id = request.args.get('course_id', type=int)
@@ -326,14 +309,9 @@ def grades():
     
     grades_data = grades_query.order_by(Grade.date_recorded.desc()).all()
     
-    # حساب المتوسطات
-    course_averages = {}
-    for course in my_courses:
-        avg = db.session.query(func.avg(Grade.grade)).filter(
-            Grade.student_id == current_user.id,
-            Grade.course_id == course.id
-        ).scalar() or 0
-        course_averages[course.id] = round(float(avg), 1) if avg else 0
+    # حساب المتوسطات لكل الدورات في استعلام واحد
+    averages = course_grade_averages(current_user.id)
+    course_averages = {course.id: averages.get(course.id, 0) for course in my_courses}
     
     return render_template('student/grades.html',
                          my_courses=my_courses,
@@ -356,15 +334,8 @@ def notifications():
     )
     
     # تمييز الإشعارات كمقروءة عند فتح الصفحة
-    unread_notifications = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).all()
-    
-    for notification in unread_notifications:
-        notification.is_read = True
-    
     try:
+        mark_all_read(current_user.id)
         db.session.commit()
     except:
         db.session.rollback()
@@ -379,8 +350,15 @@ def change_password():
     form = PasswordChangeForm()
     
     if form.validate_on_submit():
-        if check_password_hash(current_user.password_hash, form.current_password.data):
-            current_user.password_hash = generate_password_hash(form.new_password.data)
+        try:
+            password_valid = verify_password(current_user, form.current_password.data, rehash=False)
+            new_password_hash = hash_password(form.new_password.data) if password_valid else None
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('student/change_password.html', form=form), 503
+        
+        if password_valid:
+            current_user.password_hash = new_password_hash
             try:
                 db.session.commit()
                 flash('تم تغيير كلمة المرور بنجاح', 'success')
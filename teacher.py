@@ -1,16 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from sqlalchemy import and_, func
-from datetime import datetime, date
-from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession
-from forms import AttendanceForm, GradeForm, ProfileUpdateForm, PasswordChangeForm
+from sqlalchemy import and_, func, case, select, insert, update, literal
+from datetime import datetime, date, timedelta
+from models import User, Course, Enrollment, Attendance, Grade, AttendanceSession, StudentCourseStats
+from forms import AttendanceForm, RecurringAttendanceForm, GradeForm, GradebookImportForm, ProfileUpdateForm, PasswordChangeForm
 from app import db
-from werkzeug.security import check_password_hash, generate_password_hash
-from utils import save_uploaded_file
+from passwords import hash_password, verify_password, PasswordHashingBusy
+from utils import save_uploaded_file, get_month_range
+from people_search import search_users, autocomplete_users, user_suggestion
+from aggregates import ATTENDANCE_STATUSES
+from stats import refresh_student_course_stats, apply_student_course_deltas
+import gradebook
 
 teacher_bp = Blueprint('teacher', __name__)
 
+# الحد الأقصى للطلاب في عبارة UPDATE ... CASE واحدة
+ATTENDANCE_BATCH_SIZE = 500
+
 def teacher_required(f):
     """ديكوريتر للتحقق من صلاحيات المعلم"""
     @wraps(f)
@@ -21,6 +28,112 @@ def teacher_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def create_attendance_sessions(course_id, session_dates, session_time=None, topic=None):
+    """
+    إنشاء جلسات حضور مع سجلات غياب افتراضية لجميع الطلاب المسجلين
+    
+    تُدرج الجلسات دفعة واحدة ثم سجلات الحضور بعبارة INSERT ... SELECT واحدة من
+    جدول التسجيلات. لا تقوم بالـ commit، وتُرجع (عدد الجلسات، عدد سجلات الحضور).
+    """
+    if not session_dates:
+        return 0, 0
+    
+    now = datetime.utcnow()
+    db.session.execute(insert(AttendanceSession), [
+        {
+            'course_id': course_id,
+            'session_date': session_date,
+            'session_time': session_time,
+            'topic': topic,
+            'created_at': now
+        }
+        for session_date in session_dates
+    ])
+    
+    enrolled_filter = (
+        Enrollment.course_id == course_id,
+        Enrollment.is_active == True,
+        User.is_active == True
+    )
+    
+    # سجل غياب افتراضي لكل طالب في كل جلسة جديدة
+    new_records = select(
+        Enrollment.student_id,
+        AttendanceSession.id,
+        literal('absent'),
+        literal(now)
+    ).join(
+        User, Enrollment.student_id == User.id
+    ).join(
+        AttendanceSession, AttendanceSession.course_id == Enrollment.course_id
+    ).where(
+        *enrolled_filter,
+        AttendanceSession.session_date.in_(session_dates)
+    ).distinct()
+    result = db.session.execute(
+        insert(Attendance).from_select(['student_id', 'session_id', 'status', 'created_at'], new_records)
+    )
+    
+    # الإدراج الجماعي يتجاوز أحداث الـ ORM: تُضاف السجلات الجديدة (كلها غياب)
+    # إلى الإحصائيات كفروقات بدلاً من إعادة حساب كل طالب في الدورة
+    new_counts = db.session.execute(
+        select(Attendance.student_id, func.count(Attendance.id)).where(
+            Attendance.session_id.in_(
+                select(AttendanceSession.id).where(
+                    AttendanceSession.course_id == course_id,
+                    AttendanceSession.session_date.in_(session_dates)
+                )
+            ),
+            Attendance.created_at == now
+        ).group_by(Attendance.student_id)
+    ).all()
+    apply_student_course_deltas({
+        (student_id, course_id): {'attendance_total': count, 'absent_count': count}
+        for student_id, count in new_counts
+    })
+    
+    return len(session_dates), result.rowcount
+
+def apply_attendance_changes(session, changes):
+    """
+    تطبيق تغييرات الحضور لجلسة بعبارة UPDATE ... CASE واحدة
+    
+    changes قاموس {student_id: status} يحتوي فقط على الصفوف المعدلة. لا تقوم
+    بالـ commit، وتُرجع عدد السجلات المحدثة.
+    """
+    changes = {student_id: status for student_id, status in changes.items()
+               if status in ATTENDANCE_STATUSES}
+    if not changes:
+        return 0
+    
+    updated = 0
+    student_ids = list(changes)
+    for start in range(0, len(student_ids), ATTENDANCE_BATCH_SIZE):
+        chunk = student_ids[start:start + ATTENDANCE_BATCH_SIZE]
+        result = db.session.execute(
+            update(Attendance).where(
+                Attendance.session_id == session.id,
+                Attendance.student_id.in_(chunk)
+            ).values(
+                status=case({student_id: changes[student_id] for student_id in chunk},
+                            value=Attendance.student_id)
+            ).execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    
+    # التحديث الجماعي يتجاوز أحداث الـ ORM فتُحدَّث الإحصائيات صراحةً
+    refresh_student_course_stats([(student_id, session.course_id) for student_id in student_ids])
+    
+    return updated
+
+def get_session_status_counts(session_id):
+    """عدد سجلات الحضور لكل حالة في الجلسة"""
+    counts = dict.fromkeys(ATTENDANCE_STATUSES, 0)
+    counts.update(db.session.query(
+        Attendance.status, func.count(Attendance.id)
+    ).filter(Attendance.session_id == session_id).group_by(Attendance.status).all())
+    return counts
+
 @teacher_bp.route('/dashboard')
 @login_required
 @teacher_required
@@ -50,16 +163,15 @@ def dashboard():
     ).order_by(Grade.date_recorded.desc()).limit(10).all()
     
     # إحصائيات الحضور لهذا الشهر
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    month_start, next_month_start = get_month_range()
     
     monthly_attendance = db.session.query(
         func.count(Attendance.id).label('total'),
-        func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present')
+        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present')
     ).join(AttendanceSession).join(Course).filter(
         Course.teacher_id == current_user.id,
-        func.extract('month', AttendanceSession.session_date) == current_month,
-        func.extract('year', AttendanceSession.session_date) == current_year
+        AttendanceSession.session_date >= month_start,
+        AttendanceSession.session_date < next_month_start
     ).first()
     
     attendance_rate = 0
@@ -100,43 +212,26 @@ def students():
         query = query.filter(Course.id == course_id)
     
     if search:
-        query = query.filter(
-            (User.full_name.contains(search)) |
-            (User.username.contains(search)) |
-            (User.email.contains(search))
+        query = search_users(query, search, 'student')
+    
+    # الإحصائيات المجمّعة مسبقاً لكل (طالب، دورة) في نفس الاستعلام
+    query = query.outerjoin(
+        StudentCourseStats, and_(
+            StudentCourseStats.student_id == Enrollment.student_id,
+            StudentCourseStats.course_id == Enrollment.course_id
         )
+    ).add_entity(StudentCourseStats)
     
     students_data = query.order_by(User.full_name).all()
     
-    # حساب إحصائيات لكل طالب
     students_with_stats = []
-    for user, enrollment, course in students_data:
-        # معدل الحضور
-        attendance_stats = db.session.query(
-            func.count(Attendance.id).label('total'),
-            func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present')
-        ).join(AttendanceSession).filter(
-            Attendance.student_id == user.id,
-            AttendanceSession.course_id == course.id
-        ).first()
-        
-        attendance_rate = 0
-        if attendance_stats.total and attendance_stats.total > 0:
-            attendance_rate = round((attendance_stats.present / attendance_stats.total) * 100, 1)
-        
-        # متوسط الدرجات
-        avg_grade = db.session.query(func.avg(Grade.grade)).filter(
-            Grade.student_id == user.id,
-            Grade.course_id == course.id
-        ).scalar() or 0
-        avg_grade = round(float(avg_grade), 1) if avg_grade else 0
-        
+    for user, enrollment, course, stats in students_data:
         students_with_stats.append({
             'student': user,
             'enrollment': enrollment,
             'course': course,
-            'attendance_rate': attendance_rate,
-            'avg_grade': avg_grade
+            'attendance_rate': stats.get_attendance_rate() if stats else 0,
+            'avg_grade': stats.get_average_grade() if stats else 0
         })
     
     return render_template('teacher/students.html',
@@ -145,6 +240,23 @@ def students():
                          selected_course=course_id,
                          search=search)
 
+@teacher_bp.route('/students/autocomplete')
+@login_required
+@teacher_required
+def students_autocomplete():
+    """اقتراحات طلاب المعلم أثناء الكتابة"""
+    query_text = request.args.get('q', '', type=str)
+    limit = min(request.args.get('limit', 10, type=int), 20)
+
+    my_student_ids = select(Enrollment.student_id).join(
+        Course, Enrollment.course_id == Course.id
+    ).where(
+        Course.teacher_id == current_user.id,
+        Enrollment.is_active == True
+    )
+    users = autocomplete_users(query_text, 'student', limit=max(limit, 1), user_ids=my_student_ids)
+    return jsonify({'success': True, 'results': [user_suggestion(user) for user in users]})
+
 @teacher_bp.route('/attendance')
 @login_required
 @teacher_required
@@ -217,32 +329,14 @@ def add_attendance_session():
         if existing_session:
             flash('توجد جلسة حضور في هذا التاريخ مسبقاً', 'error')
         else:
-            session = AttendanceSession(
-                course_id=course_id,
-                session_date=form.session_date.data,
-                session_time=form.session_time.data,
-                topic=form.topic.data
-            )
-            
             try:
-                db.session.add(session)
-                db.session.flush()  # للحصول على ID الجلسة
-                
-                # إضافة سجلات حضور فارغة لجميع الطلاب المسجلين
-                students = db.session.query(User).join(Enrollment).filter(
-                    Enrollment.course_id == course_id,
-                    Enrollment.is_active == True,
-                    User.is_active == True
-                ).all()
-                
-                for student in students:
-                    attendance = Attendance(
-                        student_id=student.id,
-                        session_id=session.id,
-                        status='absent'  # الافتراضي غائب
-                    )
-                    db.session.add(attendance)
-                
+                # إنشاء الجلسة مع سجلات حضور فارغة لجميع الطلاب المسجلين
+                create_attendance_sessions(
+                    course_id,
+                    [form.session_date.data],
+                    session_time=form.session_time.data,
+                    topic=form.topic.data
+                )
                 db.session.commit()
                 flash('تم إنشاء جلسة الحضور بنجاح', 'success')
                 return redirect(url_for('teacher.attendance', course_id=course_id))
@@ -253,6 +347,68 @@ def add_attendance_session():
     
     return render_template('teacher/add_attendance_session.html', form=form, course=course)
 
+@teacher_bp.route('/attendance/schedule', methods=['GET', 'POST'])
+@login_required
+@teacher_required
+def schedule_attendance_sessions():
+    """إنشاء جلسات حضور متكررة لفصل دراسي كامل"""
+    form = RecurringAttendanceForm()
+    course_id = request.args.get('course_id', type=int)
+    
+    if not course_id:
+        flash('يرجى اختيار الدورة أولاً', 'error')
+        return redirect(url_for('teacher.attendance'))
+    
+    # التحقق من أن الدورة تابعة للمعلم
+    course = Course.query.filter_by(id=course_id, teacher_id=current_user.id).first()
+    if not course:
+        flash('الدورة غير موجودة أو ليس لديك صلاحية للوصول إليها', 'error')
+        return redirect(url_for('teacher.attendance'))
+    
+    if form.validate_on_submit():
+        weekdays = set(form.weekdays.data)
+        total_days = (form.end_date.data - form.start_date.data).days + 1
+        candidate_dates = [
+            form.start_date.data + timedelta(days=offset)
+            for offset in range(total_days)
+            if (form.start_date.data + timedelta(days=offset)).weekday() in weekdays
+        ]
+        
+        # تخطي التواريخ التي توجد بها جلسات مسبقاً
+        existing_dates = set(db.session.execute(
+            select(AttendanceSession.session_date).where(
+                AttendanceSession.course_id == course_id,
+                AttendanceSession.session_date.between(form.start_date.data, form.end_date.data)
+            )
+        ).scalars())
+        session_dates = [d for d in candidate_dates if d not in existing_dates]
+        
+        if not session_dates:
+            flash('لا توجد تواريخ جديدة ضمن الجدول المحدد', 'warning')
+        else:
+            try:
+                sessions_count, records_count = create_attendance_sessions(
+                    course_id,
+                    session_dates,
+                    session_time=form.session_time.data,
+                    topic=form.topic.data
+                )
+                db.session.commit()
+                
+                message = f'تم إنشاء {sessions_count} جلسة و{records_count} سجل حضور'
+                skipped_count = len(candidate_dates) - len(session_dates)
+                if skipped_count:
+                    message += f' (تم تخطي {skipped_count} تاريخ موجود مسبقاً)'
+                flash(message, 'success')
+                return redirect(url_for('teacher.attendance', course_id=course_id))
+                
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"خطأ في إنشاء جدول الحضور: {str(e)}")
+                flash('حدث خطأ في إنشاء جدول الحضور', 'error')
+    
+    return render_template('teacher/schedule_attendance_sessions.html', form=form, course=course)
+
 @teacher_bp.route('/attendance/session/<int:session_id>')
 @login_required
 @teacher_required
@@ -291,19 +447,13 @@ def update_attendance():
         return jsonify({'success': False, 'message': 'الجلسة غير موجودة'})
     
     try:
-        # تحديث حالة الحضور لكل طالب
-        for key, value in request.form.items():
-            if key.startswith('attendance_'):
-                student_id = int(key.split('_')[1])
-                status = value
-                
-                attendance = Attendance.query.filter_by(
-                    session_id=session_id,
-                    student_id=student_id
-                ).first()
-                
-                if attendance:
-                    attendance.status = status
+        # تحديث حالة الحضور لكل الطلاب دفعة واحدة
+        changes = {
+            int(key.split('_')[1]): value
+            for key, value in request.form.items()
+            if key.startswith('attendance_')
+        }
+        apply_attendance_changes(session, changes)
         
         # تحديث ملاحظات الجلسة إذا تم إرسالها
         if 'session_notes' in request.form:
@@ -318,6 +468,59 @@ def update_attendance():
         flash('حدث خطأ في تحديث سجلات الحضور', 'error')
         return redirect(url_for('teacher.attendance_session_detail', session_id=session_id))
 
+@teacher_bp.route('/attendance/session/<int:session_id>/batch', methods=['POST'])
+@login_required
+@teacher_required
+def batch_update_attendance(session_id):
+    """
+    تحديث الحضور عبر JSON بالصفوف المعدلة فقط
+    
+    {"changes": [{"student_id": 5, "status": "present"}, ...], "session_notes": "..."}
+    """
+    session = AttendanceSession.query.join(Course).filter(
+        AttendanceSession.id == session_id,
+        Course.teacher_id == current_user.id
+    ).first()
+    
+    if not session:
+        return jsonify({'success': False, 'message': 'الجلسة غير موجودة'}), 404
+    
+    payload = request.get_json(silent=True) or {}
+    raw_changes = payload.get('changes', []) if isinstance(payload, dict) else None
+    if not isinstance(raw_changes, list) or not all(isinstance(change, dict) for change in raw_changes):
+        return jsonify({'success': False, 'message': 'بيانات غير صالحة'}), 400
+    if not isinstance(payload.get('session_notes', ''), (str, type(None))):
+        return jsonify({'success': False, 'message': 'بيانات غير صالحة'}), 400
+    
+    try:
+        changes = {int(change['student_id']): change['status'] for change in raw_changes}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'بيانات غير صالحة'}), 400
+    
+    # القيم قد تكون من أنواع مختلفة (null وأرقام) فتُرتب كنصوص
+    invalid = sorted({str(status) for status in changes.values()
+                      if not isinstance(status, str) or status not in ATTENDANCE_STATUSES})
+    if invalid:
+        return jsonify({'success': False, 'message': f'حالة حضور غير معروفة: {", ".join(invalid)}'}), 400
+    
+    try:
+        updated = apply_attendance_changes(session, changes)
+        
+        if 'session_notes' in payload:
+            session.topic = payload['session_notes']
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"خطأ في تحديث سجلات الحضور: {str(e)}")
+        return jsonify({'success': False, 'message': 'حدث خطأ في تحديث سجلات الحضور'}), 500
+    
+    return jsonify({
+        'success': True,
+        'updated': updated,
+        'counts': get_session_status_counts(session_id)
+    })
+
 @teacher_bp.route('/grades')
 @login_required
 @teacher_required
@@ -421,6 +624,64 @@ def add_grade():
     
     return render_template('teacher/add_grade.html', form=form, course=course, students=students)
 
+@teacher_bp.route('/grades/import', methods=['GET', 'POST'])
+@login_required
+@teacher_required
+def import_grades():
+    """استيراد كشف درجات من ملف CSV/TSV"""
+    form = GradebookImportForm()
+    course_id = request.args.get('course_id', type=int)
+    
+    if not course_id:
+        flash('يرجى اختيار الدورة أولاً', 'error')
+        return redirect(url_for('teacher.grades'))
+    
+    # التحقق من أن الدورة تابعة للمعلم
+    course = Course.query.filter_by(id=course_id, teacher_id=current_user.id).first()
+    if not course:
+        flash('الدورة غير موجودة أو ليس لديك صلاحية للوصول إليها', 'error')
+        return redirect(url_for('teacher.grades'))
+    
+    grades_count = 0
+    errors = []
+    
+    if form.validate_on_submit():
+        grades_data, errors = gradebook.parse_gradebook(
+            form.gradebook_file.data, course_id, form.max_grade.data
+        )
+        grades_count = len(grades_data)
+        
+        if errors:
+            flash(f'يحتوي الملف على {len(errors)} خطأ، لم يتم حفظ أي درجة', 'error')
+        elif not grades_data:
+            flash('الملف لا يحتوي على درجات', 'warning')
+        elif form.dry_run.data:
+            flash(f'الملف صالح: {grades_count} درجة جاهزة للاستيراد', 'info')
+        else:
+            try:
+                gradebook.import_grades(
+                    course_id,
+                    grades_data,
+                    assignment_name=form.assignment_name.data,
+                    grade_type=form.grade_type.data,
+                    max_grade=form.max_grade.data,
+                    notes=form.notes.data
+                )
+                db.session.commit()
+                flash(f'تم استيراد {grades_count} درجة بنجاح', 'success')
+                return redirect(url_for('teacher.grades', course_id=course_id))
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"خطأ في استيراد الدرجات: {str(e)}")
+                flash('حدث خطأ في استيراد الدرجات', 'error')
+    
+    return render_template('teacher/import_grades.html',
+                         form=form,
+                         course=course,
+                         grades_count=grades_count,
+                         errors=errors[:gradebook.MAX_REPORTED_ERRORS],
+                         total_errors=len(errors))
+
 @teacher_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 @teacher_required
@@ -470,8 +731,15 @@ def change_password():
     form = PasswordChangeForm()
     
     if form.validate_on_submit():
-        if check_password_hash(current_user.password_hash, form.current_password.data):
-            current_user.password_hash = generate_password_hash(form.new_password.data)
+        try:
+            password_valid = verify_password(current_user, form.current_password.data, rehash=False)
+            new_password_hash = hash_password(form.new_password.data) if password_valid else None
+        except PasswordHashingBusy:
+            flash('الخادم مشغول حالياً، يرجى المحاولة بعد لحظات', 'warning')
+            return render_template('teacher/change_password.html', form=form), 503
+        
+        if password_valid:
+            current_user.password_hash = new_password_hash
             try:
                 db.session.commit()
                 flash('تم تغيير كلمة المرور بنجاح', 'success')
@@ -0,0 +1,104 @@
+"""
+تقديم الملفات المرفوعة (الصور الشخصية والمستندات)
+
+أسماء الملفات المرفوعة فريدة ولا يُعاد الكتابة عليها (uuid أو بصمة المحتوى)،
+فتُرسل بـ Cache-Control طويل و immutable ويكون الاسم نفسه ETag قوياً، ولا
+يعيد المتصفح طلبها. الملفات الأخرى تُرسل بـ no-cache مع ETag للتحقق بـ 304.
+طلبات Range مدعومة لتصفح ملفات PDF الكبيرة، ويمكن ترك إرسال البايتات للخادم
+الأمامي عبر X-Accel-Redirect (nginx) أو X-Sendfile (Apache) بدلاً من عامل Python.
+"""
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, current_app, request, send_from_directory, abort, url_for
+from flask_login import login_required, current_user
+from werkzeug.security import safe_join
+
+from models import Document
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# مدة التخزين المؤقت للملفات ذات الأسماء الثابتة المحتوى (سنة)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# uuid4().hex أو بصمة sha256، مع لاحقة النسخة المصغرة (_thumb، _medium)
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{32,64}(_[a-z]+)?\.[a-z0-9]+$')
+
+
+def upload_url(path):
+    """رابط ملف مرفوع للقوالب، مثل upload_url(image_rendition(user.profile_picture))"""
+    if not path:
+        return None
+    return url_for('uploads.serve', filename=path)
+
+
+def is_content_addressed(filename):
+    return CONTENT_ADDRESSED_NAME.match(os.path.basename(filename)) is not None
+
+
+def _etag(filename):
+    """الاسم ETag قوي للملفات ذات الأسماء الثابتة المحتوى، وإلا None"""
+    if is_content_addressed(filename):
+        return os.path.basename(filename)
+    return None
+
+
+def _can_access(filename):
+    """الصور متاحة لكل مستخدم مسجل، والمستندات لصاحبها والمدير فقط"""
+    if filename.split('/', 1)[0] != 'documents' or current_user.role == 'admin':
+        return True
+    return Document.query.filter_by(filename=filename, user_id=current_user.id).first() is not None
+
+
+def _offloaded_response(filename, full_path):
+    """استجابة فارغة يُكمل الخادم الأمامي إرسال الملف فيها، بما في ذلك طلبات Range"""
+    header = current_app.config['UPLOADS_SENDFILE_HEADER']
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if header == 'X-Accel-Redirect':
+        response.headers[header] = current_app.config['UPLOADS_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+    else:
+        response.headers[header] = full_path
+    stat = os.stat(full_path)
+    response.last_modified = stat.st_mtime
+    response.set_etag(_etag(filename) or f'{int(stat.st_mtime)}-{stat.st_size}')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        # نسخة المتصفح صالحة، فلا داعي لأن يرسل الخادم الأمامي الملف
+        del response.headers[header]
+    return response
+
+
+def _set_cache_headers(response, filename):
+    if is_content_addressed(filename):
+        # الاسم يتغير مع المحتوى، فلا حاجة لإعادة التحقق
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    # الملفات خلف تسجيل الدخول: لا تُخزن في الخوادم الوسيطة المشتركة
+    response.cache_control.private = True
+
+
+@uploads_bp.route('/<path:filename>')
+@login_required
+def serve(filename):
+    """تقديم ملف مرفوع مع ETag و Range والتخزين المؤقت في المتصفح"""
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    full_path = safe_join(upload_folder, filename)
+    if full_path is None or not os.path.isfile(full_path):
+        abort(404)
+    if not _can_access(filename):
+        abort(403)
+
+    if current_app.config['UPLOADS_SENDFILE_HEADER']:
+        response = _offloaded_response(filename, full_path)
+    else:
+        # conditional: If-None-Match و If-Modified-Since و Range و If-Range
+        response = send_from_directory(upload_folder, filename, conditional=True,
+                                       etag=_etag(filename) or True)
+    _set_cache_headers(response, filename)
+    return response
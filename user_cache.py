@@ -0,0 +1,156 @@
+"""
+تخزين مؤقت لهوية المستخدم في Flask-Login بين الطلبات
+
+يحتفظ كل عامل بنسخة منفصلة (detached) من آخر المستخدمين في LRU مع رقم
+إصداره من جدول UserVersion. يزداد الرقم مع أي تعديل على المستخدم، وتُحذف
+النسخة محلياً بعد commit. في كل طلب تُقارن النسخة برقم الإصدار الحالي
+(استعلام Core لعمود واحد بالمفتاح الأساسي) بدلاً من تحميل المستخدم كاملاً
+وبنائه عبر الـ ORM، ويمكن
+تخطي المقارنة لعدد من الثواني عبر USER_CACHE_REVALIDATE في حالة العامل
+الواحد حيث يكفي الإبطال المحلي.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, select, update, insert, func, inspect, bindparam
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app import db
+from models import User, UserVersion
+
+DEFAULT_USER_CACHE_SIZE = 1024
+DEFAULT_USER_CACHE_REVALIDATE = 0
+
+
+class UserIdentityCache:
+    """LRU بحجم محدود يحفظ (version, user, checked_at) لكل مستخدم"""
+
+    def __init__(self, maxsize=DEFAULT_USER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, version, user):
+        with self._lock:
+            self._entries[user_id] = (version, user, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            else:
+                for user_id in user_ids:
+                    self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserIdentityCache()
+
+
+# استعلام Core مبني مرة واحدة ويُنفذ على اتصال الجلسة مباشرة، أخف بكثير من الـ ORM
+_VERSION_QUERY = select(UserVersion.__table__.c.version).where(
+    UserVersion.__table__.c.user_id == bindparam('user_id')
+)
+
+
+def _current_version(user_id):
+    return db.session.connection().execute(_VERSION_QUERY, {'user_id': user_id}).scalar() or 0
+
+
+def _load_and_cache(user_id):
+    """تحميل المستخدم مع رقم إصداره في استعلام واحد وتخزين نسخة منفصلة منه"""
+    row = db.session.execute(
+        select(User, func.coalesce(UserVersion.version, 0)).outerjoin(
+            UserVersion, UserVersion.user_id == User.id
+        ).where(User.id == user_id)
+    ).first()
+    if row is None:
+        user_cache.invalidate([user_id])
+        return None
+
+    user, version = row
+    snapshot = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    # نسخة منفصلة بحالة "محفوظة" ليمكن دمجها في جلسات الطلبات التالية دون استعلام
+    make_transient_to_detached(snapshot)
+    user_cache.put(user_id, version, snapshot)
+    return user
+
+
+def load_cached_user(user_id):
+    """
+    دالة user_loader: المستخدم المرتبط بجلسة الطلب الحالي، أو None
+
+    يُرجع None للمستخدم الموقوف فيُعامل الطلب كزائر ويُطلب تسجيل الدخول.
+    """
+    revalidate = current_app.config.get('USER_CACHE_REVALIDATE', DEFAULT_USER_CACHE_REVALIDATE)
+
+    entry = user_cache.get(user_id)
+    user = None
+    if entry is not None:
+        version, snapshot, checked_at = entry
+        if time.monotonic() - checked_at < revalidate:
+            user_cache.hits += 1
+        elif _current_version(user_id) == version:
+            user_cache.put(user_id, version, snapshot)
+            user_cache.hits += 1
+        else:
+            snapshot = None
+        if snapshot is not None:
+            # نسخة مرتبطة بجلسة هذا الطلب، فتُحفظ تعديلات current_user كالمعتاد
+            user = db.session.merge(snapshot, load=False)
+
+    if user is None:
+        user_cache.misses += 1
+        user = _load_and_cache(user_id)
+
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _bump_versions(connection, user_ids):
+    for user_id in user_ids:
+        result = connection.execute(
+            update(UserVersion).where(UserVersion.user_id == user_id).values(version=UserVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(UserVersion).values(user_id=user_id, version=1))
+
+
+@event.listens_for(Session, 'after_flush')
+def bump_user_versions(session, flush_context):
+    """زيادة رقم إصدار المستخدمين المعدلين أو المحذوفين"""
+    changed = [obj.id for obj in session.dirty if isinstance(obj, User) and session.is_modified(obj)]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, User)]
+    if not changed and not deleted:
+        return
+    _bump_versions(session.connection(), changed + deleted)
+    session.info.setdefault('changed_user_ids', set()).update(changed + deleted)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed_users(session):
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids:
+        user_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def clear_changed_users(session):
+    session.info.pop('changed_user_ids', None)
@@ -1,26 +1,20 @@
 import os
 import uuid
 from werkzeug.utils import secure_filename
-from flask import current_app, flash
-from PIL import Image
+from flask import current_app, flash, Response, stream_with_context
 import io
 from functools import wraps
 from flask_login import current_user
 from datetime import datetime
 import csv
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 # الملفات المسموحة للرفع
 ALLOWED_EXTENSIONS = {
     'images': {'png', 'jpg', 'jpeg', 'gif'},
     'documents': {'pdf', 'doc', 'docx', 'txt'},
-    'profiles': {'png', 'jpg', 'jpeg'}
+    'profiles': {'png', 'jpg', 'jpeg'},
+    # الرفع على أجزاء: تسجيلات المحاضرات وحزم الشهادات الممسوحة
+    'large_documents': {'pdf', 'doc', 'docx', 'txt', 'zip', 'mp4', 'webm', 'mp3', 'm4a'}
 }
 
 def allowed_file(filename, file_type='images'):
@@ -30,7 +24,7 @@ def allowed_file(filename, file_type='images'):
 
 def save_uploaded_file(file, subfolder='uploads', max_size=(800, 800)):
     """
-    حفظ الملف المرفوع مع تصغير الصور
+    حفظ الملف المرفوع، وتُصغَّر الصور في الخلفية إلى max_size وصورة مصغرة
     """
     if not file or file.filename == '':
         return None
@@ -50,23 +44,22 @@ def save_uploaded_file(file, subfolder='uploads', max_size=(800, 800)):
     filepath = os.path.join(upload_path, filename)
     
     try:
-        # إذا كان ملف صورة، قم بتصغيره
+        # الصور: فحص الترويسة فقط، ثم حفظ الأصل وإنشاء النسخ المصغرة خارج الطلب
         if subfolder in ['images', 'profiles'] and file_extension in ['png', 'jpg', 'jpeg']:
-            image = Image.open(file.stream)
+            from images import check_image, schedule_renditions
             
-            # تحويل RGBA إلى RGB إذا لزم الأمر
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
+            error = check_image(file.stream, current_app.config['IMAGE_MAX_PIXELS'])
+            if error:
+                flash(error, 'error')
+                return None
             
-            # تصغير الصورة مع الحفاظ على النسبة
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # حفظ الصورة المحسنة
-            image.save(filepath, optimize=True, quality=85)
+            file.save(filepath)
+            schedule_renditions(f"{subfolder}/{filename}", max_size)
+        elif subfolder == 'documents':
+            # المستندات تُخزن مرة واحدة لكل محتوى، باسم بصمته
+            from documents import store_document_file
+            path, _, _ = store_document_file(file.stream, file_extension)
+            return path
         else:
             # حفظ الملف كما هو
             file.save(filepath)
@@ -120,6 +113,17 @@ def format_datetime(datetime_value, format_string='%Y-%m-%d %H:%M'):
         return datetime_value.strftime(format_string)
     return ''
 
+def get_month_range(date_value=None):
+    """حدود الشهر كنطاق [بداية الشهر، بداية الشهر التالي) لاستخدام فهرس التاريخ"""
+    if date_value is None:
+        date_value = datetime.now().date()
+    month_start = date_value.replace(day=1)
+    if month_start.month == 12:
+        next_month_start = month_start.replace(year=month_start.year + 1, month=1)
+    else:
+        next_month_start = month_start.replace(month=month_start.month + 1)
+    return month_start, next_month_start
+
 def calculate_age(birth_date):
     """حساب العمر"""
     if birth_date:
@@ -157,52 +161,21 @@ def get_grade_type_text(grade_type):
     return type_map.get(grade_type, grade_type)
 
 def create_pdf_report(title, headers, data, filename=None):
-    """إنشاء تقرير PDF"""
+    """
+    إنشاء تقرير PDF في الذاكرة، أو في filename إذا حُدد
+
+    يُرجع BytesIO (أو المسار عند تحديد filename)، أو None عند الخطأ.
+    """
+    from reports import build_pdf_report
     try:
-        if not filename:
-            filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
-        # إنشاء المستند
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        story = []
-        
-        # الأنماط
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontName='Helvetica-Bold',
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # وسط
-        )
-        
-        # العنوان
-        story.append(Paragraph(title, title_style))
-        story.append(Spacer(1, 20))
-        
-        # الجدول
-        if data:
-            table_data = [headers] + data
-            table = Table(table_data)
-            
-            # تنسيق الجدول
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(table)
+        if filename:
+            with open(filename, 'wb') as output:
+                build_pdf_report(title, headers, data, output)
+            return filename
         
-        # بناء المستند
-        doc.build(story)
-        return filename
+        buffer = build_pdf_report(title, headers, data)
+        buffer.seek(0)
+        return buffer
         
     except Exception as e:
         current_app.logger.error(f"خطأ في إنشاء تقرير PDF: {str(e)}")
@@ -225,6 +198,35 @@ def export_to_csv(headers, data, filename=None):
         current_app.logger.error(f"خطأ في تصدير CSV: {str(e)}")
         return None
 
+CSV_STREAM_CHUNK_SIZE = 64 * 1024
+CSV_YIELD_PER = 1000
+
+def stream_csv_response(headers, rows, download_name):
+    """
+    إرجاع ملف CSV كاستجابة متدفقة
+    
+    rows يمكن أن يكون أي مكرر (مثل استعلام بـ yield_per) فلا تُحمَّل البيانات
+    كاملة في الذاكرة، وتُرسل العلامة BOM مرة واحدة لدعم العربية في Excel.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        yield '\ufeff'.encode('utf-8')
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CSV_STREAM_CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={download_name}'}
+    )
+
 def validate_phone_number(phone):
     """التحقق من صحة رقم الهاتف"""
     import re
@@ -263,16 +265,10 @@ def generate_student_id():
 def send_notification(user_id, title, message):
     """إرسال إشعار للمستخدم"""
     try:
-        from models import Notification
         from app import db
+        from notifications import notify_users
         
-        notification = Notification(
-            user_id=user_id,
-            title=title,
-            message=message
-        )
-        
-        db.session.add(notification)
+        notify_users([user_id], title, message)
         db.session.commit()
         return True
         
@@ -317,22 +313,10 @@ def get_grade_letter(percentage):
         return 'F'
 
 def backup_database():
-    """نسخ احتياطي لقاعدة البيانات"""
+    """نسخ احتياطي لقاعدة البيانات أثناء عمل التطبيق، ويُرجع مسار النسخة"""
     try:
-        import shutil
-        from datetime import datetime
-        
-        # اسم ملف النسخة الاحتياطية
-        backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-        backup_path = os.path.join('backups', backup_name)
-        
-        # إنشاء مجلد النسخ الاحتياطية
-        os.makedirs('backups', exist_ok=True)
-        
-        # نسخ قاعدة البيانات
-        shutil.copy2('student_management.db', backup_path)
-        
-        return backup_path
+        from backups import create_backup
+        return create_backup()
         
     except Exception as e:
         current_app.logger.error(f"خطأ في النسخ الاحتياطي: {str(e)}")